@@ -1,11 +1,9 @@
 import os
 import logging
 from dotenv import load_dotenv
-from telegram.ext import Updater, CommandHandler, CallbackQueryHandler
-from src.bot.handlers import (
-    start,
-    button_handler
-)
+from src.bot.delivery import DeliveryConfig, build_application, run_application
+from src.bot.handlers import register_handlers, post_init
+from src.theory_server import start_in_background as start_theory_server
 
 # Настройка логирования
 logging.basicConfig(
@@ -24,22 +22,25 @@ def main() -> None:
         logger.error("Не найден токен Telegram бота в переменных окружения")
         return
     
-    # Создание Updater и передача ему токена бота
-    updater = Updater(token)
+    # Способ получения обновлений (BOT_DELIVERY=polling|webhook) и число одновременных обновлений
+    config = DeliveryConfig.from_env()
     
-    # Получение диспетчера для регистрации обработчиков
-    dispatcher = updater.dispatcher
+    # Создание приложения; после getMe post_init определяет имя бота для ссылок
+    # на карточки и прогревает кеши (CARDS_WARMUP=1); иначе карточки и поисковые индексы
+    # загружаются при первом обращении
+    application = build_application(token, config, post_init=post_init)
     
     # Регистрация обработчиков
-    dispatcher.add_handler(CommandHandler("start", start))
-    dispatcher.add_handler(CallbackQueryHandler(button_handler))
+    register_handlers(application)
     
-    # Запуск бота
-    updater.start_polling()
-    logger.info("Бот запущен")
+    # Сервер теории в том же процессе; THEORY_SERVER=off, если он запущен отдельно
+    # (python -m src.theory_server)
+    if os.getenv('THEORY_SERVER', 'embedded') == 'embedded':
+        start_theory_server()
     
-    # Остановка бота при нажатии Ctrl+C
-    updater.idle()
+    # Запуск бота до Ctrl+C: long polling или вебхук
+    logger.info("Бот запущен")
+    run_application(application, config)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,109 @@
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from telegram import Update
+from telegram.ext import Application
+
+from src.bot.router import Router
+
+# Сколько секунд клиент Telegram может не присылать повторные нажатия кнопки без действия
+NOOP_CACHE_TIME = 300
+
+# Повторное нажатие той же кнопки того же сообщения в пределах окна, с, считается дублем
+DUPLICATE_WINDOW = 3.0
+
+# Сколько последних нажатий помнить для поиска дублей и ранних ответов
+MAX_RECENT_TAPS = 4096
+
+
+class CallbackAnswers:
+    """Ранний ответ на callback-запросы при получении обновления, до очереди чата и маршрутизации.
+
+    Подключается как pre_dispatch у PerChatUpdateProcessor. Ответ (остановка
+    индикатора загрузки на кнопке) уходит отдельной задачей сразу, даже если чат
+    еще занят предыдущим нажатием. Маршруты с answers=True отвечают сами - их
+    ответ несет текст (например, позицию в очереди экспорта). Нажатия кнопки без
+    действия отвечаются с cache_time и дальше не обрабатываются. Обработчики
+    отвечают через answer(): он знает, был ли уже ранний ответ.
+    """
+
+    def __init__(self, router: Router, noop_data: str, noop_cache_time: int = NOOP_CACHE_TIME):
+        self.router = router
+        self.noop_data = noop_data
+        self.noop_cache_time = noop_cache_time
+        self._application: Optional[Application] = None
+        self.early_answers = True
+        # Время последнего нажатия по (чат, сообщение, callback_data)
+        self._recent: 'OrderedDict[Hashable, float]' = OrderedDict()
+        # id callback-запросов, на которые уже ушел ранний ответ
+        self._answered: 'OrderedDict[str, None]' = OrderedDict()
+        self.taps = 0
+        self.duplicates = 0
+        self.early = 0
+        self.noops = 0
+
+    def attach(self, application: Application, early_answers: bool = True) -> None:
+        """Подключает к обработке обновлений приложения; без early_answers только считает дубли"""
+        self._application = application
+        self.early_answers = early_answers
+        application.update_processor.pre_dispatch = self
+
+    def __call__(self, update: object) -> bool:
+        query = update.callback_query if isinstance(update, Update) else None
+        if query is None:
+            return True
+        self.taps += 1
+        self._track(query)
+        if not self.early_answers:
+            return True
+
+        if query.data == self.noop_data:
+            self.noops += 1
+            self._application.create_task(query.answer(cache_time=self.noop_cache_time), update=update)
+            return False
+
+        resolved = self.router.resolve(query.data) if query.data else None
+        if resolved is not None and resolved[0].answers:
+            return True
+        # Неизвестным нажатиям тоже отвечаем: иначе индикатор крутится до таймаута
+        self.early += 1
+        self._answered[query.id] = None
+        if len(self._answered) > MAX_RECENT_TAPS:
+            self._answered.popitem(last=False)
+        self._application.create_task(query.answer(), update=update)
+        return True
+
+    def _track(self, query) -> None:
+        """Учитывает повторное нажатие той же кнопки того же сообщения"""
+        now = time.monotonic()
+        message = query.message
+        key = (message.chat_id, message.message_id, query.data) if message else (query.inline_message_id, query.data)
+        last = self._recent.pop(key, None)
+        if last is not None and now - last < DUPLICATE_WINDOW:
+            self.duplicates += 1
+        self._recent[key] = now
+        while self._recent and (len(self._recent) > MAX_RECENT_TAPS
+                                or now - next(iter(self._recent.values())) >= DUPLICATE_WINDOW):
+            self._recent.popitem(last=False)
+
+    async def answer(self, update: Update, text: Optional[str] = None, show_alert: bool = False) -> None:
+        """Отвечает на callback-запрос, если на него еще не ушел ранний ответ.
+
+        После раннего ответа второй ответ невозможен, поэтому текст приходит сообщением в чат.
+        """
+        query = update.callback_query
+        if self._answered.pop(query.id, False) is None:
+            if text and query.message:
+                await query.message.reply_text(text)
+            return
+        await query.answer(text, show_alert=show_alert)
+
+    def stats(self) -> dict:
+        return {
+            'taps': self.taps,
+            'duplicates': self.duplicates,
+            'duplicate_rate': round(self.duplicates / self.taps, 4) if self.taps else 0.0,
+            'early': self.early,
+            'noops': self.noops,
+        }
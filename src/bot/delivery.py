@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import secrets
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+
+from telegram.ext import Application
+from telegram.request import HTTPXRequest
+
+from src.bot.processing import PerChatUpdateProcessor
+from src.bot.ratelimit import GLOBAL_RATE, OutboundScheduler
+
+logger = logging.getLogger(__name__)
+
+# Режимы получения обновлений
+POLLING = 'polling'
+WEBHOOK = 'webhook'
+
+# Ожидание свободного соединения с Bot API, с
+POOL_TIMEOUT = 30.0
+
+
+# Методы, которые получают освободившееся соединение раньше остальных:
+# ответ на нажатие останавливает индикатор загрузки на кнопке
+URGENT_METHODS = ('/answerCallbackQuery', '/answerInlineQuery')
+
+
+class PooledRequest(HTTPXRequest):
+    """HTTPXRequest, который пускает в пул httpx не больше запросов, чем в нем соединений.
+
+    Пул httpx на каждое событие перебирает все ожидающие запросы вместе со всеми
+    соединениями, и при сотнях одновременных обработчиков это съедает процессор.
+    Лишние запросы ждут в своей очереди, где ожидание ничего не стоит; запросы
+    URGENT_METHODS обходят в ней остальные.
+    """
+
+    __slots__ = ('_free', '_waiters')
+
+    def __init__(self, connection_pool_size: int, **kwargs):
+        super().__init__(connection_pool_size=connection_pool_size, **kwargs)
+        self._free = connection_pool_size
+        # Ожидающие соединения: срочные и остальные
+        self._waiters: Tuple[Deque[asyncio.Future], ...] = (deque(), deque())
+
+    async def do_request(self, url: str, *args, **kwargs):
+        await self._acquire(url.endswith(URGENT_METHODS))
+        try:
+            return await super().do_request(url, *args, **kwargs)
+        finally:
+            self._release()
+
+    async def _acquire(self, urgent: bool) -> None:
+        if self._free:
+            self._free -= 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._waiters[0 if urgent else 1]
+        queue.append(waiter)
+        try:
+            # Завершившийся запрос передает свое соединение первому ожидающему
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            elif waiter in queue:
+                queue.remove(waiter)
+            raise
+
+    def _release(self) -> None:
+        for queue in self._waiters:
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self._free += 1
+
+
+@dataclass(frozen=True)
+class DeliveryConfig:
+    """Способ получения обновлений от Telegram и параметры вебхука"""
+    mode: str = POLLING  # polling или webhook
+    listen: str = '0.0.0.0'  # Адрес, на котором принимаются обновления вебхука
+    port: int = 8443
+    url_path: str = ''  # Секретный путь вебхука, он же secret_token в заголовке запросов Telegram
+    webhook_url: Optional[str] = None  # Публичный адрес (за балансировщиком), без секретного пути
+    concurrent_updates: int = 1024  # Обновления, обрабатываемые одновременно
+    connection_pool_size: int = 32  # Соединения с Bot API, общие для всех обработчиков
+    max_connections: int = 40  # Одновременные соединения Telegram к вебхуку (1-100)
+    messages_per_second: float = GLOBAL_RATE  # Общий лимит исходящих сообщений; 0 - без очереди отправки
+
+    @classmethod
+    def from_env(cls) -> 'DeliveryConfig':
+        """Настройки из переменных окружения BOT_DELIVERY, WEBHOOK_*, BOT_CONCURRENT_UPDATES,
+        BOT_CONNECTION_POOL_SIZE и BOT_MESSAGES_PER_SECOND"""
+        mode = os.getenv('BOT_DELIVERY', POLLING).lower()
+        if mode not in (POLLING, WEBHOOK):
+            raise ValueError(f"BOT_DELIVERY должен быть {POLLING} или {WEBHOOK}, получено: {mode}")
+
+        url_path = os.getenv('WEBHOOK_SECRET', '')
+        if mode == WEBHOOK and not url_path:
+            # Случайный путь годится только для одного экземпляра: у каждого он свой
+            url_path = secrets.token_urlsafe(32)
+            logger.warning("WEBHOOK_SECRET не задан, секретный путь вебхука сгенерирован при запуске")
+
+        max_connections = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+        if not 1 <= max_connections <= 100:
+            raise ValueError(f"WEBHOOK_MAX_CONNECTIONS должен быть от 1 до 100, получено: {max_connections}")
+
+        config = cls(
+            mode=mode,
+            listen=os.getenv('WEBHOOK_LISTEN', '0.0.0.0'),
+            port=int(os.getenv('WEBHOOK_PORT', '8443')),
+            url_path=url_path,
+            webhook_url=os.getenv('WEBHOOK_URL') or None,
+            concurrent_updates=int(os.getenv('BOT_CONCURRENT_UPDATES', '1024')),
+            connection_pool_size=int(os.getenv('BOT_CONNECTION_POOL_SIZE', '32')),
+            max_connections=max_connections,
+            messages_per_second=float(os.getenv('BOT_MESSAGES_PER_SECOND', str(GLOBAL_RATE))),
+        )
+        if mode == WEBHOOK and not config.webhook_url:
+            raise ValueError("Для BOT_DELIVERY=webhook нужен публичный адрес WEBHOOK_URL")
+        return config
+
+    @property
+    def public_url(self) -> str:
+        """Адрес, который регистрируется в Telegram через setWebhook"""
+        return f"{self.webhook_url.rstrip('/')}/{self.url_path}"
+
+
+def build_application(token: str, config: DeliveryConfig, base_url: Optional[str] = None,
+                      post_init: Optional[Callable[[Application], Awaitable[None]]] = None) -> Application:
+    """Application с параллельной обработкой обновлений, очередью на чат
+    и очередью исходящих сообщений с лимитами Telegram.
+
+    base_url - адрес другого Bot API (например, fake_api).
+    """
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(PerChatUpdateProcessor(config.concurrent_updates))
+        .request(PooledRequest(config.connection_pool_size, pool_timeout=POOL_TIMEOUT))
+    )
+    if config.messages_per_second:
+        builder = builder.rate_limiter(OutboundScheduler(config.messages_per_second))
+    if base_url:
+        builder = builder.base_url(base_url)
+    if post_init:
+        builder = builder.post_init(post_init)
+    return builder.build()
+
+
+def run_application(application: Application, config: DeliveryConfig) -> None:
+    """Запускает бота до остановки: long polling или вебхук на tornado-сервере PTB"""
+    if config.mode == WEBHOOK:
+        logger.info(
+            f"Вебхук: {config.listen}:{config.port}, одновременных обновлений до "
+            f"{config.concurrent_updates}, соединений Telegram до {config.max_connections}"
+        )
+        application.run_webhook(
+            listen=config.listen,
+            port=config.port,
+            url_path=config.url_path,
+            webhook_url=config.public_url,
+            secret_token=config.url_path,
+            max_connections=config.max_connections,
+        )
+    else:
+        logger.info(f"Long polling, одновременных обновлений до {config.concurrent_updates}")
+        application.run_polling()
+
+
+async def start_receiving(application: Application, config: DeliveryConfig) -> None:
+    """Начинает получать обновления в уже запущенном цикле событий (замеры, встраивание)"""
+    if config.mode == WEBHOOK:
+        await application.updater.start_webhook(
+            listen=config.listen,
+            port=config.port,
+            url_path=config.url_path,
+            webhook_url=config.public_url,
+            secret_token=config.url_path,
+            max_connections=config.max_connections,
+        )
+    else:
+        await application.updater.start_polling()
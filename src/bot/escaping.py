@@ -0,0 +1,120 @@
+import html
+import re
+import time
+from dataclasses import astuple
+from typing import Iterator
+
+# Специальные символы MarkdownV2. Обратный слеш идет первым, чтобы не экранировать
+# слеши, добавленные для остальных символов
+MARKDOWN_V2_SPECIAL_CHARS = '\\_*[]()~`>#+-=|{}.!'
+
+_MARKDOWN_V2_REPLACEMENTS = tuple((char, '\\' + char) for char in MARKDOWN_V2_SPECIAL_CHARS)
+
+# Альтернативные однопроходные реализации - участвуют только в бенчмарке
+_MARKDOWN_V2_TABLE = str.maketrans(dict(_MARKDOWN_V2_REPLACEMENTS))
+_MARKDOWN_V2_PATTERN = re.compile('([%s])' % re.escape(MARKDOWN_V2_SPECIAL_CHARS))
+_HTML_TABLE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#x27;',
+})
+
+
+def escape_markdown(text: str) -> str:
+    """Экранирует специальные символы MarkdownV2.
+
+    Цепочка str.replace выполняется в C и не копирует строку, если символа в ней нет,
+    поэтому на кириллических текстах она быстрее str.translate и регулярных выражений
+    (см. benchmark()).
+    """
+    for char, replacement in _MARKDOWN_V2_REPLACEMENTS:
+        text = text.replace(char, replacement)
+    return text
+
+
+def escape_markdown_code(code: str) -> str:
+    """Экранирует содержимое блока кода MarkdownV2: внутри pre и code экранируются только \\ и `"""
+    return code.replace('\\', '\\\\').replace('`', '\\`')
+
+
+def escape_html(text: str) -> str:
+    """Экранирует текст для режима разметки HTML"""
+    return html.escape(text)
+
+
+def _escape_markdown_translate(text: str) -> str:
+    """Однопроходное экранирование MarkdownV2 через str.translate"""
+    return text.translate(_MARKDOWN_V2_TABLE)
+
+
+def _escape_markdown_regex(text: str) -> str:
+    """Однопроходное экранирование MarkdownV2 через скомпилированное регулярное выражение"""
+    parts = _MARKDOWN_V2_PATTERN.split(text)
+    parts[1::2] = ['\\' + char for char in parts[1::2]]
+    return ''.join(parts)
+
+
+def _escape_html_translate(text: str) -> str:
+    """Однопроходное экранирование HTML через str.translate"""
+    return text.translate(_HTML_TABLE)
+
+
+def _escape_markdown_legacy(text: str) -> str:
+    """Прежняя реализация из handlers.py - эталон для проверки совпадения"""
+    text = text.replace('\\', '\\\\')
+    for char in r'_*[]()~`>#+-=|{}.!':
+        text = text.replace(char, f'\\{char}')
+    return text
+
+
+def _corpus_strings() -> Iterator[str]:
+    """Все строковые поля всех карточек из src/cards"""
+    from src.cards import JAVA_CORE_CARDS, SPRING_CARDS, DATABASE_CARDS, DOCKER_K8S_CARDS, ALGORITHMS
+    from src.cards.system_design import SYSTEM_DESIGN_CARDS
+
+    def walk(value):
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                yield from walk(item)
+
+    for cards in (JAVA_CORE_CARDS, SPRING_CARDS, DATABASE_CARDS, DOCKER_K8S_CARDS,
+                  ALGORITHMS, SYSTEM_DESIGN_CARDS):
+        for card in cards:
+            yield from walk(astuple(card))
+
+
+def benchmark(rounds: int = 200) -> None:
+    """Проверяет совпадение результатов и сравнивает скорость экранирования на всем корпусе"""
+    corpus = list(_corpus_strings())
+    for text in corpus:
+        expected = _escape_markdown_legacy(text)
+        assert escape_markdown(text) == expected
+        assert _escape_markdown_translate(text) == expected
+        assert _escape_markdown_regex(text) == expected
+        assert _escape_html_translate(text) == escape_html(text)
+
+    size = sum(len(text) for text in corpus)
+    print(f"Корпус: {len(corpus)} строк, {size} символов - результаты совпадают")
+
+    for name, func in (
+        ('markdown: прежняя версия', _escape_markdown_legacy),
+        ('markdown: escape_markdown', escape_markdown),
+        ('markdown: str.translate', _escape_markdown_translate),
+        ('markdown: regex split', _escape_markdown_regex),
+        ('html: escape_html', escape_html),
+        ('html: str.translate', _escape_html_translate),
+    ):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for text in corpus:
+                func(text)
+        elapsed = (time.perf_counter() - started) / rounds
+        print(f"{name:28s} {elapsed * 1000:8.3f} мс на корпус")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional
+
+from src.bot.render import content_hash
+from src.bot.singleflight import flights
+
+logger = logging.getLogger(__name__)
+
+# Файл с file_id отправленных документов; путь можно переопределить переменной EXPORT_FILE_IDS
+DEFAULT_FILE_IDS_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'export_file_ids.json')
+
+# Версия формата экспортов: увеличивается при изменении сборки Markdown,
+# чтобы сохраненные file_id старых документов перестали совпадать
+EXPORT_FORMAT_VERSION = 1
+
+# Через сколько секунд после изменения file_id сохраняются в файл (изменения за это время пишутся одной записью)
+FILE_IDS_SAVE_DELAY = 1.0
+
+
+@dataclass(frozen=True)
+class ExportDocument:
+    """Готовый к отправке Markdown-документ"""
+    name: str  # Ключ экспорта: раздел или категория
+    content_hash: str  # Хеш карточек, из которых собран документ
+    filename: str
+    caption: str
+    data: bytes  # Содержимое в UTF-8
+
+
+def cards_hash(cards: Iterable) -> str:
+    """Хеш содержимого набора карточек с учетом их порядка"""
+    digest = hashlib.sha1()
+    for card in cards:
+        digest.update(content_hash(card).encode('ascii'))
+    return digest.hexdigest()
+
+
+def document_key(content_hash: str, filename: str, caption: str) -> str:
+    """Ключ загруженного документа: версия формата, содержимое карточек, имя файла и подпись"""
+    digest = hashlib.sha1()
+    for part in (str(EXPORT_FORMAT_VERSION), content_hash, filename, caption):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ExportCache:
+    """Экспорты в памяти: документ собирается один раз и пересобирается,
+    только когда меняется хеш содержимого его карточек"""
+
+    def __init__(self):
+        self._documents: Dict[str, ExportDocument] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, name: str, cards: Iterable, build: Callable[[], str],
+            filename: str, caption: str) -> ExportDocument:
+        """Документ экспорта name; build собирает Markdown при отсутствии или устаревании"""
+        digest = cards_hash(cards)
+        document = self._documents.get(name)
+        if document is not None and document.content_hash == digest:
+            self.hits += 1
+            return document
+
+        # Одновременные запросы одного экспорта ждут одну сборку
+        return flights.do(('export', name, digest), lambda: self._build(name, digest, build, filename, caption))
+
+    def _build(self, name: str, digest: str, build: Callable[[], str],
+               filename: str, caption: str) -> ExportDocument:
+        document = ExportDocument(name, digest, filename, caption, build().encode('utf-8'))
+        with self._lock:
+            self._documents[name] = document
+            self.builds += 1
+        return document
+
+    def stats(self) -> dict:
+        return {'size': len(self._documents), 'hits': self.hits, 'builds': self.builds}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._documents.clear()
+
+
+# Общий кеш экспортов бота
+exports = ExportCache()
+
+
+class FileIdStore:
+    """file_id документов экспорта, уже загруженных в Telegram.
+
+    Для каждого экспорта хранится file_id вместе с ключом документа (document_key):
+    при изменении карточек, имени файла, подписи или версии формата запись перестает
+    совпадать и документ загружается заново. Записи сохраняются в JSON-файл и
+    переживают перезапуск бота; запись идет в отдельном потоке с задержкой
+    save_delay, чтобы не останавливать цикл событий.
+    """
+
+    def __init__(self, path: str, save_delay: float = FILE_IDS_SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._entries: Dict[str, Dict[str, str]] = {}
+        self.reused = 0
+        self.uploads = 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать {path}, file_id экспортов будут получены заново: {e}")
+
+    def get(self, name: str, key: str) -> Optional[str]:
+        """file_id документа name, если он загружен для того же ключа документа"""
+        entry = self._entries.get(name)
+        if entry is None or entry.get('key') != key:
+            return None
+        return entry['file_id']
+
+    def set(self, name: str, key: str, file_id: str) -> None:
+        """Запоминает file_id загруженного документа"""
+        with self._lock:
+            self._entries[name] = {'key': key, 'file_id': file_id}
+            self._schedule_save()
+
+    def forget(self, name: str) -> None:
+        """Удаляет file_id, который Telegram больше не принимает"""
+        with self._lock:
+            if self._entries.pop(name, None) is not None:
+                self._schedule_save()
+
+    def _schedule_save(self) -> None:
+        # Вызывается под self._lock. Поток таймера не демон: процесс не завершится, не записав изменения
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.start()
+
+    def flush(self) -> None:
+        """Сохраняет записи в файл сейчас"""
+        with self._save_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                data = json.dumps(self._entries, ensure_ascii=False, indent=2)
+            # Запись через временный файл, чтобы прерванное сохранение не испортило хранилище
+            tmp_path = f'{self.path}.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Не удалось сохранить file_id экспортов в {self.path}: {e}")
+
+    def stats(self) -> dict:
+        return {'size': len(self._entries), 'reused': self.reused, 'uploads': self.uploads}
+
+
+# file_id документов экспорта бота
+file_ids = FileIdStore(os.path.normpath(os.getenv('EXPORT_FILE_IDS', DEFAULT_FILE_IDS_PATH)))
@@ -0,0 +1,656 @@
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import tornado.httpclient
+import tornado.web
+from telegram.ext import Application
+
+from src.bot.delivery import POLLING, WEBHOOK, DeliveryConfig, build_application, start_receiving
+from src.bot.ratelimit import CHAT_BURST, CHAT_RATE, GLOBAL_RATE, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+FAKE_TOKEN = '123456:FAKE'
+FAKE_BOT = {'id': 123456, 'is_bot': True, 'first_name': 'Study Bot', 'username': 'fake_study_bot'}
+
+# Методы, вызов которых считается ответом бота на обновление
+REPLY_METHODS = frozenset({'sendMessage', 'editMessageText', 'sendDocument', 'answerCallbackQuery'})
+# Методы, на которые распространяются лимиты сообщений
+MESSAGE_METHODS = frozenset({'sendMessage', 'editMessageText', 'sendDocument'})
+
+
+def free_port() -> int:
+    """Свободный TCP-порт на localhost"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class ApiError(Exception):
+    """Ошибка метода Bot API: ответ ok=false с кодом и описанием"""
+
+    def __init__(self, code: int, description: str, parameters: Optional[dict] = None):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+        self.parameters = parameters
+
+
+class MethodHandler(tornado.web.RequestHandler):
+    """Метод Bot API: /bot<token>/<method>"""
+
+    def initialize(self, api: 'FakeBotApi'):
+        self.api = api
+
+    async def post(self, token: str, method: str):
+        if self.request.headers.get('Content-Type', '').startswith('application/json'):
+            params = json.loads(self.request.body or b'{}')
+        else:
+            params = {name: self.get_argument(name) for name in self.request.arguments}
+        try:
+            result = await self.api.call(method, params)
+        except ApiError as e:
+            self.set_status(e.code)
+            response = {'ok': False, 'error_code': e.code, 'description': e.description}
+            if e.parameters:
+                response['parameters'] = e.parameters
+            self.write(response)
+            return
+        self.write({'ok': True, 'result': result})
+
+    get = post
+
+
+class FakeBotApi:
+    """Локальная заглушка Bot API для замеров и проверок без Telegram.
+
+    Отдает обновления через getUpdates (long polling) или отправляет их POST-запросом
+    на адрес из setWebhook и засекает время от отправки обновления до первого
+    ответа бота в тот же чат. Каждое обновление приходит из отдельного чата
+    (id чата = update_id), поэтому ответ однозначно связывается с обновлением.
+    """
+
+    def __init__(self, port: Optional[int] = None, delay: float = 0.0, jitter: float = 0.0,
+                 upload_delay: float = 0.0, reject_file_ids: bool = False, flood_limits: bool = False,
+                 retap_after: float = 0.0):
+        self.port = port or free_port()
+        # Задержка ответа на методы, кроме getUpdates: имитирует путь до Telegram и обратно;
+        # jitter - случайный разброс задержки в долях от нее
+        self.delay = delay
+        self.jitter = jitter
+        # Дополнительное время загрузки файла в sendDocument
+        self.upload_delay = upload_delay
+        # Отвечать на отправку документа по file_id ошибкой, как на устаревший file_id
+        self.reject_file_ids = reject_file_ids
+        # Отвечать 429 (retry_after) на сообщения сверх лимитов Telegram на бота и на чат
+        self.flood_limits = flood_limits
+        # Пользователь повторяет нажатие, если за retap_after секунд индикатор на кнопке не остановился
+        self.retap_after = retap_after
+        self.retaps = 0
+        # Время от нажатия до answerCallbackQuery
+        self.answer_latency: Dict[int, float] = {}
+        self.flood_errors = 0
+        self._global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self.webhook_url: Optional[str] = None
+        self.secret_token: Optional[str] = None
+        # Порядок ответов бота по чатам: update_id в порядке ответа
+        self.replies: Dict[int, List[int]] = {}
+        self._chat_of: Dict[int, int] = {}
+        # Обновления чата, еще не получившие ответа, в порядке отправки
+        self._open: Dict[int, Deque[int]] = {}
+        self.calls: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.latency_of: Dict[int, float] = {}
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._pending: List[dict] = []
+        self._waiting: Dict[int, Tuple[float, threading.Event]] = {}
+        self._lock = threading.Lock()
+        self._closing = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._updates: Optional[asyncio.Condition] = None
+        self._ready = threading.Event()
+        self._stopped: Optional[asyncio.Event] = None
+
+    @property
+    def base_url(self) -> str:
+        """base_url для Updater/Bot"""
+        return f'http://127.0.0.1:{self.port}/bot'
+
+    def start(self) -> None:
+        """Запускает сервер в фоновом потоке со своим циклом событий"""
+        threading.Thread(target=lambda: asyncio.run(self._serve()), name='fake-bot-api', daemon=True).start()
+        self._ready.wait()
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._updates = asyncio.Condition()
+        self._stopped = asyncio.Event()
+        app = tornado.web.Application([(r'/bot([^/]+)/(\w+)', MethodHandler, {'api': self})])
+        server = app.listen(self.port, address='127.0.0.1')
+        self._ready.set()
+        await self._stopped.wait()
+        server.stop()
+
+    def release(self) -> None:
+        """Отпускает ожидающие getUpdates, чтобы Updater.stop() не ждал конца long polling"""
+        self._closing = True
+        asyncio.run_coroutine_threadsafe(self._notify(), self._loop).result()
+
+    def stop(self) -> None:
+        self._closing = True
+        self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def wait_for(self, method: str, timeout: float = 10) -> None:
+        """Ждет первого вызова метода ботом (например, getUpdates или setWebhook при запуске)"""
+        deadline = time.monotonic() + timeout
+        while not self.calls.get(method):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Бот не вызвал {method} за {timeout} с")
+            time.sleep(0.01)
+
+    def push_message(self, text: str) -> int:
+        """Отправляет боту сообщение из нового чата, возвращает update_id"""
+        update_id = next(self._update_ids)
+        user = {'id': update_id, 'is_bot': False, 'first_name': 'Test'}
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': update_id, 'type': 'private'},
+            'from': user,
+            'text': text,
+        }
+        if text.startswith('/'):
+            command = text.split()[0]
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        return self._push({'update_id': update_id, 'message': message})
+
+    def push_callback(self, data: str, chat_id: Optional[int] = None, message_id: Optional[int] = None,
+                      impatient: bool = True) -> int:
+        """Отправляет боту нажатие inline-кнопки с callback_data, возвращает update_id.
+
+        Без chat_id нажатие приходит из нового чата; с chat_id несколько нажатий
+        в одном чате проверяют порядок обработки (ответ - answerCallbackQuery).
+        При retap_after пользователь нажимает кнопку еще раз, если индикатор
+        загрузки не остановился (нет answerCallbackQuery) за retap_after секунд.
+        """
+        update_id = next(self._update_ids)
+        chat_id = chat_id or update_id
+        message_id = message_id or next(self._message_ids)
+        if self.retap_after and impatient:
+            self._loop.call_soon_threadsafe(
+                self._loop.call_later, self.retap_after, self._retap, update_id, data, chat_id, message_id
+            )
+        user = {'id': chat_id, 'is_bot': False, 'first_name': 'Test'}
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': FAKE_BOT,
+            'text': 'Меню',
+        }
+        callback = {'id': str(update_id), 'from': user, 'message': message, 'chat_instance': '1', 'data': data}
+        return self._push({'update_id': update_id, 'callback_query': callback}, chat_id)
+
+    def _retap(self, update_id: int, data: str, chat_id: int, message_id: int) -> None:
+        if update_id not in self.answer_latency:
+            self.retaps += 1
+            self.push_callback(data, chat_id, message_id, impatient=False)
+
+    def _push(self, update: dict, chat_id: Optional[int] = None) -> int:
+        update_id = update['update_id']
+        with self._lock:
+            self._chat_of[update_id] = chat_id or update_id
+            self._open.setdefault(chat_id or update_id, deque()).append(update_id)
+            self._waiting[update_id] = (time.perf_counter(), threading.Event())
+        asyncio.run_coroutine_threadsafe(self._deliver(update), self._loop)
+        return update_id
+
+    def wait_all(self, update_ids: List[int], timeout: float = 600) -> None:
+        """Ждет ответов на все обновления"""
+        deadline = time.monotonic() + timeout
+        for update_id in update_ids:
+            self.wait_reply(update_id, max(0.0, deadline - time.monotonic()))
+
+    def wait_reply(self, update_id: int, timeout: float = 10) -> None:
+        """Ждет ответа бота на обновление"""
+        _, replied = self._waiting[update_id]
+        if not replied.wait(timeout):
+            raise TimeoutError(f"Нет ответа на обновление {update_id} за {timeout} с")
+
+    async def _deliver(self, update: dict) -> None:
+        if self.webhook_url:
+            headers = {'Content-Type': 'application/json'}
+            if self.secret_token:
+                headers['X-Telegram-Bot-Api-Secret-Token'] = self.secret_token
+            await tornado.httpclient.AsyncHTTPClient().fetch(
+                self.webhook_url, method='POST', body=json.dumps(update), headers=headers
+            )
+            return
+        self._pending.append(update)
+        await self._notify()
+
+    async def _notify(self) -> None:
+        async with self._updates:
+            self._updates.notify_all()
+
+    def _replied(self, update_id: Any) -> None:
+        try:
+            update_id = int(update_id)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            entry = self._waiting.get(update_id)
+            if entry is None or entry[1].is_set():
+                return
+            latency = time.perf_counter() - entry[0]
+            self.latencies.append(latency)
+            self.latency_of[update_id] = latency
+            self.replies.setdefault(self._chat_of[update_id], []).append(update_id)
+            entry[1].set()
+
+    def _answered(self, callback_query_id: Any) -> None:
+        update_id = int(callback_query_id)
+        with self._lock:
+            entry = self._waiting.get(update_id)
+            if entry is not None and update_id not in self.answer_latency:
+                self.answer_latency[update_id] = time.perf_counter() - entry[0]
+
+    def _replied_in_chat(self, chat_id: Any) -> None:
+        """Ответ в чат засчитывается самому раннему обновлению чата без ответа"""
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            updates = self._open.get(chat_id)
+            while updates and self._waiting[updates[0]][1].is_set():
+                updates.popleft()
+            if not updates:
+                return
+        self._replied(updates[0])
+
+    def _check_flood(self, chat_id: Any) -> None:
+        now = time.monotonic()
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(CHAT_RATE, CHAT_BURST)
+        wait = max(self._global_bucket.wait_time(now), bucket.wait_time(now))
+        if wait:
+            self.flood_errors += 1
+            retry_after = math.ceil(wait)
+            raise ApiError(429, f'Too Many Requests: retry after {retry_after}', {'retry_after': retry_after})
+        self._global_bucket.take()
+        bucket.take()
+
+    async def call(self, method: str, params: dict) -> Any:
+        """Результат метода Bot API"""
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.delay and method != 'getUpdates':
+            await asyncio.sleep(self.delay * (1 + self.jitter * (2 * random.random() - 1)))
+        if method == 'sendDocument':
+            if 'document' in params:
+                if self.reject_file_ids:
+                    raise ApiError(400, 'Bad Request: wrong file identifier/HTTP URL specified')
+            elif self.upload_delay:
+                await asyncio.sleep(self.upload_delay)
+        if self.flood_limits and method in MESSAGE_METHODS and 'chat_id' in params:
+            self._check_flood(int(params['chat_id']))
+        if method == 'answerCallbackQuery':
+            self._answered(params['callback_query_id'])
+        if method in REPLY_METHODS:
+            if 'callback_query_id' in params:
+                self._replied(params['callback_query_id'])
+            else:
+                self._replied_in_chat(params.get('chat_id'))
+
+        if method == 'getMe':
+            return FAKE_BOT
+        if method == 'setWebhook':
+            self.webhook_url = params.get('url') or None
+            self.secret_token = params.get('secret_token')
+            return True
+        if method == 'deleteWebhook':
+            self.webhook_url = None
+            return True
+        if method == 'getUpdates':
+            return await self._get_updates(int(params.get('offset') or 0), float(params.get('timeout') or 0))
+        if method in ('sendMessage', 'editMessageText', 'sendDocument'):
+            if 'inline_message_id' in params:
+                return True
+            chat_id = int(params['chat_id'])
+            message = {
+                'message_id': int(params.get('message_id') or next(self._message_ids)),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': FAKE_BOT,
+            }
+            if method == 'sendDocument':
+                message['document'] = {'file_id': f'doc{chat_id}', 'file_unique_id': f'doc{chat_id}'}
+            else:
+                message['text'] = params.get('text', '')
+            return message
+        return True
+
+    async def _get_updates(self, offset: int, timeout: float) -> List[dict]:
+        self._pending = [update for update in self._pending if update['update_id'] >= offset]
+        if not self._pending and not self._closing and timeout:
+            async with self._updates:
+                try:
+                    await asyncio.wait_for(self._updates.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        return list(self._pending)
+
+
+async def _with_bot(api: FakeBotApi, config: DeliveryConfig, drive: Callable[[], Any],
+                    inspect: Optional[Callable[[Application], None]] = None, early_answers: bool = True) -> Any:
+    """Запускает бота с обработчиками src.bot.handlers против заглушки и выполняет drive в потоке.
+
+    inspect получает Application после drive, до остановки (например, для статистики).
+    """
+    from src.bot.handlers import register_handlers
+
+    application = build_application(FAKE_TOKEN, config, base_url=api.base_url)
+    register_handlers(application, early_answers)
+    async with application:
+        await application.start()
+        await start_receiving(application, config)
+        try:
+            result = await asyncio.to_thread(drive)
+            if inspect is not None:
+                inspect(application)
+            return result
+        finally:
+            api.release()
+            await application.updater.stop()
+            await application.stop()
+
+
+def _config(mode: str = POLLING, concurrent_updates: int = DeliveryConfig.concurrent_updates,
+            messages_per_second: float = DeliveryConfig.messages_per_second) -> DeliveryConfig:
+    port = free_port()
+    return DeliveryConfig(
+        mode=mode, listen='127.0.0.1', port=port, url_path='secret',
+        webhook_url=f'http://127.0.0.1:{port}', concurrent_updates=concurrent_updates,
+        messages_per_second=messages_per_second
+    )
+
+
+def measure(mode: str, updates: int = 300, warmup: int = 20) -> List[float]:
+    """Задержка от отправки /start до ответа бота в режиме polling или webhook"""
+    api = FakeBotApi()
+    api.start()
+
+    def drive():
+        api.wait_for('setWebhook' if mode == WEBHOOK else 'getUpdates')
+        for _ in range(warmup):
+            api.wait_reply(api.push_message('/start'))
+        api.latencies.clear()
+        # Обновления по одному: замеряется путь доставки, а не очередь
+        for _ in range(updates):
+            api.wait_reply(api.push_message('/start'))
+
+    try:
+        # Обновления идут быстрее лимита Telegram на бота, очередь отправки отключена
+        asyncio.run(_with_bot(api, _config(mode, messages_per_second=0), drive))
+    finally:
+        api.stop()
+    return sorted(api.latencies)
+
+
+def _quantiles(latencies: List[float]) -> str:
+    latencies = sorted(latencies)
+    return ', '.join(
+        f"{name} {latencies[int(quantile * (len(latencies) - 1))] * 1e3:.2f} мс"
+        for name, quantile in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+    )
+
+
+def report(modes=(POLLING, WEBHOOK), updates: int = 300) -> None:
+    """Сравнение задержки update -> ответ в режимах polling и webhook"""
+    for mode in modes:
+        latencies = measure(mode, updates)
+        print(f"{mode:8} {len(latencies)} обновлений: {_quantiles(latencies)}")
+
+
+# Нажатия для замера пропускной способности: переходы по меню разделов
+THROUGHPUT_TAPS = ('java_core', 'spring', 'database', 'docker_k8s', 'algorithms', 'system_design', 'back')
+
+
+def throughput(concurrent_updates: int, taps: int = 1000, delay: float = 0.2) -> Tuple[float, List[float]]:
+    """Пропускная способность на пачке нажатий из разных чатов при задержке Bot API delay.
+
+    Возвращает обновлений в секунду и задержки ответов.
+    """
+    from src.bot.handlers import warm_up
+
+    warm_up()
+    api = FakeBotApi(delay=delay)
+    api.start()
+
+    def drive():
+        api.wait_for('getUpdates')
+        started = time.perf_counter()
+        update_ids = [api.push_callback(THROUGHPUT_TAPS[i % len(THROUGHPUT_TAPS)]) for i in range(taps)]
+        api.wait_all(update_ids)
+        return taps / (time.perf_counter() - started)
+
+    try:
+        # Замеряется обработка, а не лимиты Telegram: очередь отправки отключена
+        rate = asyncio.run(_with_bot(api, _config(POLLING, concurrent_updates, messages_per_second=0), drive))
+    finally:
+        api.stop()
+    return rate, api.latencies
+
+
+def throughput_report(taps: int = 1000, delay: float = 0.2) -> None:
+    """Пропускная способность при 4 одновременных обновлениях против BOT_CONCURRENT_UPDATES.
+
+    4 одновременных обновления лишь эмулируют потоковую модель (4 потока Updater v13):
+    сам v13 в дереве не запускается, и его цифры здесь не воспроизводятся.
+    """
+    for concurrent_updates in (4, DeliveryConfig.concurrent_updates):
+        rate, latencies = throughput(concurrent_updates, taps, delay)
+        print(f"одновременно {concurrent_updates:5}: {taps} нажатий при задержке API {delay * 1e3:.0f} мс - "
+              f"{rate:7.0f} обновлений/с, {_quantiles(latencies)}")
+
+
+def order_check(chats: int = 50, taps_per_chat: int = 20, delay: float = 0.01) -> None:
+    """Проверка: нажатия одного чата обрабатываются по порядку, разные чаты - параллельно"""
+    # Разброс задержки переставил бы ответы, если бы нажатия чата обрабатывались одновременно
+    api = FakeBotApi(delay=delay, jitter=0.9)
+    api.start()
+
+    def drive():
+        api.wait_for('getUpdates')
+        sent: Dict[int, List[int]] = {}
+        started = time.perf_counter()
+        for _ in range(taps_per_chat):
+            for chat_id in range(1, chats + 1):
+                sent.setdefault(chat_id, []).append(api.push_callback('noop', chat_id=chat_id))
+        api.wait_all([update_id for updates in sent.values() for update_id in updates])
+        return sent, time.perf_counter() - started
+
+    try:
+        # Кнопки без действия иначе отвечаются при получении, до очереди чата
+        sent, elapsed = asyncio.run(_with_bot(api, _config(), drive, early_answers=False))
+    finally:
+        api.stop()
+    assert all(api.replies[chat_id] == updates for chat_id, updates in sent.items()), "порядок нарушен"
+    serial = chats * taps_per_chat * delay
+    print(f"{chats} чатов x {taps_per_chat} нажатий: порядок в каждом чате сохранен, "
+          f"{elapsed:.2f} с (последовательно было бы ~{serial:.1f} с)")
+
+
+def lanes_check(chats: int = 20, upload_delay: float = 1.0, delay: float = 0.05) -> None:
+    """Навигация во время экспортов: каждый чат запрашивает Markdown-файл и сразу нажимает кнопку меню.
+
+    Загрузка документа занимает upload_delay, а file_id не принимаются, поэтому
+    каждый экспорт собирается и загружается заново. file_id фиктивных документов
+    пишутся во временное хранилище, а не в export_file_ids.json бота.
+    """
+    from src.bot import handlers, lanes
+    from src.bot.exports import FileIdStore
+    from src.bot.handlers import warm_up
+
+    warm_up()
+    bot_file_ids = handlers.file_ids
+    store_dir = tempfile.TemporaryDirectory()
+    handlers.file_ids = FileIdStore(os.path.join(store_dir.name, 'export_file_ids.json'))
+    api = FakeBotApi(delay=delay, upload_delay=upload_delay, reject_file_ids=True)
+    api.start()
+
+    def drive():
+        api.wait_for('getUpdates')
+        exports, taps = [], []
+        # id чатов не пересекаются с update_id: ответ в чат не засчитывается чужому обновлению
+        for chat_id in range(1_000_001, 1_000_001 + chats):
+            exports.append(api.push_callback('md_database', chat_id=chat_id))
+            taps.append(api.push_callback('noop', chat_id=chat_id))
+        api.wait_all(exports + taps)
+        return exports, taps
+
+    try:
+        # Application.stop() дожидается загрузок, запущенных через create_task
+        exports, taps = asyncio.run(_with_bot(api, _config(), drive))
+    finally:
+        api.stop()
+        handlers.file_ids.flush()
+        handlers.file_ids = bot_file_ids
+        store_dir.cleanup()
+    stats = lanes.stats()
+    print(f"{chats} экспортов с загрузкой {upload_delay * 1e3:.0f} мс, задержка API {delay * 1e3:.0f} мс")
+    print(f"ответ на экспорт:         {_quantiles([api.latency_of[i] for i in exports])}")
+    print(f"нажатие после экспорта:   {_quantiles([api.latency_of[i] for i in taps])}")
+    print(f"легкий лейн: {stats['light']}")
+    print(f"тяжелый лейн: {stats['heavy']}")
+
+
+def flood(messages_per_second: float, chats: int = 100, tappers: int = 10, taps: int = 10,
+          timeout: float = 30) -> None:
+    """Всплеск исходящих сообщений при лимитах Telegram: /start из chats новых чатов (новые
+    сообщения) и по taps переходов по меню подряд в tappers чатах (правки сообщений)"""
+    from src.bot.handlers import warm_up
+
+    warm_up()
+    api = FakeBotApi(flood_limits=True)
+    api.start()
+    scheduler_stats = {}
+
+    def drive():
+        api.wait_for('getUpdates')
+        starts = [api.push_message('/start') for _ in range(chats)]
+        edits = [
+            api.push_callback(THROUGHPUT_TAPS[tap % 2], chat_id=chat_id)
+            for tap in range(taps)
+            for chat_id in range(2_000_001, 2_000_001 + tappers)
+        ]
+        deadline = time.monotonic() + timeout
+        lost = 0
+        for update_id in starts + edits:
+            try:
+                api.wait_reply(update_id, max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                lost += 1
+        return starts, edits, lost
+
+    def inspect(application: Application) -> None:
+        if application.bot.rate_limiter is not None:
+            scheduler_stats.update(application.bot.rate_limiter.stats())
+
+    try:
+        starts, edits, lost = asyncio.run(
+            _with_bot(api, _config(messages_per_second=messages_per_second), drive, inspect)
+        )
+    finally:
+        api.stop()
+    title = f"очередь отправки {messages_per_second:.0f}/с" if messages_per_second else "без очереди отправки"
+    print(f"{title}: ответов 429 - {api.flood_errors}, без ответа за {timeout:.0f} с - {lost} "
+          f"из {len(starts) + len(edits)}")
+    for name, update_ids in (('новые сообщения', starts), ('правки', edits)):
+        latencies = [api.latency_of[i] for i in update_ids if i in api.latency_of]
+        if latencies:
+            print(f"  {name}: {_quantiles(latencies)}")
+    if scheduler_stats:
+        print(f"  очередь: {scheduler_stats}")
+
+
+def flood_report() -> None:
+    """Сравнение всплеска без очереди отправки и с корзинами токенов"""
+    for messages_per_second in (0, DeliveryConfig.messages_per_second):
+        flood(messages_per_second)
+
+
+def spinner(early_answers: bool, taps: int = 200, rate: float = 40, delay: float = 0.2,
+            retap_after: float = 1.0) -> None:
+    """Индикатор загрузки на кнопке: время до answerCallbackQuery и повторные нажатия нетерпеливых
+    пользователей (повтор через retap_after без ответа); rate нажатий в секунду, задержка Bot API delay"""
+    from src.bot.handlers import callback_answers, warm_up
+
+    warm_up()
+    api = FakeBotApi(delay=delay, retap_after=retap_after)
+    api.start()
+    before = callback_answers.stats()
+
+    def drive():
+        api.wait_for('getUpdates')
+        update_ids = []
+        for i in range(taps):
+            update_ids.append(api.push_callback(THROUGHPUT_TAPS[i % len(THROUGHPUT_TAPS)]))
+            time.sleep(1 / rate)
+        api.wait_all(update_ids)
+        # Повторные нажатия приходят через retap_after и тоже обрабатываются
+        time.sleep(retap_after + 4 * delay)
+        return update_ids
+
+    try:
+        # Очередь отправки отключена: все нажатия из разных чатов, замеряются ответы на них
+        update_ids = asyncio.run(_with_bot(api, _config(messages_per_second=0), drive, early_answers=early_answers))
+    finally:
+        api.stop()
+    answered = [api.answer_latency[i] for i in update_ids if i in api.answer_latency]
+    title = "ранний ответ" if early_answers else "без раннего ответа"
+    print(f"{title}: {taps} нажатий, индикатор остановлен у {len(answered)}, повторных нажатий {api.retaps}, "
+          f"правок сообщений {api.calls.get('editMessageText', 0)}")
+    if answered:
+        print(f"  до answerCallbackQuery: {_quantiles(answered)}")
+    after = callback_answers.stats()
+    print(f"  CallbackAnswers: нажатий {after['taps'] - before['taps']}, "
+          f"повторных {after['duplicates'] - before['duplicates']}")
+
+
+def spinner_report() -> None:
+    """Сравнение без раннего ответа на нажатия и с ним"""
+    for early_answers in (False, True):
+        spinner(early_answers)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    command = sys.argv[1:] or [POLLING, WEBHOOK]
+    if command == ['throughput']:
+        throughput_report()
+    elif command == ['order']:
+        order_check()
+    elif command == ['lanes']:
+        lanes_check()
+    elif command == ['flood']:
+        flood_report()
+    elif command == ['spinner']:
+        spinner_report()
+    else:
+        report(tuple(command))
@@ -1,24 +1,41 @@
+import io
 import os
+import asyncio
 import logging
-import re
-import html
+import functools
+import threading
+from typing import Tuple
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ParseMode
-from telegram.ext import Updater, CommandHandler, CallbackQueryHandler, CallbackContext
+from telegram import (
+    Update,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InputTextMessageContent
+)
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, Forbidden
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, InlineQueryHandler, CallbackContext
 from src.models import Question
-from src.cards import (
-    JAVA_CORE_CARDS,
-    SPRING_CARDS,
-    DATABASE_CARDS,
-    DOCKER_K8S_CARDS,
-    ALGORITHMS
+from src.cards.catalog import get_algorithm_catalog
+from src.cards.loader import load_section, warm_up as load_all_sections
+from src.cards.registry import CARD_REGISTRY, SECTION_TITLES, CardRef
+from src.cards.search import build_indexes, get_search_index, get_title_index
+from src.theory_links import BASE_URL, card_url
+from src.bot.delivery import DeliveryConfig, build_application, run_application
+from src.bot import lanes
+from src.bot.callbacks import CallbackAnswers
+from src.bot.exports import cards_hash, document_key, exports, file_ids
+from src.bot.keyboards import keyboards
+from src.bot.router import Router, index, paged
+from src.bot.render import (
+    NOOP_CALLBACK,
+    RenderedCard,
+    deep_link,
+    render_algorithm,
+    render_cache,
+    render_question
 )
-from src.cards.algorithms import ALGORITHMS
-from src.cards.system_design import SYSTEM_DESIGN_CARDS
-import tempfile
-from pygments import highlight
-from pygments.lexers import get_lexer_by_name
-from pygments.formatters import HtmlFormatter
 
 # Настройка логирования
 logging.basicConfig(
@@ -31,104 +48,44 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 TOKEN = os.getenv('TELEGRAM_TOKEN')
 
-CATEGORIES = {
-    "algorithms": {
-        "name": "🔄 Алгоритмы",
-        "cards": ALGORITHMS
-    },
-    "system_design": {
-        "name": "🏗 System Design",
-        "cards": SYSTEM_DESIGN_CARDS
-    }
+# Разделы с темами: язык блоков кода по умолчанию и режим разметки
+TOPIC_SECTIONS = {
+    'java_core': ('java', ParseMode.MARKDOWN_V2),
+    'spring': ('java', ParseMode.MARKDOWN_V2),
+    'database': ('sql', ParseMode.MARKDOWN_V2),
+    'docker_k8s': ('yaml', ParseMode.MARKDOWN_V2),
+    'system_design': (None, ParseMode.MARKDOWN_V2),
 }
 
-def error_handler(update: Update, context: CallbackContext):
+# Маршрутизатор callback_data, обработчики регистрируются декоратором @router.route
+router = Router()
+
+# Ранние ответы на нажатия и счетчик повторных нажатий
+callback_answers = CallbackAnswers(router, NOOP_CALLBACK)
+
+# Прогрев при старте: загрузить все разделы, построить меню и отрендерить карточки.
+# По умолчанию разделы загружаются лениво, при первом обращении
+WARMUP = os.getenv('CARDS_WARMUP', '').lower() in ('1', 'true', 'yes')
+
+# Ранний ответ на нажатия кнопок до обработки (CALLBACK_EARLY_ANSWERS=0 отключает)
+EARLY_ANSWERS = os.getenv('CALLBACK_EARLY_ANSWERS', '1').lower() in ('1', 'true', 'yes')
+
+# Имя бота для ссылок t.me/<имя>?start=<id карточки>; без него кнопка «Поделиться» не показывается
+BOT_USERNAME = os.getenv('BOT_USERNAME')
+
+# Период записи статистики очередей в лог, секунды (BOT_STATS_INTERVAL=0 отключает)
+STATS_INTERVAL = int(os.getenv('BOT_STATS_INTERVAL', '300'))
+
+async def error_handler(update: Update, context: CallbackContext):
     """Обработчик ошибок"""
     logger.error(f"Update {update} caused error {context.error}")
     if update and update.effective_message:
-        update.effective_message.reply_text(
+        await update.effective_message.reply_text(
             "Произошла ошибка при обработке запроса. Пожалуйста, попробуйте еще раз или начните сначала с помощью команды /start"
         )
 
-def create_full_theory_markdown() -> str:
-    """Создает Markdown файл со всей теорией из всех разделов"""
-    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.md', encoding='utf-8') as tmp_file:
-        # Заголовок документа
-        tmp_file.write('# Полная теория по всем разделам\n\n')
-        
-        # Java Core
-        tmp_file.write('# Java Core\n\n')
-        for card in JAVA_CORE_CARDS:
-            tmp_file.write(f'## {card.text}\n\n')
-            tmp_file.write('### Теория\n')
-            tmp_file.write(f'{card.theory}\n\n')
-            tmp_file.write('### Практические примеры\n')
-            tmp_file.write(f'{card.explanation}\n\n')
-            tmp_file.write('---\n\n')
-        
-        # Spring Framework
-        tmp_file.write('# Spring Framework\n\n')
-        for card in SPRING_CARDS:
-            tmp_file.write(f'## {card.text}\n\n')
-            tmp_file.write('### Теория\n')
-            tmp_file.write(f'{card.theory}\n\n')
-            tmp_file.write('### Практические примеры\n')
-            tmp_file.write(f'{card.explanation}\n\n')
-            tmp_file.write('---\n\n')
-        
-        # Базы данных
-        tmp_file.write('# Базы данных\n\n')
-        for card in DATABASE_CARDS:
-            tmp_file.write(f'## {card.text}\n\n')
-            tmp_file.write('### Теория\n')
-            tmp_file.write(f'{card.theory}\n\n')
-            tmp_file.write('### Практические примеры\n')
-            tmp_file.write(f'{card.explanation}\n\n')
-            tmp_file.write('---\n\n')
-        
-        # Docker и Kubernetes
-        tmp_file.write('# Docker и Kubernetes\n\n')
-        for card in DOCKER_K8S_CARDS:
-            tmp_file.write(f'## {card.text}\n\n')
-            tmp_file.write('### Теория\n')
-            tmp_file.write(f'{card.theory}\n\n')
-            tmp_file.write('### Практические примеры\n')
-            tmp_file.write(f'{card.explanation}\n\n')
-            tmp_file.write('---\n\n')
-        
-        # Алгоритмы
-        tmp_file.write('# Алгоритмы\n\n')
-        for algo in ALGORITHMS:
-            tmp_file.write(f'## {algo.title}\n\n')
-            tmp_file.write('### Описание\n')
-            tmp_file.write(f'{algo.description}\n\n')
-            tmp_file.write('### Сложность\n')
-            tmp_file.write(f'{algo.complexity}\n\n')
-            tmp_file.write('### Теория\n')
-            tmp_file.write(f'{algo.theory}\n\n')
-            if algo.examples:
-                tmp_file.write('### Примеры\n')
-                for i, example in enumerate(algo.examples, 1):
-                    tmp_file.write(f'#### Пример {i}\n')
-                    tmp_file.write(f'- Вход: `{example.input_data}`\n')
-                    tmp_file.write(f'- Выход: `{example.output_data}`\n')
-                    tmp_file.write(f'- Объяснение: {example.explanation}\n\n')
-            tmp_file.write('### Реализация на Java\n```java\n')
-            tmp_file.write(f'{algo.java_code}\n```\n\n')
-            if algo.python_code:
-                tmp_file.write('### Реализация на Python\n```python\n')
-                tmp_file.write(f'{algo.python_code}\n```\n\n')
-            if algo.leetcode_problems:
-                tmp_file.write('### Задачи на LeetCode\n')
-                for problem in algo.leetcode_problems:
-                    tmp_file.write(f'- {problem}\n')
-                tmp_file.write('\n')
-            tmp_file.write('---\n\n')
-        
-        return tmp_file.name
-
-def start(update: Update, context: CallbackContext) -> None:
-    """Обработчик команды /start"""
+def build_main_keyboard() -> list:
+    """Клавиатура главного меню; ссылка на сайт теории - только если задан его публичный адрес"""
     keyboard = [
         [InlineKeyboardButton("Java Core", callback_data='java_core')],
         [InlineKeyboardButton("Spring Framework", callback_data='spring')],
@@ -136,656 +93,745 @@ def start(update: Update, context: CallbackContext) -> None:
         [InlineKeyboardButton("Docker & Kubernetes", callback_data='docker_k8s')],
         [InlineKeyboardButton("Алгоритмы", callback_data='algorithms')],
         [InlineKeyboardButton("🏗 System Design", callback_data='system_design')],
-        [InlineKeyboardButton("📝 Скачать всю теорию", callback_data='md_full')]
     ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    if BASE_URL:
+        keyboard.append([InlineKeyboardButton("📝 Скачать всю теорию", callback_data='md_full')])
+    return keyboard
+
+def configure_deep_links(bot) -> None:
+    """Определяет имя бота для ссылок на карточки, если оно не задано в BOT_USERNAME.
+
+    Вызывается после getMe (инициализации бота) и до прогрева кешей:
+    ссылка входит в отрендеренную карточку.
+    """
+    global BOT_USERNAME
+    if not BOT_USERNAME:
+        BOT_USERNAME = bot.username
+
+async def open_card_link(update: Update, card_id: str) -> bool:
+    """Показывает карточку по ссылке /start <id карточки> одним сообщением"""
+    ref = CARD_REGISTRY.find(card_id)
+    if ref is None:
+        return False
+    rendered = render_card(ref)
+    await update.message.reply_text(
+        rendered.pages[0],
+        reply_markup=rendered.markups[0],
+        parse_mode=rendered.parse_mode
+    )
+    return True
+
+@router.route('back')
+async def start(update: Update, context: CallbackContext) -> None:
+    """Обработчик команды /start; /start <id карточки> сразу открывает карточку"""
+    reply_markup = keyboards.get('main')
+
+    if update.message and context.args:
+        if await open_card_link(update, context.args[0]):
+            return
+        await update.message.reply_text("Карточка по ссылке не найдена, выберите раздел:", reply_markup=reply_markup)
+        return
     
     if update.callback_query:
-        update.callback_query.edit_message_text(
+        await update.callback_query.edit_message_text(
             'Привет! Я бот для подготовки к собеседованиям по Java и смежным технологиям.\n'
             'Выберите раздел для изучения:',
             reply_markup=reply_markup
         )
     else:
-        update.message.reply_text(
+        await update.message.reply_text(
             'Привет! Я бот для подготовки к собеседованиям по Java и смежным технологиям.\n'
             'Выберите раздел для изучения:',
             reply_markup=reply_markup
         )
 
-def show_java_core_menu(update: Update, context: CallbackContext) -> None:
-    """Показать меню тем Java Core"""
+# Число карточек в ответе на /search
+SEARCH_RESULTS = 8
+
+async def search(update: Update, context: CallbackContext) -> None:
+    """Обработчик команды /search <запрос>: карточки по релевантности с кнопками перехода"""
+    query = ' '.join(context.args or []).strip()
+    if not query:
+        await update.message.reply_text("Использование: /search <запрос>, например: /search бинарный поиск")
+        return
+
+    # Индекс строится при первом поиске (загрузка всех разделов) - не в цикле событий
+    index = await asyncio.to_thread(get_search_index)
+    results = index.search(query, limit=SEARCH_RESULTS)
+    if not results:
+        await update.message.reply_text(f"По запросу «{query}» ничего не найдено")
+        return
+
+    lines = [f"Результаты поиска «{query}»:"]
     keyboard = []
-    for i, card in enumerate(JAVA_CORE_CARDS):
+    for i, result in enumerate(results, 1):
+        ref = result.ref
+        lines.append(f"{i}. {ref.title} — {SECTION_TITLES[ref.section]}")
+        keyboard.append([InlineKeyboardButton(f"{i}. {ref.title}", callback_data=f'c_{ref.id}')])
+    await update.message.reply_text('\n'.join(lines), reply_markup=InlineKeyboardMarkup(keyboard))
+
+# Инлайн-режим: не больше 50 результатов на ответ (ограничение Telegram);
+# карточки меняются только с релизом, поэтому Telegram может держать ответы у себя
+INLINE_RESULTS = 50
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', '300'))
+
+# Готовые результаты инлайн-режима по идентификатору карточки
+_inline_results = {}
+_inline_lock = threading.Lock()
+
+def inline_result(ref: CardRef) -> InlineQueryResultArticle:
+    """Результат инлайн-режима с первой страницей карточки, собирается один раз"""
+    result = _inline_results.get(ref.id)
+    if result is None:
+        rendered = render_card(ref)
+        result = InlineQueryResultArticle(
+            id=ref.id,
+            title=ref.title,
+            description=SECTION_TITLES[ref.section],
+            input_message_content=InputTextMessageContent(rendered.pages[0], parse_mode=rendered.parse_mode),
+            reply_markup=rendered.markups[0]
+        )
+        with _inline_lock:
+            result = _inline_results.setdefault(ref.id, result)
+    return result
+
+def inline_results(text: str) -> list:
+    """Результаты инлайн-режима по запросу; первый запрос строит индекс заголовков"""
+    refs = get_title_index().search(text, limit=INLINE_RESULTS)
+    return [inline_result(ref) for ref in refs]
+
+async def inline_query(update: Update, context: CallbackContext) -> None:
+    """Обработчик инлайн-запросов @bot <запрос>: карточки по префиксам слов заголовка"""
+    # Индекс и результаты собираются лениво и могут загружать разделы - не в цикле событий
+    results = await asyncio.to_thread(inline_results, update.inline_query.query)
+    await update.inline_query.answer(
+        results,
+        cache_time=INLINE_CACHE_TIME,
+        auto_pagination=False
+    )
+
+def build_java_core_keyboard() -> list:
+    """Клавиатура меню тем Java Core"""
+    keyboard = []
+    for ref in CARD_REGISTRY.section('java_core'):
         keyboard.append([InlineKeyboardButton(
-            card.text,
-            callback_data=f'java_topic_{i}'
+            ref.title,
+            callback_data=f'c_{ref.id}'
         )])
     keyboard.append([InlineKeyboardButton("Назад", callback_data='back')])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    update.callback_query.edit_message_text(
+    return keyboard
+
+@router.route('java_core')
+async def show_java_core_menu(update: Update, context: CallbackContext) -> None:
+    """Показать меню тем Java Core"""
+    reply_markup = menu_keyboard('java_core')
+    await update.callback_query.edit_message_text(
         text="Выберите тему по Java Core:",
         reply_markup=reply_markup
     )
 
-def show_spring_menu(update: Update, context: CallbackContext) -> None:
-    """Показать меню тем Spring"""
+def build_spring_keyboard() -> list:
+    """Клавиатура меню тем Spring"""
     keyboard = []
-    for i, card in enumerate(SPRING_CARDS):
+    for ref in CARD_REGISTRY.section('spring'):
         keyboard.append([InlineKeyboardButton(
-            card.text,
-            callback_data=f'spring_topic_{i}'
+            ref.title,
+            callback_data=f'c_{ref.id}'
         )])
     keyboard.append([InlineKeyboardButton("Назад", callback_data='back')])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    update.callback_query.edit_message_text(
+    return keyboard
+
+@router.route('spring')
+async def show_spring_menu(update: Update, context: CallbackContext) -> None:
+    """Показать меню тем Spring"""
+    reply_markup = menu_keyboard('spring')
+    await update.callback_query.edit_message_text(
         text="Выберите тему по Spring:",
         reply_markup=reply_markup
     )
 
 def create_database_markdown(cards) -> str:
-    """Создает Markdown файл с теорией по базам данных"""
-    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.md', encoding='utf-8') as tmp_file:
-        tmp_file.write('# Теория по базам данных\n\n')
+    """Собирает Markdown с теорией по базам данных"""
+    buffer = io.StringIO()
+    buffer.write('# Теория по базам данных\n\n')
+    
+    for card in cards:
+        # Заголовок темы
+        buffer.write(f'## {card.text}\n\n')
+        
+        # Теория
+        buffer.write('### Теория\n')
+        buffer.write(f'{card.theory}\n\n')
         
-        for card in cards:
-            # Заголовок темы
-            tmp_file.write(f'## {card.text}\n\n')
-            
-            # Теория
-            tmp_file.write('### Теория\n')
-            tmp_file.write(f'{card.theory}\n\n')
-            
-            # Примеры
-            tmp_file.write('### Практические примеры\n')
-            tmp_file.write(f'{card.explanation}\n\n')
-            
-            # Разделитель между темами
-            tmp_file.write('---\n\n')
+        # Примеры
+        buffer.write('### Практические примеры\n')
+        buffer.write(f'{card.explanation}\n\n')
         
-        return tmp_file.name
+        # Разделитель между темами
+        buffer.write('---\n\n')
+    
+    return buffer.getvalue()
 
-def show_database_menu(update: Update, context: CallbackContext) -> None:
-    """Показать меню тем по базам данных"""
+def build_database_keyboard() -> list:
+    """Клавиатура меню тем по базам данных"""
     keyboard = []
-    for i, card in enumerate(DATABASE_CARDS):
+    for ref in CARD_REGISTRY.section('database'):
         keyboard.append([InlineKeyboardButton(
-            card.text,
-            callback_data=f'database_topic_{i}'
+            ref.title,
+            callback_data=f'c_{ref.id}'
         )])
     
     # Добавляем кнопку для скачивания теории
     keyboard.append([InlineKeyboardButton("📝 Скачать теорию в Markdown", callback_data="md_database")])
     keyboard.append([InlineKeyboardButton("Назад", callback_data='back')])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    update.callback_query.edit_message_text(
+    return keyboard
+
+@router.route('database')
+async def show_database_menu(update: Update, context: CallbackContext) -> None:
+    """Показать меню тем по базам данных"""
+    reply_markup = menu_keyboard('database')
+    await update.callback_query.edit_message_text(
         text="Выберите тему по базам данных:",
         reply_markup=reply_markup
     )
 
 def create_docker_k8s_markdown(cards) -> str:
-    """Создает Markdown файл с теорией по Docker и Kubernetes"""
-    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.md', encoding='utf-8') as tmp_file:
-        tmp_file.write('# Теория по Docker и Kubernetes\n\n')
+    """Собирает Markdown с теорией по Docker и Kubernetes"""
+    buffer = io.StringIO()
+    buffer.write('# Теория по Docker и Kubernetes\n\n')
+    
+    for card in cards:
+        # Заголовок темы
+        buffer.write(f'## {card.text}\n\n')
         
-        for card in cards:
-            # Заголовок темы
-            tmp_file.write(f'## {card.text}\n\n')
-            
-            # Теория
-            tmp_file.write('### Теория\n')
-            tmp_file.write(f'{card.theory}\n\n')
-            
-            # Примеры
-            tmp_file.write('### Практические примеры\n')
-            tmp_file.write(f'{card.explanation}\n\n')
-            
-            # Разделитель между темами
-            tmp_file.write('---\n\n')
+        # Теория
+        buffer.write('### Теория\n')
+        buffer.write(f'{card.theory}\n\n')
         
-        return tmp_file.name
+        # Примеры
+        buffer.write('### Практические примеры\n')
+        buffer.write(f'{card.explanation}\n\n')
+        
+        # Разделитель между темами
+        buffer.write('---\n\n')
+    
+    return buffer.getvalue()
 
-def show_docker_k8s_menu(update: Update, context: CallbackContext) -> None:
-    """Показать меню тем по Docker и Kubernetes"""
+def build_docker_k8s_keyboard() -> list:
+    """Клавиатура меню тем по Docker и Kubernetes"""
     keyboard = []
-    for i, card in enumerate(DOCKER_K8S_CARDS):
+    for ref in CARD_REGISTRY.section('docker_k8s'):
         keyboard.append([InlineKeyboardButton(
-            card.text,
-            callback_data=f'docker_k8s_topic_{i}'
+            ref.title,
+            callback_data=f'c_{ref.id}'
         )])
     
     # Добавляем кнопку для скачивания теории
     keyboard.append([InlineKeyboardButton("📝 Скачать теорию в Markdown", callback_data="md_docker_k8s")])
     keyboard.append([InlineKeyboardButton("Назад", callback_data='back')])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    update.callback_query.edit_message_text(
+    return keyboard
+
+@router.route('docker_k8s')
+async def show_docker_k8s_menu(update: Update, context: CallbackContext) -> None:
+    """Показать меню тем по Docker и Kubernetes"""
+    reply_markup = menu_keyboard('docker_k8s')
+    await update.callback_query.edit_message_text(
         text="Выберите тему по Docker и Kubernetes:",
         reply_markup=reply_markup
     )
 
-def show_algorithms_menu(update: Update, context: CallbackContext) -> None:
-    """Показывает меню алгоритмов"""
-    query = update.callback_query
-    query.answer()
-    
-    # Группируем алгоритмы по категориям
-    categories = {}
-    for algo in ALGORITHMS:
-        if algo.category not in categories:
-            categories[algo.category] = []
-        categories[algo.category].append(algo)
-    
+def build_algorithms_keyboard() -> list:
+    """Клавиатура меню категорий алгоритмов"""
     keyboard = []
     # Добавляем кнопки по категориям
-    for category, algos in categories.items():
+    for category in get_algorithm_catalog().categories():
         keyboard.append([InlineKeyboardButton(
-            f"📚 {category.capitalize()} ({len(algos)})",
+            f"📚 {category.capitalize()} ({len(get_algorithm_catalog().by_category(category))})",
             callback_data=f"cat_{category}"
         )])
     
     keyboard.append([InlineKeyboardButton("◀️ Назад", callback_data="back")])
+    return keyboard
+
+@router.route('algorithms')
+async def show_algorithms_menu(update: Update, context: CallbackContext) -> None:
+    """Показывает меню алгоритмов"""
+    query = update.callback_query
+    await callback_answers.answer(update)
     
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    query.edit_message_text(
+    reply_markup = menu_keyboard('algorithms')
+    await query.edit_message_text(
         text="Выберите категорию алгоритмов:",
         reply_markup=reply_markup
     )
 
-def escape_markdown(text: str) -> str:
-    """Экранирует специальные символы Markdown"""
-    # Список всех специальных символов Markdown
-    escape_chars = r'_*[]()~`>#+-=|{}.!'
-    
-    # Сначала экранируем обратный слеш
-    text = text.replace('\\', '\\\\')
-    
-    # Затем экранируем все остальные специальные символы
-    for char in escape_chars:
-        text = text.replace(char, f'\\{char}')
-    
-    return text
-
-def create_theory_markdown(algorithms, category: str) -> str:
-    """Создает Markdown файл с теорией по категории алгоритмов"""
-    # Создаем временный файл
-    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.md', encoding='utf-8') as tmp_file:
-        # Записываем заголовок
-        tmp_file.write(f'# Теория по разделу: {category.capitalize()}\n\n')
+def create_theory_markdown(category: str) -> str:
+    """Собирает Markdown с теорией по категории алгоритмов"""
+    buffer = io.StringIO()
+    # Записываем заголовок
+    buffer.write(f'# Теория по разделу: {category.capitalize()}\n\n')
+    
+    # Добавляем содержание для каждого алгоритма
+    for entry in get_algorithm_catalog().by_category(category):
+        algo = entry.algorithm
+        # Заголовок алгоритма
+        buffer.write(f'## {algo.title}\n\n')
         
-        # Добавляем содержание для каждого алгоритма
-        for algo in algorithms:
-            if algo.category == category:
-                # Заголовок алгоритма
-                tmp_file.write(f'## {algo.title}\n\n')
-                
-                # Описание
-                tmp_file.write(f'### Описание\n{algo.description}\n\n')
-                
-                # Сложность
-                tmp_file.write(f'### Сложность\n{algo.complexity}\n\n')
-                
-                # Теория
-                tmp_file.write(f'### Теория\n{algo.theory}\n\n')
-                
-                # Примеры
-                if algo.examples:
-                    tmp_file.write('### Примеры\n')
-                    for i, example in enumerate(algo.examples, 1):
-                        tmp_file.write(f'#### Пример {i}\n')
-                        tmp_file.write(f'- Вход: `{example.input_data}`\n')
-                        tmp_file.write(f'- Выход: `{example.output_data}`\n')
-                        tmp_file.write(f'- Объяснение: {example.explanation}\n\n')
-                
-                # Код на Java
-                tmp_file.write('### Реализация на Java\n```java\n')
-                tmp_file.write(algo.java_code)
-                tmp_file.write('\n```\n\n')
-                
-                # Код на Python (если есть)
-                if algo.python_code:
-                    tmp_file.write('### Реализация на Python\n```python\n')
-                    tmp_file.write(algo.python_code)
-                    tmp_file.write('\n```\n\n')
-                
-                # Задачи на LeetCode
-                if algo.leetcode_problems:
-                    tmp_file.write('### Задачи на LeetCode\n')
-                    for problem in algo.leetcode_problems:
-                        tmp_file.write(f'- {problem}\n')
-                    tmp_file.write('\n')
-                
-                # Визуализация
-                tmp_file.write(f'### Визуализация\n{algo.visualization_url}\n\n')
-                
-                # Разделитель между алгоритмами
-                tmp_file.write('---\n\n')
+        # Описание
+        buffer.write(f'### Описание\n{algo.description}\n\n')
         
-        return tmp_file.name
-
-def show_algorithm_category(update: Update, context: CallbackContext, category: str) -> None:
-    """Показывает список алгоритмов в категории"""
-    query = update.callback_query
+        # Сложность
+        buffer.write(f'### Сложность\n{algo.complexity}\n\n')
+        
+        # Теория
+        buffer.write(f'### Теория\n{algo.theory}\n\n')
+        
+        # Примеры
+        if algo.examples:
+            buffer.write('### Примеры\n')
+            for i, example in enumerate(algo.examples, 1):
+                buffer.write(f'#### Пример {i}\n')
+                buffer.write(f'- Вход: `{example.input_data}`\n')
+                buffer.write(f'- Выход: `{example.output_data}`\n')
+                buffer.write(f'- Объяснение: {example.explanation}\n\n')
+        
+        # Код на Java
+        buffer.write('### Реализация на Java\n```java\n')
+        buffer.write(algo.java_code)
+        buffer.write('\n```\n\n')
+        
+        # Код на Python (если есть)
+        if algo.python_code:
+            buffer.write('### Реализация на Python\n```python\n')
+            buffer.write(algo.python_code)
+            buffer.write('\n```\n\n')
+        
+        # Задачи на LeetCode
+        if algo.leetcode_problems:
+            buffer.write('### Задачи на LeetCode\n')
+            for problem in algo.leetcode_problems:
+                buffer.write(f'- {problem}\n')
+            buffer.write('\n')
+        
+        # Визуализация
+        buffer.write(f'### Визуализация\n{algo.visualization_url}\n\n')
+        
+        # Разделитель между алгоритмами
+        buffer.write('---\n\n')
     
+    return buffer.getvalue()
+
+def build_algorithm_category_keyboard(category: str) -> list:
+    """Клавиатура списка алгоритмов категории"""
     keyboard = []
-    for i, algo in enumerate(ALGORITHMS):
-        if algo.category == category:
-            difficulty_emoji = "🟢" if algo.difficulty == "easy" else "🟡" if algo.difficulty == "medium" else "🔴"
-            keyboard.append([InlineKeyboardButton(
-                f"{difficulty_emoji} {algo.title}",
-                callback_data=f"a_{i}"
-            )])
+    for entry in get_algorithm_catalog().by_category(category):
+        algo = entry.algorithm
+        difficulty_emoji = "🟢" if algo.difficulty == "easy" else "🟡" if algo.difficulty == "medium" else "🔴"
+        keyboard.append([InlineKeyboardButton(
+            f"{difficulty_emoji} {algo.title}",
+            callback_data=f"c_{entry.id}"
+        )])
     
     # Добавляем кнопку для создания Markdown
     keyboard.append([InlineKeyboardButton("📝 Скачать теорию в Markdown", callback_data=f"md_{category}")])
     keyboard.append([InlineKeyboardButton("◀️ Назад к категориям", callback_data="algorithms")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    query.edit_message_text(
+    return keyboard
+
+@router.route('cat_', str)
+async def show_algorithm_category(update: Update, context: CallbackContext, category: str) -> None:
+    """Показывает список алгоритмов в категории"""
+    query = update.callback_query
+    if category not in get_algorithm_catalog().categories():
+        # Клавиатура регистрируется только для категорий каталога, а не для любого cat_<x>
+        await callback_answers.answer(update, "Категория не найдена. Откройте раздел заново через /start")
+        return
+
+    reply_markup = keyboards.get_or_register(
+        f'cat_{category}', lambda: build_algorithm_category_keyboard(category)
+    )
+    await query.edit_message_text(
         text=f"Алгоритмы в категории {category.capitalize()}:",
         reply_markup=reply_markup
     )
 
-def show_algorithm(update: Update, context: CallbackContext, algo_index: int) -> None:
-    """Показывает детальную информацию об алгоритме"""
-    query = update.callback_query
-    algo = ALGORITHMS[algo_index]
-    
-    # Формируем текст сообщения с HTML форматированием
-    message = f"<b>{html.escape(algo.title)}</b>\n\n"
-    message += f"📝 <b>Описание:</b>\n{html.escape(algo.description)}\n\n"
-    message += f"⚡️ <b>Сложность:</b>\n{html.escape(algo.complexity)}\n\n"
-    message += f"📚 <b>Теория:</b>\n{html.escape(algo.theory)}\n\n"
-    message += f"🔗 <b>Визуализация:</b>\n{html.escape(algo.visualization_url)}\n\n"
-    
-    # Код обрабатываем отдельно
-    message += f"💻 <b>Java код:</b>\n<pre>{html.escape(algo.java_code)}</pre>\n\n"
-    
-    if algo.python_code:
-        message += f"🐍 <b>Python код:</b>\n<pre>{html.escape(algo.python_code)}</pre>\n\n"
-    
-    if algo.examples:
-        message += "<b>Примеры:</b>\n"
-        for i, example in enumerate(algo.examples, 1):
-            message += f"\nПример {i}:\n"
-            message += f"Вход: <code>{html.escape(example.input_data)}</code>\n"
-            message += f"Выход: <code>{html.escape(example.output_data)}</code>\n"
-            message += f"Объяснение: {html.escape(example.explanation)}\n"
-    
-    if algo.leetcode_problems:
-        message += "\n<b>Задачи на LeetCode:</b>\n"
-        for problem in algo.leetcode_problems:
-            message += f"• {html.escape(problem)}\n"
-    
-    # Создаем клавиатуру
-    keyboard = [
-        [InlineKeyboardButton("◀️ Назад к списку", callback_data=f"cat_{algo.category}")],
-        [InlineKeyboardButton("◀️ В главное меню", callback_data="back")]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Отправляем сообщение частями из-за ограничений Telegram
-    if len(message) > 4096:
-        parts = [message[i:i+4096] for i in range(0, len(message), 4096)]
-        for i, part in enumerate(parts):
-            if i == 0:
-                query.edit_message_text(
-                    text=part,
-                    reply_markup=reply_markup if i == len(parts)-1 else None,
-                    parse_mode=ParseMode.HTML
-                )
-            else:
-                query.message.reply_text(
-                    text=part,
-                    reply_markup=reply_markup if i == len(parts)-1 else None,
-                    parse_mode=ParseMode.HTML
-                )
-    else:
-        query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.HTML
+@router.route('c_', paged(str))
+async def show_card_by_id(update: Update, context: CallbackContext, card_ref: Tuple[str, int]) -> None:
+    """Показывает карточку любого раздела по ее стабильному идентификатору"""
+    card_id, page = card_ref
+    ref = CARD_REGISTRY.find(card_id)
+    if ref is None:
+        await callback_answers.answer(update, "Карточка не найдена. Откройте раздел заново через /start")
+        return
+    await send_rendered_card(update.callback_query, render_card(ref), page)
+
+@router.route('a_', paged(index))
+async def show_algorithm(update: Update, context: CallbackContext, algo_ref: Tuple[int, int]) -> None:
+    """Показывает алгоритм по позиции в списке (кнопки старого формата)"""
+    await show_topic(update, context, 'algorithms', algo_ref)
+
+@router.route(NOOP_CALLBACK)
+async def ignore_button(update: Update, context: CallbackContext) -> None:
+    """Обработчик кнопок без действия (номер страницы), если на них не ответил CallbackAnswers"""
+    await callback_answers.answer(update)
+
+async def send_rendered_card(query, rendered: RenderedCard, page: int = 0) -> None:
+    """Показывает страницу отрендеренной карточки, редактируя текущее сообщение"""
+    page = max(0, min(page, len(rendered.pages) - 1))
+    try:
+        await query.edit_message_text(
+            text=rendered.pages[page],
+            reply_markup=rendered.markups[page],
+            parse_mode=rendered.parse_mode
         )
+    except BadRequest as e:
+        # Повторное нажатие на ту же страницу - сообщение уже актуально
+        if 'not modified' not in str(e):
+            raise
+
+def render_card(ref: CardRef) -> RenderedCard:
+    """Возвращает отрендеренную карточку из кеша; страницы листаются через c_<id>:<page>"""
+    share_url = deep_link(BOT_USERNAME, ref.id) if BOT_USERNAME else None
+    site_url = card_url(ref.id)
+    if ref.section == 'algorithms':
+        return render_algorithm(ref.card, f"c_{ref.id}", share_url, site_url)
+    language, parse_mode = TOPIC_SECTIONS[ref.section]
+    return render_question(ref.card, language, ref.section, parse_mode, f"c_{ref.id}", share_url, site_url)
+
+async def show_topic(update: Update, context: CallbackContext, section: str, topic_ref: Tuple[int, int]) -> None:
+    """Показывает тему по позиции в разделе (кнопки старого формата вида java_topic_3)"""
+    topic_index, page = topic_ref
+    try:
+        ref = CARD_REGISTRY.at(section, topic_index)
+    except IndexError:
+        await callback_answers.answer(update, "Карточка не найдена. Откройте раздел заново через /start")
+        return
+    await send_rendered_card(update.callback_query, render_card(ref), page)
 
-def show_card(update: Update, context: CallbackContext, card: Question) -> None:
+async def show_card(update: Update, context: CallbackContext, card: Question) -> None:
     """Показывает карточку с вопросом и ответом"""
     query = update.callback_query
-    query.answer()
+    await callback_answers.answer(update)
     
-    keyboard = [
-        [InlineKeyboardButton("📝 Теория", callback_data="theory")],
-        [InlineKeyboardButton("◀️ Назад", callback_data="back_to_section")]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    query.edit_message_text(
+    reply_markup = menu_keyboard('card')
+    await query.edit_message_text(
         text=f"*Вопрос:*\n{card.text}\n\n*Ответ:*\n{card.correct_answer}",
         reply_markup=reply_markup,
         parse_mode=ParseMode.MARKDOWN
     )
 
-def show_theory(update: Update, context: CallbackContext, card: Question) -> None:
+async def show_theory(update: Update, context: CallbackContext, card: Question) -> None:
     """Показывает теорию по карточке"""
     query = update.callback_query
-    query.answer()
+    await callback_answers.answer(update)
     
-    keyboard = [
-        [InlineKeyboardButton("◀️ Назад к вопросу", callback_data="back_to_card")],
-        [InlineKeyboardButton("◀️ Назад к разделу", callback_data="back_to_section")]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    query.edit_message_text(
+    reply_markup = menu_keyboard('theory')
+    await query.edit_message_text(
         text=f"*Теория:*\n\n{card.theory}\n\n*Краткое содержание:*\n{card.theory_summary}",
         reply_markup=reply_markup,
         parse_mode=ParseMode.MARKDOWN
     )
 
-def show_system_design_menu(update: Update, context: CallbackContext) -> None:
-    """Показать меню тем System Design"""
+def build_system_design_keyboard() -> list:
+    """Клавиатура меню тем System Design"""
     keyboard = []
-    for i, card in enumerate(SYSTEM_DESIGN_CARDS):
+    for ref in CARD_REGISTRY.section('system_design'):
         keyboard.append([InlineKeyboardButton(
-            card.text,
-            callback_data=f'system_design_topic_{i}'
+            ref.title,
+            callback_data=f'c_{ref.id}'
         )])
     keyboard.append([InlineKeyboardButton("Назад", callback_data='back')])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    update.callback_query.edit_message_text(
+    return keyboard
+
+@router.route('system_design')
+async def show_system_design_menu(update: Update, context: CallbackContext) -> None:
+    """Показать меню тем System Design"""
+    reply_markup = menu_keyboard('system_design')
+    await update.callback_query.edit_message_text(
         text="Выберите тему по System Design:",
         reply_markup=reply_markup
     )
 
-def process_code_blocks(text: str, language: str = None) -> str:
-    """Обрабатывает блоки кода в тексте"""
-    if not text:
-        return ""
-        
-    # Если язык не указан, пробуем определить его из текста
-    if not language:
-        code_blocks = re.findall(r'```(\w+)?\n(.*?)```', text, re.DOTALL)
-        if code_blocks:
-            language = code_blocks[0][0] or 'text'
-    
-    # Разбиваем текст на части по блокам кода
-    parts = text.split('```')
-    result = []
-    
-    for i, part in enumerate(parts):
-        if i % 2 == 0:  # Обычный текст
-            # Экранируем специальные символы Markdown
-            result.append(escape_markdown(part))
-        else:  # Блок кода
-            # Определяем язык и код
-            if '\n' in part:
-                lang, code = part.split('\n', 1)
-            else:
-                lang, code = language or 'text', part
-                
-            # Добавляем код в Markdown формате
-            code_lines = code.strip().split('\n')
-            formatted_code = '\n'.join(code_lines)
-            result.append(f'\n```{lang}\n{formatted_code}\n```\n')
-    
-    return ''.join(result)
-
-def show_system_design_topic(update: Update, context: CallbackContext, topic_index: int) -> None:
+@router.route('system_design_topic_', paged(index))
+async def show_system_design_topic(update: Update, context: CallbackContext, topic_ref: Tuple[int, int]) -> None:
     """Показать тему по System Design"""
-    card = SYSTEM_DESIGN_CARDS[topic_index]
-    message = f"*{escape_markdown(card.text)}*\n\n"
-    message += process_code_blocks(card.theory)
-    message += "\n\n*Практические примеры:*\n"
-    message += process_code_blocks(card.explanation)
-    
-    keyboard = [[InlineKeyboardButton("Назад к темам", callback_data='system_design')]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Разбиваем сообщение на части, если оно слишком длинное
-    if len(message) > 4096:
-        parts = [message[i:i+4096] for i in range(0, len(message), 4096)]
-        for i, part in enumerate(parts):
-            if i == 0:
-                update.callback_query.edit_message_text(
-                    text=part,
-                    reply_markup=reply_markup if i == len(parts)-1 else None,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-            else:
-                update.callback_query.message.reply_text(
-                    text=part,
-                    reply_markup=reply_markup if i == len(parts)-1 else None,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-    else:
-        update.callback_query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN
-        )
+    await show_topic(update, context, 'system_design', topic_ref)
 
-def button_handler(update: Update, context: CallbackContext) -> None:
-    """Обработчик нажатий на кнопки"""
+def reply_chat_id(query) -> int:
+    """Чат для ответа на нажатие: чат сообщения с кнопкой, а для инлайн-сообщения
+    (query.message is None) - личный чат пользователя с ботом"""
+    if query.message is not None:
+        return query.message.chat_id
+    return query.from_user.id
+
+@router.route('md_full')
+async def export_full_theory(update: Update, context: CallbackContext) -> None:
+    """Отправляет ссылку на полную теорию на сервере теории"""
     query = update.callback_query
-    data = query.data
-    
-    if data == "java_core":
-        show_java_core_menu(update, context)
-    elif data == "spring":
-        show_spring_menu(update, context)
-    elif data == "database":
-        show_database_menu(update, context)
-    elif data == "docker_k8s":
-        show_docker_k8s_menu(update, context)
-    elif data == "algorithms":
-        show_algorithms_menu(update, context)
-    elif data == "system_design":
-        show_system_design_menu(update, context)
-    elif data.startswith("system_design_topic_"):
-        topic_index = int(data.split("_")[-1])
-        show_system_design_topic(update, context, topic_index)
-    elif data.startswith("cat_"):
-        category = data[4:]
-        show_algorithm_category(update, context, category)
-    elif data.startswith("a_"):
-        algo_index = int(data[2:])
-        show_algorithm(update, context, algo_index)
-    elif data.startswith("md_"):
-        category = data[3:]
-        if category == "full":
-            # Открываем теорию в браузере
-            from src.theory_server import open_theory_in_browser
-            open_theory_in_browser()
-            query.message.reply_text("Теория открыта в вашем браузере! Если страница не открылась автоматически, перейдите по адресу: http://localhost:5000")
-            query.answer("Теория открыта в браузере!")
-        elif category == "database":
-            # Создаем Markdown для баз данных
-            md_path = create_database_markdown(DATABASE_CARDS)
-            # Отправляем файл
-            with open(md_path, 'rb') as md_file:
-                query.message.reply_document(
-                    document=md_file,
-                    filename='theory_database.md',
-                    caption='Теория по разделу: Базы данных'
-                )
-            # Удаляем временный файл
-            os.unlink(md_path)
-            # Отвечаем на callback
-            query.answer("Markdown файл создан и отправлен!")
-        elif category == "docker_k8s":
-            # Создаем Markdown для Docker и Kubernetes
-            md_path = create_docker_k8s_markdown(DOCKER_K8S_CARDS)
-            # Отправляем файл
-            with open(md_path, 'rb') as md_file:
-                query.message.reply_document(
-                    document=md_file,
-                    filename='theory_docker_k8s.md',
-                    caption='Теория по разделу: Docker и Kubernetes'
-                )
-            # Удаляем временный файл
-            os.unlink(md_path)
-            # Отвечаем на callback
-            query.answer("Markdown файл создан и отправлен!")
+    if not BASE_URL:
+        # Кнопка из старого меню: без публичного адреса ссылка вела бы на localhost пользователя
+        await callback_answers.answer(update, "Сайт с теорией не настроен")
+        return
+    try:
+        await context.bot.send_message(reply_chat_id(query), f"Полная теория по всем разделам: {BASE_URL}/")
+    except Forbidden:
+        # Нажатие в инлайн-сообщении от пользователя, не начинавшего диалог с ботом
+        await callback_answers.answer(update, "Откройте диалог с ботом и нажмите /start, чтобы получать ссылки и файлы")
+        return
+    await callback_answers.answer(update)
+
+async def send_export(update: Update, context: CallbackContext, name: str, cards, build,
+                      filename: str, caption: str) -> None:
+    """Отправляет документ экспорта: по сохраненному file_id без повторной загрузки,
+    а если его нет или содержимое изменилось - ставит сборку и загрузку в очередь тяжелого лейна.
+
+    Нажатие в инлайн-сообщении (в чужом чате) отправляет документ в личный чат пользователя.
+    """
+    query = update.callback_query
+    chat_id = reply_chat_id(query)
+    answered = False
+    file_id = file_ids.get(name, document_key(cards_hash(cards), filename, caption))
+    if file_id is not None:
+        # Ответ на нажатие уходит до отправки документа: индикатор на кнопке не ждет загрузку
+        await query.answer("Отправляю Markdown файл...")
+        answered = True
+        try:
+            await context.bot.send_document(chat_id, document=file_id, caption=caption)
+            file_ids.reused += 1
+            return
+        except Forbidden as e:
+            logger.warning(f"Экспорт {name} не отправлен в чат {chat_id}: {e}")
+            return
+        except BadRequest as e:
+            logger.warning(f"Telegram не принял file_id экспорта {name}: {e}")
+            file_ids.forget(name)
+
+    # Сборка и загрузка выполняются вне обработчика: следующие нажатия этого чата
+    # и навигация остальных пользователей не ждут экспорт
+    job = functools.partial(upload_export, context.bot, chat_id, name, cards, build, filename, caption)
+    try:
+        position = lanes.heavy.submit(job, functools.partial(context.application.create_task, update=update))
+    except lanes.QueueFull:
+        text, show_alert = "Сейчас готовится слишком много файлов, попробуйте через минуту", True
+    else:
+        show_alert = False
+        if position:
+            text = f"Экспорт в очереди, позиция {position}. Файл придет отдельным сообщением"
         else:
-            # Создаем Markdown для алгоритмов
-            md_path = create_theory_markdown(ALGORITHMS, category)
-            # Отправляем файл
-            with open(md_path, 'rb') as md_file:
-                query.message.reply_document(
-                    document=md_file,
-                    filename=f'theory_{category}.md',
-                    caption=f'Теория по разделу: {category.capitalize()}'
-                )
-            # Удаляем временный файл
-            os.unlink(md_path)
-            # Отвечаем на callback
-            query.answer("Markdown файл создан и отправлен!")
-    elif data == "back":
-        start(update, context)
-    elif data == "back_to_section":
-        # Определяем текущий раздел из контекста
-        current_section = context.user_data.get('current_section', 'main')
-        if current_section == 'java_core':
-            show_java_core_menu(update, context)
-        elif current_section == 'spring':
-            show_spring_menu(update, context)
-        elif current_section == 'database':
-            show_database_menu(update, context)
-        elif current_section == 'docker_k8s':
-            show_docker_k8s_menu(update, context)
-        elif current_section == 'algorithms':
-            show_algorithms_menu(update, context)
-        elif current_section == 'system_design':
-            show_system_design_menu(update, context)
-    elif data == "back_to_card":
-        # Возвращаемся к текущей карточке
-        current_card = context.user_data.get('current_card')
-        if current_card:
-            show_card(update, context, current_card)
-    elif data == "theory":
-        # Показываем теорию для текущей карточки
-        current_card = context.user_data.get('current_card')
-        if current_card:
-            show_theory(update, context, current_card)
-    elif data.startswith("java_topic_"):
-        # Обработка тем Java Core
-        index = int(data.split("_")[-1])
-        show_java_topic(update, context, index)
-    elif data.startswith("spring_topic_"):
-        # Обработка тем Spring
-        index = int(data.split("_")[-1])
-        show_spring_topic(update, context, index)
-    elif data.startswith("database_topic_"):
-        # Обработка тем Database
-        index = int(data.split("_")[-1])
-        show_database_topic(update, context, index)
-    elif data.startswith("docker_k8s_topic_"):
-        # Обработка тем Docker & Kubernetes
-        index = int(data.split("_")[-1])
-        show_docker_k8s_topic(update, context, index)
-
-def show_java_topic(update: Update, context: CallbackContext, topic_index: int) -> None:
-    """Показать тему по Java Core"""
-    card = JAVA_CORE_CARDS[int(topic_index)]
-    message = f"*{escape_markdown(card.text)}*\n\n"
-    message += process_code_blocks(card.theory, 'java')
-    message += "\n\n*Практические примеры:*\n"
-    message += process_code_blocks(card.explanation, 'java')
-    
-    keyboard = [[InlineKeyboardButton("Назад к темам", callback_data='java_core')]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Разбиваем сообщение на части, если оно слишком длинное
-    if len(message) > 4096:
-        parts = [message[i:i+4096] for i in range(0, len(message), 4096)]
-        for i, part in enumerate(parts):
-            if i == 0:
-                update.callback_query.edit_message_text(
-                    text=part,
-                    reply_markup=reply_markup if i == len(parts)-1 else None,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-            else:
-                update.callback_query.message.reply_text(
-                    text=part,
-                    reply_markup=reply_markup if i == len(parts)-1 else None,
-                    parse_mode=ParseMode.MARKDOWN
-                )
+            text = "Готовлю Markdown файл..."
+        if query.message is None:
+            text += " Файл придет в личный чат с ботом"
+    if answered:
+        # Второй ответ на нажатие невозможен, поэтому текст приходит сообщением в чат
+        await context.bot.send_message(chat_id, text)
     else:
-        update.callback_query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN
+        await query.answer(text, show_alert=show_alert)
+
+async def upload_export(bot, chat_id: int, name: str, cards, build, filename: str, caption: str) -> None:
+    """Собирает документ экспорта (из кеша экспортов) и загружает его в чат chat_id"""
+    # Сборка документа - работа процессора, она не должна останавливать цикл событий
+    document = await lanes.heavy.to_thread(exports.get, name, cards, build, filename, caption)
+    try:
+        sent = await bot.send_document(
+            chat_id,
+            document=document.data,
+            filename=document.filename,
+            caption=document.caption
         )
+    except Forbidden as e:
+        # Пользователь нажал кнопку в инлайн-сообщении, но не начинал диалог с ботом
+        logger.warning(f"Экспорт {name} не отправлен в чат {chat_id}: {e}")
+        return
+    file_ids.uploads += 1
+    if sent.document is not None:
+        key = document_key(document.content_hash, document.filename, document.caption)
+        file_ids.set(name, key, sent.document.file_id)
 
-def show_spring_topic(update: Update, context: CallbackContext, topic_index: int) -> None:
-    """Показать тему по Spring"""
-    card = SPRING_CARDS[int(topic_index)]
-    message = f"*{escape_markdown(card.text)}*\n\n"
-    message += process_code_blocks(card.theory, 'java')
-    message += "\n\n*Практические примеры:*\n"
-    message += process_code_blocks(card.explanation, 'java')
-    
-    keyboard = [[InlineKeyboardButton("Назад к темам", callback_data='spring')]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    update.callback_query.edit_message_text(
-        text=message,
-        reply_markup=reply_markup,
-        parse_mode=ParseMode.MARKDOWN_V2
+@router.route('md_database', answers=True)
+async def export_database(update: Update, context: CallbackContext) -> None:
+    """Отправляет Markdown с теорией по базам данных"""
+    cards = load_section('database')
+    await send_export(
+        update, context, 'database', cards, lambda: create_database_markdown(cards),
+        filename='theory_database.md',
+        caption='Теория по разделу: Базы данных'
     )
 
-def show_database_topic(update: Update, context: CallbackContext, topic_index: int) -> None:
-    """Показать тему по базам данных"""
-    card = DATABASE_CARDS[int(topic_index)]
-    message = f"*{escape_markdown(card.text)}*\n\n"
-    message += process_code_blocks(card.theory, 'sql')
-    message += "\n\n*Практические примеры:*\n"
-    message += process_code_blocks(card.explanation, 'sql')
-    
-    keyboard = [[InlineKeyboardButton("Назад к темам", callback_data='database')]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    update.callback_query.edit_message_text(
-        text=message,
-        reply_markup=reply_markup,
-        parse_mode=ParseMode.MARKDOWN_V2
+@router.route('md_docker_k8s', answers=True)
+async def export_docker_k8s(update: Update, context: CallbackContext) -> None:
+    """Отправляет Markdown с теорией по Docker и Kubernetes"""
+    cards = load_section('docker_k8s')
+    await send_export(
+        update, context, 'docker_k8s', cards, lambda: create_docker_k8s_markdown(cards),
+        filename='theory_docker_k8s.md',
+        caption='Теория по разделу: Docker и Kubernetes'
     )
 
-def show_docker_k8s_topic(update: Update, context: CallbackContext, topic_index: int) -> None:
-    """Показать тему по Docker и Kubernetes"""
-    card = DOCKER_K8S_CARDS[int(topic_index)]
-    message = f"*{escape_markdown(card.text)}*\n\n"
-    message += process_code_blocks(card.theory, 'yaml')
-    message += "\n\n*Практические примеры:*\n"
-    message += process_code_blocks(card.explanation, 'yaml')
-    
-    keyboard = [[InlineKeyboardButton("Назад к темам", callback_data='docker_k8s')]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    update.callback_query.edit_message_text(
-        text=message,
-        reply_markup=reply_markup,
-        parse_mode=ParseMode.MARKDOWN_V2
+@router.route('md_', str, answers=True)
+async def export_algorithm_category(update: Update, context: CallbackContext, category: str) -> None:
+    """Отправляет Markdown с теорией по категории алгоритмов"""
+    catalog = get_algorithm_catalog()
+    if category not in catalog.categories():
+        # Поддельный md_<x> не должен собирать, кешировать и загружать пустой документ
+        await callback_answers.answer(update, "Категория не найдена. Откройте раздел заново через /start")
+        return
+    cards = [entry.algorithm for entry in catalog.by_category(category)]
+    await send_export(
+        update, context, f'algorithms:{category}', cards, lambda: create_theory_markdown(category),
+        filename=f'theory_{category}.md',
+        caption=f'Теория по разделу: {category.capitalize()}'
     )
 
+# Меню разделов для возврата по кнопке "Назад"
+SECTION_MENUS = {
+    'java_core': show_java_core_menu,
+    'spring': show_spring_menu,
+    'database': show_database_menu,
+    'docker_k8s': show_docker_k8s_menu,
+    'algorithms': show_algorithms_menu,
+    'system_design': show_system_design_menu,
+}
+
+@router.route('back_to_section')
+async def show_current_section(update: Update, context: CallbackContext) -> None:
+    """Возвращает в меню текущего раздела"""
+    # Определяем текущий раздел из контекста
+    current_section = context.user_data.get('current_section', 'main')
+    show_menu = SECTION_MENUS.get(current_section)
+    if show_menu:
+        await show_menu(update, context)
+
+@router.route('back_to_card')
+async def show_current_card(update: Update, context: CallbackContext) -> None:
+    """Возвращает к текущей карточке"""
+    current_card = context.user_data.get('current_card')
+    if current_card:
+        await show_card(update, context, current_card)
+
+@router.route('theory')
+async def show_current_theory(update: Update, context: CallbackContext) -> None:
+    """Показывает теорию для текущей карточки"""
+    current_card = context.user_data.get('current_card')
+    if current_card:
+        await show_theory(update, context, current_card)
+
+async def button_handler(update: Update, context: CallbackContext) -> None:
+    """Обработчик нажатий на кнопки"""
+    data = update.callback_query.data
+    with lanes.light.timed():
+        handled = await router.dispatch(update, context, data)
+    if not handled:
+        logger.warning(f"Неизвестный callback: {data}")
+
+@router.route('java_topic_', paged(index))
+async def show_java_topic(update: Update, context: CallbackContext, topic_ref: Tuple[int, int]) -> None:
+    """Показать тему по Java Core"""
+    await show_topic(update, context, 'java_core', topic_ref)
+
+@router.route('spring_topic_', paged(index))
+async def show_spring_topic(update: Update, context: CallbackContext, topic_ref: Tuple[int, int]) -> None:
+    """Показать тему по Spring"""
+    await show_topic(update, context, 'spring', topic_ref)
+
+@router.route('database_topic_', paged(index))
+async def show_database_topic(update: Update, context: CallbackContext, topic_ref: Tuple[int, int]) -> None:
+    """Показать тему по базам данных"""
+    await show_topic(update, context, 'database', topic_ref)
+
+@router.route('docker_k8s_topic_', paged(index))
+async def show_docker_k8s_topic(update: Update, context: CallbackContext, topic_ref: Tuple[int, int]) -> None:
+    """Показать тему по Docker и Kubernetes"""
+    await show_topic(update, context, 'docker_k8s', topic_ref)
+
+# Построители статических клавиатур: каждая строится один раз - при первом показе меню
+# или при прогреве. Меню со списками карточек загружают свой раздел
+MENU_BUILDERS = {
+    'main': build_main_keyboard,
+    'java_core': build_java_core_keyboard,
+    'spring': build_spring_keyboard,
+    'database': build_database_keyboard,
+    'docker_k8s': build_docker_k8s_keyboard,
+    'system_design': build_system_design_keyboard,
+    'algorithms': build_algorithms_keyboard,
+    'card': lambda: [
+        [InlineKeyboardButton("📝 Теория", callback_data="theory")],
+        [InlineKeyboardButton("◀️ Назад", callback_data="back_to_section")]
+    ],
+    'theory': lambda: [
+        [InlineKeyboardButton("◀️ Назад к вопросу", callback_data="back_to_card")],
+        [InlineKeyboardButton("◀️ Назад к разделу", callback_data="back_to_section")]
+    ],
+}
+# Меню, не зависящие от карточек, строятся сразу
+for name in ('main', 'card', 'theory'):
+    keyboards.register(name, MENU_BUILDERS[name]())
+
+def menu_keyboard(name: str):
+    """Клавиатура меню из реестра, при первом показе строится через MENU_BUILDERS"""
+    return keyboards.get_or_register(name, MENU_BUILDERS[name])
+
+def warm_render_cache() -> None:
+    """Заранее рендерит все карточки, чтобы первые нажатия не ждали рендеринга"""
+    for ref in CARD_REGISTRY:
+        render_card(ref)
+    logger.info(f"Кеш карточек заполнен: {render_cache.stats()}")
+
+def warm_search() -> None:
+    """Строит поисковые индексы и готовые результаты инлайн-режима"""
+    build_indexes()
+    for ref in CARD_REGISTRY:
+        inline_result(ref)
+
+def warm_up() -> None:
+    """Загружает все разделы, строит все меню и заполняет кеш карточек"""
+    load_all_sections()
+    for category in get_algorithm_catalog().categories():
+        MENU_BUILDERS[f'cat_{category}'] = functools.partial(build_algorithm_category_keyboard, category)
+    for name in MENU_BUILDERS:
+        menu_keyboard(name)
+    warm_render_cache()
+    warm_search()
+
+async def log_stats(context: CallbackContext) -> None:
+    """Пишет в лог статистику обработки обновлений, лейнов, очереди отправки и нажатий"""
+    application = context.application
+    logger.info(f"Обновления: {application.update_processor.stats()}")
+    logger.info(f"Лейны: {lanes.stats()}")
+    rate_limiter = application.bot.rate_limiter
+    if rate_limiter is not None:
+        logger.info(f"Очередь отправки: {rate_limiter.stats()}")
+    logger.info(f"Нажатия: {callback_answers.stats()}")
+
+def register_handlers(application: Application, early_answers: bool = EARLY_ANSWERS,
+                      stats_interval: int = STATS_INTERVAL) -> None:
+    """Регистрирует обработчики команд, кнопок и инлайн-запросов и периодический лог статистики"""
+    callback_answers.attach(application, early_answers)
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("search", search))
+    application.add_handler(CallbackQueryHandler(button_handler))
+    application.add_handler(InlineQueryHandler(inline_query))
+    application.add_error_handler(error_handler)
+    if stats_interval > 0:
+        if application.job_queue is None:
+            logger.warning("JobQueue недоступна (нужен python-telegram-bot[job-queue]), статистика не пишется")
+        else:
+            application.job_queue.run_repeating(log_stats, interval=stats_interval, first=stats_interval)
+
+async def post_init(application: Application) -> None:
+    """Подготовка после инициализации бота (getMe), до получения обновлений"""
+    configure_deep_links(application.bot)
+    # Карточки и поисковые индексы загружаются лениво, при первом обращении;
+    # с CARDS_WARMUP=1 все разделы загружаются и рендерятся заранее, чтобы первые нажатия не ждали
+    if WARMUP:
+        warm_up()
+
 def main():
     """Запуск бота"""
-    updater = Updater(TOKEN)
-    dispatcher = updater.dispatcher
-
-    # Добавляем обработчики
-    dispatcher.add_handler(CommandHandler("start", start))
-    dispatcher.add_handler(CallbackQueryHandler(button_handler))
-    dispatcher.add_error_handler(error_handler)
+    config = DeliveryConfig.from_env()
+    application = build_application(TOKEN, config, post_init=post_init)
+    register_handlers(application)
 
-    # Запускаем бота
-    updater.start_polling()
-    updater.idle()
+    # Запускаем бота: long polling или вебхук (BOT_DELIVERY)
+    run_application(application, config)
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
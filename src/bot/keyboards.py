@@ -0,0 +1,105 @@
+import json
+import threading
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+Rows = List[List[InlineKeyboardButton]]
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    """Неизменяемая клавиатура, преобразуемая в словарь один раз при создании.
+
+    Bot API библиотеки при каждом запросе вызывает to_dict() для reply_markup
+    (обход всех кнопок) и затем json.dumps для полученного словаря; здесь to_dict()
+    возвращает заранее подготовленный словарь, так что обход кнопок не повторяется.
+    json.dumps по-прежнему выполняется на каждый запрос.
+    """
+
+    __slots__ = ('_frozen_dict',)
+
+    def __init__(self, inline_keyboard: Rows, **kwargs):
+        super().__init__(inline_keyboard, **kwargs)
+        # Объекты PTB после создания доступны только для чтения
+        with self._unfrozen():
+            self._frozen_dict = super().to_dict()
+
+    def to_dict(self, recursive: bool = True) -> dict:
+        return self._frozen_dict
+
+
+class KeyboardRegistry:
+    """Реестр статических клавиатур: каждая строится и преобразуется в словарь один раз"""
+
+    def __init__(self):
+        self._markups: Dict[str, FrozenInlineKeyboardMarkup] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, rows: Rows) -> FrozenInlineKeyboardMarkup:
+        """Строит и сохраняет клавиатуру под именем name"""
+        markup = FrozenInlineKeyboardMarkup(rows)
+        with self._lock:
+            self._markups[name] = markup
+        return markup
+
+    def get(self, name: str) -> FrozenInlineKeyboardMarkup:
+        """Возвращает зарегистрированную клавиатуру"""
+        return self._markups[name]
+
+    def get_or_register(self, name: str, build: Callable[[], Rows]) -> FrozenInlineKeyboardMarkup:
+        """Возвращает клавиатуру, при первом обращении строя ее через build"""
+        markup = self._markups.get(name)
+        if markup is None:
+            markup = self.register(name, build())
+        return markup
+
+    def with_rows(self, name: str, top: Optional[Rows] = None,
+                  bottom: Optional[Rows] = None) -> InlineKeyboardMarkup:
+        """Клавиатура, зависящая от состояния пользователя: статические кнопки
+        зарегистрированной клавиатуры плюс дополнительные ряды сверху и снизу"""
+        rows = self._markups[name].inline_keyboard
+        return InlineKeyboardMarkup((top or []) + list(rows) + (bottom or []))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._markups
+
+    def __len__(self) -> int:
+        return len(self._markups)
+
+
+# Общий реестр клавиатур бота
+keyboards = KeyboardRegistry()
+
+
+def allocation_report(requests: int = 1000) -> None:
+    """Сравнивает число выделений памяти на запрос: построение меню заново против реестра"""
+    from src.bot import handlers
+
+    handlers.warm_up()
+    names = list(handlers.MENU_BUILDERS)
+
+    def measure(build_markup: Callable[[str], InlineKeyboardMarkup]) -> float:
+        # Результаты удерживаются в списке, чтобы учесть все выделенные за запрос объекты
+        retained = []
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for i in range(requests):
+            markup = build_markup(names[i % len(names)])
+            # Так reply_markup сериализует RequestParameter библиотеки
+            retained.append((markup, json.dumps(markup.to_dict())))
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        allocated = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+        return allocated / requests
+
+    fresh = measure(lambda name: InlineKeyboardMarkup(handlers.MENU_BUILDERS[name]()))
+    cached = measure(handlers.keyboards.get)
+    print(f"Меню: {len(names)}, запросов: {requests}")
+    print(f"Построение заново: {fresh:8.1f} выделений на запрос")
+    print(f"Реестр клавиатур:  {cached:8.1f} выделений на запрос")
+    print(f"Экономия:          {fresh - cached:8.1f} выделений на запрос")
+
+
+if __name__ == '__main__':
+    allocation_report()
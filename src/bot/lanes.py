@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Тяжелые задачи (экспорты), выполняемые одновременно, и сколько их может ждать в очереди
+HEAVY_WORKERS = int(os.getenv('HEAVY_WORKERS', '2'))
+HEAVY_QUEUE = int(os.getenv('HEAVY_QUEUE', '16'))
+
+
+class Latencies:
+    """Задержки последних операций (скользящее окно) для перцентилей"""
+
+    __slots__ = ('_samples', 'count')
+
+    def __init__(self, window: int = 4096):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.count += 1
+
+    def percentiles(self) -> Dict[str, float]:
+        """p50/p95/p99/max в миллисекундах по окну"""
+        samples = sorted(self._samples)
+        if not samples:
+            return {}
+        result = {
+            name: round(samples[int(quantile * (len(samples) - 1))] * 1e3, 2)
+            for name, quantile in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+        }
+        result['max'] = round(samples[-1] * 1e3, 2)
+        return result
+
+
+class LightLane:
+    """Легкий лейн: навигация по меню выполняется прямо в цикле событий, здесь только замер времени"""
+
+    def __init__(self):
+        self.latency = Latencies()
+
+    @contextmanager
+    def timed(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latency.add(time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        return {'handled': self.latency.count, 'latency_ms': self.latency.percentiles()}
+
+
+class QueueFull(Exception):
+    """Очередь тяжелого лейна заполнена, задача не принята"""
+
+
+class HeavyLane:
+    """Ограниченный лейн для тяжелых задач: сборки и загрузки экспортов.
+
+    Одновременно выполняется не больше workers задач, еще не больше max_queue ждут
+    в порядке поступления; сверх этого submit бросает QueueFull. Задача - корутина
+    целиком (сборка и отправка документа), а работа процессора внутри нее уходит
+    в собственный пул потоков лейна через to_thread. Обработчик обновления только
+    ставит задачу в очередь и сразу освобождает чат.
+
+    Очередь не использует примитивы asyncio, привязанные к циклу событий, поэтому
+    общий экземпляр переживает несколько запусков asyncio.run (замеры).
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='heavy')
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._running = 0
+        # Принятые, но еще не завершенные задачи, включая еще не запущенные
+        self._accepted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.wait_latency = Latencies()
+        self.run_latency = Latencies()
+
+    @property
+    def queued(self) -> int:
+        return self._accepted - self._running
+
+    def submit(self, job: Callable[[], Awaitable[Any]],
+               spawn: Callable[[Awaitable[Any]], Any] = asyncio.ensure_future) -> int:
+        """Ставит задачу в очередь и запускает ее через spawn (например, Application.create_task).
+
+        Возвращает позицию в очереди: 0 - задача начнет выполняться сразу.
+        """
+        ahead = self._accepted
+        if ahead >= self.workers + self.max_queue:
+            self.rejected += 1
+            logger.warning(f"Очередь тяжелых задач заполнена, задача отклонена: {self.stats()}")
+            raise QueueFull(f"В очереди уже {self.queued} задач")
+        self._accepted += 1
+        spawn(self._run(job, time.perf_counter()))
+        return max(0, ahead - self.workers + 1)
+
+    async def _run(self, job: Callable[[], Awaitable[Any]], queued_at: float) -> None:
+        try:
+            await self._acquire()
+        except asyncio.CancelledError:
+            self._accepted -= 1
+            raise
+        started = time.perf_counter()
+        self.wait_latency.add(started - queued_at)
+        try:
+            await job()
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.run_latency.add(time.perf_counter() - started)
+            self._accepted -= 1
+            self._release()
+
+    async def _acquire(self) -> None:
+        if self._running < self.workers and not self._waiters:
+            self._running += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # Освободившаяся задача передает свое место первой ожидающей
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._running -= 1
+
+    async def to_thread(self, fn: Callable[..., Any], *args) -> Any:
+        """Выполняет fn(*args) в пуле потоков лейна, не занимая цикл событий"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'running': self._running,
+            'queued': self.queued,
+            'max_queue': self.max_queue,
+            'done': self.run_latency.count,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'wait_ms': self.wait_latency.percentiles(),
+            'run_ms': self.run_latency.percentiles(),
+        }
+
+
+# Лейны бота: навигация и экспорты
+light = LightLane()
+heavy = HeavyLane(HEAVY_WORKERS, HEAVY_QUEUE)
+
+
+def stats() -> dict:
+    return {'light': light.stats(), 'heavy': heavy.stats()}
@@ -1,28 +1,31 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from src.bot.keyboards import keyboards
 
 def get_main_menu() -> InlineKeyboardMarkup:
     """Получить главное меню"""
-    keyboard = [
+    return keyboards.get_or_register('menu:main', lambda: [
         [InlineKeyboardButton("Java Core", callback_data='java_core')],
         [InlineKeyboardButton("Spring Framework", callback_data='spring')],
         [InlineKeyboardButton("Базы данных", callback_data='database')],
         [InlineKeyboardButton("Docker & Kubernetes", callback_data='docker_k8s')],
         [InlineKeyboardButton("Статистика", callback_data='stats')]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    ])
 
 def get_topic_menu(cards, prefix: str) -> InlineKeyboardMarkup:
-    """Получить меню тем для раздела"""
-    keyboard = []
-    for i, card in enumerate(cards):
-        keyboard.append([InlineKeyboardButton(
-            card.text,
-            callback_data=f'{prefix}_topic_{i}'
-        )])
-    keyboard.append([InlineKeyboardButton("Назад", callback_data='back')])
-    return InlineKeyboardMarkup(keyboard)
+    """Получить меню тем для раздела (строится один раз на раздел)"""
+    def build():
+        keyboard = []
+        for i, card in enumerate(cards):
+            keyboard.append([InlineKeyboardButton(
+                card.text,
+                callback_data=f'{prefix}_topic_{i}'
+            )])
+        keyboard.append([InlineKeyboardButton("Назад", callback_data='back')])
+        return keyboard
+    return keyboards.get_or_register(f'menu:topics:{prefix}', build)
 
 def get_back_button(callback_data: str) -> InlineKeyboardMarkup:
     """Получить кнопку 'Назад'"""
-    keyboard = [[InlineKeyboardButton("Назад к темам", callback_data=callback_data)]]
-    return InlineKeyboardMarkup(keyboard) 
\ No newline at end of file
+    return keyboards.get_or_register(f'menu:back:{callback_data}', lambda: [
+        [InlineKeyboardButton("Назад к темам", callback_data=callback_data)]
+    ])
@@ -0,0 +1,104 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+def chat_key(update: object) -> Optional[Hashable]:
+    """Ключ очереди обновления: чат, а для инлайн-запросов без чата - пользователь"""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return ('user', update.effective_user.id)
+    return None
+
+
+class _ChatQueue:
+    """Очередь обновлений одного чата: блокировка и число ожидающих ее обновлений"""
+
+    __slots__ = ('lock', 'pending')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений с сохранением порядка внутри чата.
+
+    Обновления разных чатов обрабатываются одновременно (не больше
+    max_concurrent_updates), обновления одного чата - строго по очереди в порядке
+    получения: повторные нажатия не обгоняют друг друга и не редактируют сообщение
+    вперемешку. Очередь чата существует, пока в ней есть обновления.
+
+    pre_dispatch вызывается для каждого обновления при получении, до очереди чата
+    и до слота обработки (например, чтобы сразу ответить на нажатие); если он
+    вернул False, обновление дальше не обрабатывается.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self.pre_dispatch: Optional[Callable[[object], bool]] = None
+        self._chats: Dict[Hashable, _ChatQueue] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # Обновления, ждавшие завершения предыдущего обновления своего чата
+        self.serialized = 0
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Ставит обновление в очередь его чата и только потом занимает слот обработки.
+
+        Обновление, ждущее предыдущее обновление своего чата, слота не держит:
+        иначе один занятый чат мог бы забрать все max_concurrent_updates слотов
+        и остановить остальные чаты. pre_dispatch вызывается до очереди и до
+        слота, поэтому ранний ответ на нажатие не ждет ни занятый чат, ни
+        занятые слоты.
+        """
+        if self.pre_dispatch is not None and not self.pre_dispatch(update):
+            coroutine.close()
+            return
+        key = chat_key(update)
+        if key is None:
+            async with self._semaphore:
+                await self.do_process_update(update, coroutine)
+            return
+
+        queue = self._chats.get(key)
+        if queue is None:
+            queue = self._chats[key] = _ChatQueue()
+        if queue.lock.locked():
+            self.serialized += 1
+        queue.pending += 1
+        try:
+            async with queue.lock:
+                async with self._semaphore:
+                    await self.do_process_update(update, coroutine)
+        finally:
+            queue.pending -= 1
+            if not queue.pending:
+                del self._chats[key]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await coroutine
+        finally:
+            self.in_flight -= 1
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'chats': len(self._chats),
+            'serialized': self.serialized,
+        }
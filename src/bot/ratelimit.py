@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Coroutine, Deque, Dict, Hashable, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from src.bot.lanes import Latencies
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты исходящих запросов: правка сообщения в ответ на нажатие важнее новых сообщений
+INTERACTIVE = 0
+BULK = 1
+
+# Лимиты Telegram: около 30 сообщений в секунду на бота, около 1 в секунду в личный чат
+# (короткие всплески допустимы) и 20 в минуту в группу
+GLOBAL_RATE = 30.0
+CHAT_RATE = 1.0
+CHAT_BURST = 3
+GROUP_RATE = 20 / 60
+GROUP_BURST = 3
+
+# Повторы после 429 (RetryAfter), прежде чем ошибка уйдет обработчику
+MAX_RETRIES = 3
+
+# Сколько корзин чатов хранить, прежде чем удалять полные (давно не писавшим чатам)
+MAX_CHAT_BUCKETS = 10000
+
+# Методы, которые не ограничиваются: ответы на нажатия и инлайн-запросы Telegram ждет сразу,
+# и лимиты на сообщения к ним не относятся
+UNLIMITED = frozenset({'answerCallbackQuery', 'answerInlineQuery'})
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity про запас"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """Через сколько секунд появится токен (0 - есть сейчас)"""
+        if self.tokens < self.capacity:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def hold(self, seconds: float) -> None:
+        """Не выдавать токенов seconds секунд (после 429)"""
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def full(self, now: float) -> bool:
+        return self.wait_time(now) == 0.0 and self.tokens >= self.capacity
+
+
+def is_group(chat_id: Any) -> bool:
+    """Группы и каналы: отрицательный id или @username"""
+    if isinstance(chat_id, str):
+        return not chat_id.lstrip('-').isdigit() or chat_id.startswith('-')
+    return chat_id < 0
+
+
+class OutboundScheduler(BaseRateLimiter[int]):
+    """Очередь исходящих запросов к Bot API с корзинами токенов на бота и на чат.
+
+    Запрос с chat_id (или inline_message_id) ждет токена общей корзины и корзины
+    своего чата; ожидающие запросы выдаются по приоритету: сначала правки
+    сообщений (INTERACTIVE), потом новые сообщения и документы (BULK), внутри
+    приоритета - по порядку поступления. Приоритет можно задать явно:
+    rate_limit_args=INTERACTIVE в методе бота.
+
+    На 429 (RetryAfter) выдача запросов в этот чат (без чата - всех запросов)
+    приостанавливается на retry_after, а запрос повторяется первым в своем
+    приоритете, не больше MAX_RETRIES раз.
+    """
+
+    __slots__ = ('global_bucket', '_chats', '_queues', '_paused_until', '_wakeup', '_pump_task',
+                 'wait_latency', 'sent', 'retries', 'failed')
+
+    def __init__(self, global_rate: float = GLOBAL_RATE):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[Hashable, TokenBucket] = {}
+        # Очереди ожидающих запросов по приоритетам: [future, корзина чата]
+        self._queues: Tuple[Deque[list], ...] = (deque(), deque())
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump_task: Optional[asyncio.Task] = None
+        self.wait_latency = Latencies()
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+
+    async def initialize(self) -> None:
+        # Вызывается и Application, и Updater при инициализации бота
+        if self._pump_task is None:
+            self._wakeup = asyncio.Event()
+            self._pump_task = asyncio.create_task(self._pump())
+
+    async def shutdown(self) -> None:
+        if self._pump_task is not None:
+            self._pump_task.cancel()
+            try:
+                await self._pump_task
+            except asyncio.CancelledError:
+                pass
+            self._pump_task = None
+        # Оставшиеся запросы отправляются без ожидания, чтобы остановка не зависла
+        for queue in self._queues:
+            while queue:
+                future = queue.popleft()[0]
+                if not future.done():
+                    future.set_result(None)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        if endpoint in UNLIMITED:
+            return await callback(*args, **kwargs)
+        chat_id = data.get('chat_id')
+        if chat_id is None and 'inline_message_id' not in data:
+            return await callback(*args, **kwargs)
+
+        if rate_limit_args is not None:
+            priority = rate_limit_args
+        else:
+            priority = INTERACTIVE if endpoint.startswith('edit') else BULK
+        # Правка инлайн-сообщения не знает чата и ограничивается только общей корзиной
+        bucket = self._chat_bucket(chat_id) if chat_id is not None else None
+
+        retry = False
+        for attempt in range(MAX_RETRIES + 1):
+            await self._acquire(priority, bucket, retry)
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == MAX_RETRIES:
+                    self.failed += 1
+                    raise
+                self.retries += 1
+                self._pause(e.retry_after, bucket)
+                logger.warning(f"{endpoint}: 429 от Telegram, повтор через {e.retry_after} с")
+                retry = True
+                continue
+            self.sent += 1
+            return result
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                now = time.monotonic()
+                self._chats = {key: value for key, value in self._chats.items() if not value.full(now)}
+            if is_group(chat_id):
+                bucket = TokenBucket(GROUP_RATE, GROUP_BURST)
+            else:
+                bucket = TokenBucket(CHAT_RATE, CHAT_BURST)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _pause(self, retry_after: float, bucket: Optional[TokenBucket]) -> None:
+        # 429 в чат приостанавливает только этот чат; без чата - все запросы
+        if bucket is not None:
+            bucket.wait_time(time.monotonic())
+            bucket.hold(retry_after)
+        else:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _acquire(self, priority: int, bucket: Optional[TokenBucket], retry: bool = False) -> None:
+        started = time.perf_counter()
+        if self._pump_task is None:
+            await self.initialize()
+
+        now = time.monotonic()
+        if (not retry and not any(self._queues) and now >= self._paused_until
+                and self.global_bucket.wait_time(now) == 0
+                and (bucket is None or bucket.wait_time(now) == 0)):
+            # Очереди нет и токены есть: запрос уходит сразу, без переключения на выдающую задачу
+            self.global_bucket.take()
+            if bucket is not None:
+                bucket.take()
+        else:
+            entry = [asyncio.get_running_loop().create_future(), bucket]
+            queue = self._queues[min(priority, BULK)]
+            if retry:
+                queue.appendleft(entry)
+            else:
+                queue.append(entry)
+            self._wake()
+            try:
+                await entry[0]
+            except asyncio.CancelledError:
+                if entry in queue:
+                    queue.remove(entry)
+                raise
+        self.wait_latency.add(time.perf_counter() - started)
+
+    async def _pump(self) -> None:
+        """Выдает токены ожидающим запросам по приоритету, засыпая до появления следующего токена"""
+        while True:
+            timeout = self._dispatch(time.monotonic())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self, now: float) -> Optional[float]:
+        """Выдает все доступные токены; возвращает, через сколько секунд проверить снова (None - ждать нового запроса)"""
+        while any(self._queues):
+            if now < self._paused_until:
+                return self._paused_until - now
+            wait = self.global_bucket.wait_time(now)
+            if wait:
+                return wait
+
+            earliest = None
+            for queue in self._queues:
+                for index, (future, bucket) in enumerate(queue):
+                    wait = bucket.wait_time(now) if bucket is not None else 0.0
+                    if not wait:
+                        break
+                    earliest = wait if earliest is None else min(earliest, wait)
+                else:
+                    continue
+                # Нашелся запрос, чат которого может получить сообщение сейчас
+                del queue[index]
+                self.global_bucket.take()
+                if bucket is not None:
+                    bucket.take()
+                if not future.done():
+                    future.set_result(None)
+                break
+            else:
+                return earliest
+        return None
+
+    def stats(self) -> dict:
+        return {
+            'queued': sum(len(queue) for queue in self._queues),
+            'sent': self.sent,
+            'retries': self.retries,
+            'failed': self.failed,
+            'chats': len(self._chats),
+            'wait_ms': self.wait_latency.percentiles(),
+        }
@@ -0,0 +1,251 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import astuple, dataclass
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.constants import ParseMode
+
+from src.bot.escaping import escape_html, escape_markdown, escape_markdown_code
+from src.bot.keyboards import FrozenInlineKeyboardMarkup
+from src.bot.splitter import split_message
+from src.models import Question
+from src.models.algorithm import Algorithm
+
+# Хеши содержимого карточек по id объекта. Карточки не меняются во время работы,
+# поэтому хеш считается один раз; сама карточка хранится рядом, чтобы id не переиспользовался
+_content_hashes: Dict[int, Tuple[object, str]] = {}
+
+
+def content_hash(card) -> str:
+    """Возвращает хеш содержимого карточки (Question или Algorithm)"""
+    entry = _content_hashes.get(id(card))
+    if entry is not None and entry[0] is card:
+        return entry[1]
+    digest = hashlib.sha1(repr(astuple(card)).encode('utf-8')).hexdigest()
+    _content_hashes[id(card)] = (card, digest)
+    return digest
+
+
+# callback_data кнопки с номером страницы, нажатие на которую ничего не меняет
+NOOP_CALLBACK = 'noop'
+
+
+@dataclass
+class RenderedCard:
+    """Готовая к отправке карточка, разбитая на страницы"""
+    pages: List[str]  # Страницы в пределах лимита Telegram
+    markups: List[InlineKeyboardMarkup]  # Клавиатура для каждой страницы
+    parse_mode: str  # Режим разметки Telegram
+
+
+class RenderCache:
+    """LRU-кеш отрендеренных карточек со счетчиками попаданий и промахов"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items: 'OrderedDict[Hashable, RenderedCard]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, render: Callable[[], RenderedCard]) -> RenderedCard:
+        """Возвращает карточку из кеша или рендерит ее и сохраняет"""
+        with self._lock:
+            rendered = self._items.get(key)
+            if rendered is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return rendered
+            self.misses += 1
+
+        rendered = render()
+        with self._lock:
+            self._items[key] = rendered
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return rendered
+
+    def stats(self) -> dict:
+        """Статистика использования кеша"""
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def clear(self) -> None:
+        """Очищает кеш и счетчики"""
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# Общий кеш отрендеренных карточек
+render_cache = RenderCache()
+
+
+def process_code_blocks(text: str, language: str = None) -> str:
+    """Обрабатывает блоки кода в тексте"""
+    if not text:
+        return ""
+
+    # Если язык не указан, пробуем определить его из текста
+    if not language:
+        code_blocks = re.findall(r'```(\w+)?\n(.*?)```', text, re.DOTALL)
+        if code_blocks:
+            language = code_blocks[0][0] or 'text'
+
+    # Разбиваем текст на части по блокам кода
+    parts = text.split('```')
+    result = []
+
+    for i, part in enumerate(parts):
+        if i % 2 == 0:  # Обычный текст
+            # Экранируем специальные символы Markdown
+            result.append(escape_markdown(part))
+        else:  # Блок кода
+            # Определяем язык и код
+            if '\n' in part:
+                lang, code = part.split('\n', 1)
+            else:
+                lang, code = language or 'text', part
+
+            # Добавляем код в Markdown формате
+            code_lines = code.strip().split('\n')
+            formatted_code = escape_markdown_code('\n'.join(code_lines))
+            result.append(f'\n```{lang}\n{formatted_code}\n```\n')
+
+    return ''.join(result)
+
+
+def _paginate(message: str, parse_mode: str, keyboard: List[List[InlineKeyboardButton]],
+              page_callback: str) -> RenderedCard:
+    """Разбивает сообщение на страницы и добавляет к клавиатуре кнопки перелистывания.
+
+    Кнопки несут callback_data вида '<page_callback>:<номер страницы>'.
+    """
+    pages = split_message(message, parse_mode)
+    markups = []
+    for page in range(len(pages)):
+        rows = []
+        if len(pages) > 1:
+            navigation = []
+            if page > 0:
+                navigation.append(InlineKeyboardButton("◀️", callback_data=f"{page_callback}:{page - 1}"))
+            navigation.append(InlineKeyboardButton(f"{page + 1}/{len(pages)}", callback_data=NOOP_CALLBACK))
+            if page < len(pages) - 1:
+                navigation.append(InlineKeyboardButton("▶️", callback_data=f"{page_callback}:{page + 1}"))
+            rows.append(navigation)
+        markups.append(FrozenInlineKeyboardMarkup(rows + keyboard))
+    return RenderedCard(pages, markups, parse_mode)
+
+
+def deep_link(bot_username: str, card_id: str) -> str:
+    """Ссылка t.me, открывающая карточку в боте через /start <id карточки>"""
+    return f"https://t.me/{bot_username}?start={card_id}"
+
+
+def share_button(title: str, link: str) -> InlineKeyboardButton:
+    """Кнопка, открывающая диалог пересылки ссылки на карточку"""
+    query = urlencode({'url': link, 'text': title})
+    return InlineKeyboardButton("🔗 Поделиться", url=f"https://t.me/share/url?{query}")
+
+
+def site_button(url: str) -> InlineKeyboardButton:
+    """Кнопка, открывающая страницу карточки на сайте теории"""
+    return InlineKeyboardButton("🌐 На сайте", url=url)
+
+
+def _link_row(title: str, share_url: Optional[str], site_url: Optional[str]) -> List[InlineKeyboardButton]:
+    """Ряд кнопок-ссылок карточки: «Поделиться» и страница на сайте теории"""
+    row = []
+    if share_url:
+        row.append(share_button(title, share_url))
+    if site_url:
+        row.append(site_button(site_url))
+    return row
+
+
+def _render_question(card: Question, language: Optional[str], back_callback: str,
+                     parse_mode: str, page_callback: str, share_url: Optional[str],
+                     site_url: Optional[str]) -> RenderedCard:
+    """Рендерит карточку с темой раздела"""
+    message = f"*{escape_markdown(card.text)}*\n\n"
+    message += process_code_blocks(card.theory, language)
+    message += "\n\n*Практические примеры:*\n"
+    message += process_code_blocks(card.explanation, language)
+
+    keyboard = [[InlineKeyboardButton("Назад к темам", callback_data=back_callback)]]
+    links = _link_row(card.text, share_url, site_url)
+    if links:
+        keyboard.insert(0, links)
+    return _paginate(message, parse_mode, keyboard, page_callback)
+
+
+def _render_algorithm(algo: Algorithm, page_callback: str, share_url: Optional[str],
+                      site_url: Optional[str]) -> RenderedCard:
+    """Рендерит карточку алгоритма"""
+    # Формируем текст сообщения с HTML форматированием
+    message = f"<b>{escape_html(algo.title)}</b>\n\n"
+    message += f"📝 <b>Описание:</b>\n{escape_html(algo.description)}\n\n"
+    message += f"⚡️ <b>Сложность:</b>\n{escape_html(algo.complexity)}\n\n"
+    message += f"📚 <b>Теория:</b>\n{escape_html(algo.theory)}\n\n"
+    message += f"🔗 <b>Визуализация:</b>\n{escape_html(algo.visualization_url)}\n\n"
+
+    # Код обрабатываем отдельно
+    message += f"💻 <b>Java код:</b>\n<pre>{escape_html(algo.java_code)}</pre>\n\n"
+
+    if algo.python_code:
+        message += f"🐍 <b>Python код:</b>\n<pre>{escape_html(algo.python_code)}</pre>\n\n"
+
+    if algo.examples:
+        message += "<b>Примеры:</b>\n"
+        for i, example in enumerate(algo.examples, 1):
+            message += f"\nПример {i}:\n"
+            message += f"Вход: <code>{escape_html(example.input_data)}</code>\n"
+            message += f"Выход: <code>{escape_html(example.output_data)}</code>\n"
+            message += f"Объяснение: {escape_html(example.explanation)}\n"
+
+    if algo.leetcode_problems:
+        message += "\n<b>Задачи на LeetCode:</b>\n"
+        for problem in algo.leetcode_problems:
+            message += f"• {escape_html(problem)}\n"
+
+    keyboard = [
+        [InlineKeyboardButton("◀️ Назад к списку", callback_data=f"cat_{algo.category}")],
+        [InlineKeyboardButton("◀️ В главное меню", callback_data="back")]
+    ]
+    links = _link_row(algo.title, share_url, site_url)
+    if links:
+        keyboard.insert(0, links)
+    return _paginate(message, ParseMode.HTML, keyboard, page_callback)
+
+
+def render_question(card: Question, language: Optional[str], back_callback: str,
+                    parse_mode: str, page_callback: str, share_url: Optional[str] = None,
+                    site_url: Optional[str] = None) -> RenderedCard:
+    """Возвращает отрендеренную карточку темы из кеша; share_url добавляет кнопку «Поделиться»,
+    site_url - кнопку страницы карточки на сайте теории"""
+    key = (content_hash(card), parse_mode, language, back_callback, page_callback, share_url, site_url)
+    return render_cache.get(
+        key, lambda: _render_question(card, language, back_callback, parse_mode, page_callback, share_url, site_url)
+    )
+
+
+def render_algorithm(algo: Algorithm, page_callback: str, share_url: Optional[str] = None,
+                     site_url: Optional[str] = None) -> RenderedCard:
+    """Возвращает отрендеренную карточку алгоритма из кеша; share_url добавляет кнопку «Поделиться»,
+    site_url - кнопку страницы карточки на сайте теории"""
+    key = (content_hash(algo), ParseMode.HTML, page_callback, share_url, site_url)
+    return render_cache.get(key, lambda: _render_algorithm(algo, page_callback, share_url, site_url))
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Декодер аргумента маршрута: получает остаток callback_data после префикса
+# и возвращает типизированное значение либо выбрасывает ValueError
+Decoder = Callable[[str], Any]
+
+
+def index(value: str) -> int:
+    """Декодер позиции в списке: только цифры, без знака и пробелов.
+
+    int() принял бы '-1', и поддельная кнопка открыла бы элемент с конца списка.
+    """
+    if not (value.isascii() and value.isdigit()):
+        raise ValueError(f"Некорректный индекс: {value!r}")
+    return int(value)
+
+
+def paged(decoder: Decoder) -> Decoder:
+    """Декодер аргумента с необязательным номером страницы: '<arg>' или '<arg>:<page>'.
+
+    Возвращает кортеж (аргумент, страница), по умолчанию страница 0.
+    """
+    def decode(value: str) -> Tuple[Any, int]:
+        arg, separator, page = value.partition(':')
+        return decoder(arg), index(page) if separator else 0
+    return decode
+
+
+@dataclass
+class Route:
+    """Маршрут callback-запроса"""
+    pattern: str  # Точное значение или префикс callback_data
+    handler: Callable  # Обработчик (update, context[, arg])
+    decoder: Optional[Decoder] = None  # Декодер аргумента (только для префиксных маршрутов)
+    answers: bool = False  # Обработчик сам отвечает на callback-запрос (текстом), ранний ответ не нужен
+
+
+class _TrieNode:
+    """Узел префиксного дерева маршрутов"""
+    __slots__ = ('children', 'route')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.route: Optional[Route] = None
+
+
+class Router:
+    """Табличный маршрутизатор callback_data.
+
+    Точные маршруты хранятся в словаре, параметризованные - в префиксном дереве.
+    Стоимость диспетчеризации не зависит от количества зарегистрированных
+    маршрутов: один поиск в словаре плюс проход по символам префикса.
+    """
+
+    def __init__(self):
+        self._exact: Dict[str, Route] = {}
+        self._root = _TrieNode()
+
+    def route(self, pattern: str, decoder: Optional[Decoder] = None, answers: bool = False):
+        """Декоратор регистрации обработчика.
+
+        Без декодера маршрут точный, с декодером pattern считается префиксом,
+        а остаток строки передается обработчику третьим аргументом.
+        answers=True - обработчик сам отвечает на callback-запрос.
+        """
+        def decorator(handler: Callable) -> Callable:
+            self.add(pattern, handler, decoder, answers)
+            return handler
+        return decorator
+
+    def add(self, pattern: str, handler: Callable, decoder: Optional[Decoder] = None,
+            answers: bool = False) -> None:
+        """Регистрирует маршрут"""
+        route = Route(pattern, handler, decoder, answers)
+        if decoder is None:
+            if pattern in self._exact:
+                raise ValueError(f"Маршрут '{pattern}' уже зарегистрирован")
+            self._exact[pattern] = route
+            return
+
+        node = self._root
+        for char in pattern:
+            node = node.children.setdefault(char, _TrieNode())
+        if node.route is not None:
+            raise ValueError(f"Префикс '{pattern}' уже зарегистрирован")
+        node.route = route
+
+    def resolve(self, data: str) -> Optional[Tuple[Route, Any]]:
+        """Находит маршрут и декодированный аргумент для callback_data"""
+        route = self._exact.get(data)
+        if route is not None:
+            return route, None
+
+        # Ищем самый длинный зарегистрированный префикс
+        node = self._root
+        match = None
+        for i, char in enumerate(data):
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.route is not None:
+                match = (node.route, i + 1)
+        if match is None:
+            return None
+
+        route, end = match
+        try:
+            return route, route.decoder(data[end:])
+        except ValueError:
+            return None
+
+    async def dispatch(self, update, context, data: str) -> bool:
+        """Вызывает обработчик для callback_data. Возвращает False, если маршрут не найден"""
+        resolved = self.resolve(data)
+        if resolved is None:
+            return False
+
+        route, arg = resolved
+        if route.decoder is None:
+            await route.handler(update, context)
+        else:
+            await route.handler(update, context, arg)
+        return True
+
+
+def benchmark(total: int = 1_000_000) -> None:
+    """Сравнивает стоимость диспетчеризации для разного числа разделов"""
+    async def noop(*args):
+        pass
+
+    async def run_router(router: Router, calls) -> float:
+        started = time.perf_counter()
+        for data in calls:
+            await router.dispatch(None, None, data)
+        return (time.perf_counter() - started) / len(calls) * 1e9
+
+    async def run_chain(chain, calls) -> float:
+        started = time.perf_counter()
+        for data in calls:
+            for pattern, is_prefix in chain:
+                if is_prefix and data.startswith(pattern):
+                    await noop(None, None, int(data.split('_')[-1]))
+                    break
+                if not is_prefix and data == pattern:
+                    await noop(None, None)
+                    break
+        return (time.perf_counter() - started) / len(calls) * 1e9
+
+    for sections in (6, 60, 600):
+        router = Router()
+        chain = []
+        for s in range(sections):
+            router.add(f'section{s}', noop)
+            router.add(f'section{s}_topic_', noop, int)
+            chain.append((f'section{s}', False))
+            chain.append((f'section{s}_topic_', True))
+
+        # Самые "глубокие" маршруты - худший случай для цепочки if/elif
+        samples = [f'section{s}_topic_{s % 10}' for s in range(sections - 3, sections)]
+        samples += [f'section{sections - 1}']
+        calls = [samples[i % len(samples)] for i in range(total)]
+
+        router_ns = asyncio.run(run_router(router, calls))
+        # Цепочка if/elif слишком медленная для полного прогона - берем выборку
+        chain_ns = asyncio.run(run_chain(chain, calls[:max(1, total // 50)]))
+
+        print(f"разделов: {sections:4d}  router: {router_ns:8.1f} нс/вызов  if/elif: {chain_ns:10.1f} нс/вызов")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,82 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """Выполняющееся вычисление, которого ждут остальные запросы с тем же ключом"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Объединение одновременных вычислений с одинаковым ключом.
+
+    Первый запрос выполняет вычисление, остальные запросы с тем же ключом ждут
+    его завершения и получают тот же результат (или то же исключение).
+    Результат не сохраняется: следующий запрос после завершения вычисляет заново,
+    кешированием занимаются вызывающие.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.coalesced = 0
+        # Число объединенных запросов по видам ключей (первый элемент ключа-кортежа)
+        self.coalesced_by_kind: Dict[Hashable, int] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Возвращает результат fn(), разделяя его между одновременными запросами с ключом key"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+                self.builds += 1
+            else:
+                leader = False
+                call.waiters += 1
+                self.coalesced += 1
+                kind = key[0] if isinstance(key, tuple) else key
+                self.coalesced_by_kind[kind] = self.coalesced_by_kind.get(kind, 0) + 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        """Число выполняющихся вычислений"""
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {
+            'builds': self.builds,
+            'coalesced': self.coalesced,
+            'in_flight': self.in_flight(),
+            'coalesced_by_kind': dict(self.coalesced_by_kind),
+        }
+
+
+# Общий экземпляр для сборки экспортов (ExportCache). Сборке сайта теории он не нужен:
+# страницы собираются один раз за процесс (TheorySite.ready), и одновременные первые
+# запросы к сайту ждут ту же сборку
+flights = SingleFlight()
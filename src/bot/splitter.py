@@ -0,0 +1,207 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from telegram.constants import ParseMode
+
+# Максимальная длина сообщения в Telegram (в кодовых единицах UTF-16)
+MESSAGE_LIMIT = 4096
+
+# Виды токенов разметки
+TEXT = 'text'
+OPEN = 'open'
+CLOSE = 'close'
+
+# Приоритеты точек разбиения: чем больше, тем предпочтительнее
+_BREAK_PARAGRAPH = 3
+_BREAK_LINE = 2
+_BREAK_SPACE = 1
+_BREAK_ANY = 0
+
+_HTML_TOKEN = re.compile(r'<(/?)([a-zA-Z][\w-]*)[^>]*>|&#?\w+;|.', re.DOTALL)
+_MARKDOWN_CODE_LANGUAGE = re.compile(r'\w*')
+
+
+@dataclass
+class Token:
+    """Неделимый фрагмент размеченного текста"""
+    kind: str  # TEXT, OPEN или CLOSE
+    text: str  # Исходный текст токена
+    name: str = ''  # Имя сущности для OPEN/CLOSE (b, pre, bold...)
+    closer: str = ''  # Текст, закрывающий сущность (только для OPEN)
+
+
+def utf16_len(text: str) -> int:
+    """Длина строки в кодовых единицах UTF-16, как ее считает Telegram"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _close(stack: List[Token], name: str) -> bool:
+    """Закрывает сущность с именем name, если она открыта"""
+    for i in range(len(stack) - 1, -1, -1):
+        if stack[i].name == name:
+            del stack[i]
+            return True
+    return False
+
+
+def tokenize_html(text: str) -> List[Token]:
+    """Разбивает HTML-разметку Telegram на токены"""
+    tokens = []
+    for match in _HTML_TOKEN.finditer(text):
+        name = match.group(2)
+        if name is None:
+            tokens.append(Token(TEXT, match.group()))
+        elif match.group(1):
+            tokens.append(Token(CLOSE, match.group(), name.lower()))
+        else:
+            tokens.append(Token(OPEN, match.group(), name.lower(), f'</{name}>'))
+    return tokens
+
+
+def tokenize_markdown_v2(text: str) -> List[Token]:
+    """Разбивает разметку MarkdownV2 на токены"""
+    tokens = []
+    stack: List[Token] = []
+    i = 0
+    length = len(text)
+
+    def toggle(marker: str, name: str) -> None:
+        if any(token.name == name for token in stack):
+            _close(stack, name)
+            tokens.append(Token(CLOSE, marker, name))
+        else:
+            token = Token(OPEN, marker, name, marker)
+            stack.append(token)
+            tokens.append(token)
+
+    while i < length:
+        char = text[i]
+        in_code = bool(stack) and stack[-1].name in ('pre', 'code')
+
+        if char == '\\' and i + 1 < length:
+            # Экранированный символ неделим
+            tokens.append(Token(TEXT, text[i:i + 2]))
+            i += 2
+        elif text.startswith('```', i) and not (in_code and stack[-1].name == 'code'):
+            if in_code:
+                stack.pop()
+                tokens.append(Token(CLOSE, '```', 'pre'))
+                i += 3
+            else:
+                # Открывающий маркер вместе с языком и переводом строки
+                end = text.find('\n', i + 3)
+                if end != -1 and _MARKDOWN_CODE_LANGUAGE.fullmatch(text, i + 3, end):
+                    header = text[i:end + 1]
+                else:
+                    header = '```'
+                token = Token(OPEN, header, 'pre', '```')
+                stack.append(token)
+                tokens.append(token)
+                i += len(header)
+        elif char == '`' and (not in_code or stack[-1].name == 'code'):
+            toggle('`', 'code')
+            i += 1
+        elif in_code:
+            tokens.append(Token(TEXT, char))
+            i += 1
+        elif text.startswith('__', i):
+            toggle('__', 'underline')
+            i += 2
+        elif text.startswith('||', i):
+            toggle('||', 'spoiler')
+            i += 2
+        elif char in '*_~':
+            toggle(char, {'*': 'bold', '_': 'italic', '~': 'strikethrough'}[char])
+            i += 1
+        else:
+            tokens.append(Token(TEXT, char))
+            i += 1
+    return tokens
+
+
+def tokenize(text: str, parse_mode: Optional[str]) -> List[Token]:
+    """Разбивает текст на токены в зависимости от режима разметки"""
+    if parse_mode == ParseMode.HTML:
+        return tokenize_html(text)
+    if parse_mode == ParseMode.MARKDOWN_V2:
+        return tokenize_markdown_v2(text)
+    # Для остальных режимов сущности не отслеживаются
+    return [Token(TEXT, char) for char in text]
+
+
+def _break_priority(tokens: List[Token], position: int) -> int:
+    """Приоритет разбиения перед токеном с индексом position"""
+    previous = tokens[position - 1].text
+    if previous == '\n':
+        if position >= 2 and tokens[position - 2].text == '\n':
+            return _BREAK_PARAGRAPH
+        return _BREAK_LINE
+    if previous == ' ':
+        return _BREAK_SPACE
+    return _BREAK_ANY
+
+
+def split_message(text: str, parse_mode: Optional[str] = None, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Разбивает сообщение на части не длиннее limit кодовых единиц UTF-16.
+
+    Разбиение идет по границам абзацев, строк и слов; незакрытые на границе части
+    сущности (жирный текст, блоки кода) закрываются и открываются заново в следующей.
+    """
+    if utf16_len(text) <= limit:
+        return [text]
+
+    tokens = tokenize(text, parse_mode)
+    units = [utf16_len(token.text) for token in tokens]
+    chunks = []
+    stack: List[Token] = []
+    start = 0
+
+    while start < len(tokens):
+        prefix = ''.join(token.text for token in stack)
+        used = utf16_len(prefix)
+        closing = sum(utf16_len(token.closer) for token in stack)
+        current = list(stack)
+
+        # Возможные точки разбиения: (позиция, приоритет, открытые сущности)
+        candidates = []
+        position = start
+        while position < len(tokens):
+            token = tokens[position]
+            next_closing = closing
+            if token.kind == OPEN:
+                next_closing += utf16_len(token.closer)
+            elif token.kind == CLOSE and current and current[-1].name == token.name:
+                next_closing -= utf16_len(current[-1].closer)
+            if used + units[position] + next_closing > limit:
+                break
+            used += units[position]
+            closing = next_closing
+            if token.kind == OPEN:
+                current.append(token)
+            elif token.kind == CLOSE:
+                _close(current, token.name)
+            position += 1
+            # Не разбиваем сразу после открывающего токена, чтобы не оставлять пустых сущностей
+            if token.kind != OPEN:
+                candidates.append((position, _break_priority(tokens, position), list(current)))
+
+        if position == len(tokens):
+            end, end_stack = position, current
+        elif not candidates:
+            raise ValueError(f"Лимит {limit} слишком мал для разметки сообщения")
+        else:
+            # Лучшая точка разбиения во второй половине доступного окна, иначе - любая
+            window = [c for c in candidates if c[0] - start >= (position - start) // 2] or candidates
+            best = max(priority for _, priority, _ in window)
+            end, _, end_stack = [c for c in window if c[1] == best][-1]
+
+        body = ''.join(token.text for token in tokens[start:end])
+        suffix = ''.join(token.closer for token in reversed(end_stack))
+        chunk = prefix + body + suffix
+        if chunk.strip():
+            chunks.append(chunk)
+        stack = end_stack
+        start = end
+
+    return chunks
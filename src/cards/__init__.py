@@ -1,13 +1,29 @@
-from .java_core import JAVA_CORE_CARDS
-from .spring import SPRING_CARDS
-from .database import DATABASE_CARDS
-from .docker_k8s import DOCKER_K8S_CARDS
-from .algorithms import ALGORITHMS
+from .catalog import AlgorithmCatalog, get_algorithm_catalog
+from .loader import SECTION_ATTRIBUTES, load_section
+from .registry import CARD_REGISTRY, CardRegistry, CardRef
 
 __all__ = [
     'JAVA_CORE_CARDS',
     'SPRING_CARDS',
     'DATABASE_CARDS',
     'DOCKER_K8S_CARDS',
-    'ALGORITHMS'
-] 
\ No newline at end of file
+    'ALGORITHMS',
+    'ALGORITHM_CATALOG',
+    'AlgorithmCatalog',
+    'CARD_REGISTRY',
+    'CardRegistry',
+    'CardRef'
+]
+
+
+def __getattr__(name: str):
+    # Списки карточек и каталог загружаются при первом обращении, а не при импорте пакета
+    if name in SECTION_ATTRIBUTES:
+        return load_section(SECTION_ATTRIBUTES[name])
+    if name == 'ALGORITHM_CATALOG':
+        return get_algorithm_catalog()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,310 @@
+import dataclasses
+import hashlib
+import importlib
+import importlib.util
+import json
+import mmap
+import os
+import struct
+import sys
+import typing
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from src.models import Question
+from src.models.algorithm import Algorithm
+
+# Файл бандла по умолчанию; путь можно переопределить переменной CARDS_BUNDLE
+DEFAULT_BUNDLE_PATH = os.path.join(os.path.dirname(__file__), 'cards.bundle')
+
+# Версия формата: увеличивается при любом несовместимом изменении раскладки
+FORMAT_VERSION = 1
+MAGIC = b'CARDBNDL'
+
+# Заголовок: сигнатура, версия формата, число строк, смещения индекса строк и каталога, длина каталога
+_HEADER = struct.Struct('<8sIIIII')
+_U32 = struct.Struct('<I')
+
+MODELS: Dict[str, Type] = {
+    'Question': Question,
+    'Algorithm': Algorithm,
+}
+
+
+class BundleError(Exception):
+    """Бандл отсутствует, поврежден или собран из другой версии карточек"""
+
+
+def source_hash(module_name: str) -> str:
+    """Хеш исходного файла раздела: по нему определяется устаревший бандл"""
+    spec = importlib.util.find_spec(module_name)
+    with open(spec.origin, 'rb') as source:
+        return hashlib.sha1(source.read()).hexdigest()
+
+
+def _field_types(model: Type) -> List[Tuple[str, Any]]:
+    """Поля dataclass-модели с разрешенными аннотациями типов"""
+    hints = typing.get_type_hints(model)
+    return [(field.name, hints[field.name]) for field in dataclasses.fields(model)]
+
+
+def _nested_models(tp: Any) -> List[Type]:
+    """dataclass-модели внутри типа поля: X, Optional[X], List[X]"""
+    if dataclasses.is_dataclass(tp):
+        return [tp]
+    return [model for arg in typing.get_args(tp) for model in _nested_models(arg)]
+
+
+def model_schema() -> Dict[str, List[str]]:
+    """Имена и типы полей моделей карточек, включая вложенные (пример алгоритма).
+
+    Поля хранятся в бандле по позиции, поэтому бандл, собранный при другой схеме
+    моделей, считается устаревшим, даже если исходные файлы разделов не менялись.
+    """
+    schema = {}
+    pending = list(MODELS.values())
+    while pending:
+        model = pending.pop()
+        if model.__qualname__ in schema:
+            continue
+        fields = _field_types(model)
+        schema[model.__qualname__] = [f'{name}:{tp!r}' for name, tp in fields]
+        for _, tp in fields:
+            pending.extend(_nested_models(tp))
+    return schema
+
+
+def _unwrap_optional(tp: Any) -> Any:
+    """Optional[X] -> X"""
+    if typing.get_origin(tp) is typing.Union:
+        args = [arg for arg in typing.get_args(tp) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return tp
+
+
+class _StringTable:
+    """Таблица строк при сборке: одинаковые строки хранятся один раз"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def add(self, value: str) -> int:
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+
+def _encode(value: Any, table: _StringTable) -> Any:
+    """Значение поля для каталога: строки заменяются номерами в таблице строк"""
+    if isinstance(value, str):
+        return table.add(value)
+    if dataclasses.is_dataclass(value):
+        return [_encode(getattr(value, field.name), table) for field in dataclasses.fields(value)]
+    if isinstance(value, (list, tuple)):
+        return [_encode(item, table) for item in value]
+    return value
+
+
+def build_bundle(path: str = DEFAULT_BUNDLE_PATH) -> str:
+    """Собирает все разделы карточек в один бинарный бандл.
+
+    Раскладка: заголовок, таблица строк (каждая строка - длина u32 и UTF-8),
+    индекс строк (смещение u32 на строку) и каталог в JSON, где поля карточек
+    хранятся номерами строк.
+    """
+    from .loader import SECTION_MODULES
+
+    table = _StringTable()
+    sections = {}
+    sources = {}
+    for section, (module_name, attribute) in SECTION_MODULES.items():
+        cards = getattr(importlib.import_module(module_name), attribute)
+        models = {type(card).__name__ for card in cards}
+        if len(models) != 1 or not models <= set(MODELS):
+            raise BundleError(f"Раздел {section}: неподдерживаемые модели карточек {sorted(models)}")
+        sections[section] = {
+            'model': models.pop(),
+            'cards': [
+                [_encode(getattr(card, field.name), table) for field in dataclasses.fields(card)]
+                for card in cards
+            ],
+        }
+        sources[section] = source_hash(module_name)
+
+    directory = json.dumps(
+        {'sources': sources, 'schema': model_schema(), 'sections': sections},
+        ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+    body = bytearray()
+    offsets = []
+    for value in table.strings:
+        data = value.encode('utf-8')
+        offsets.append(_HEADER.size + len(body))
+        body += _U32.pack(len(data))
+        body += data
+    index = b''.join(_U32.pack(offset) for offset in offsets)
+    index_offset = _HEADER.size + len(body)
+    directory_offset = index_offset + len(index)
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(offsets), index_offset, directory_offset, len(directory))
+    # Пишем во временный файл и заменяем атомарно, чтобы запущенный бот не увидел половину бандла
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as bundle_file:
+        bundle_file.write(header)
+        bundle_file.write(body)
+        bundle_file.write(index)
+        bundle_file.write(directory)
+    os.replace(tmp_path, path)
+    return path
+
+
+class CardBundle:
+    """Открытый через mmap бандл карточек.
+
+    В памяти держится только каталог (номера строк полей); сами строки
+    декодируются из отображенного файла при первом обращении к полю карточки.
+    """
+
+    def __init__(self, path: str):
+        try:
+            with open(path, 'rb') as bundle_file:
+                self._mmap = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise BundleError(f"Не удалось открыть бандл {path}: {e}")
+
+        if len(self._mmap) < _HEADER.size:
+            raise BundleError(f"Бандл {path} поврежден")
+        magic, version, count, index_offset, directory_offset, directory_length = \
+            _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise BundleError(f"Бандл {path}: неподдерживаемая версия формата {version}")
+
+        self.path = path
+        self._count = count
+        self._index_offset = index_offset
+        directory = json.loads(self._mmap[directory_offset:directory_offset + directory_length])
+        self.sources: Dict[str, str] = directory['sources']
+        self.schema: Optional[Dict[str, List[str]]] = directory.get('schema')
+        self._sections = directory['sections']
+        self._views: Dict[str, Tuple] = {}
+
+    def string(self, string_id: int) -> str:
+        """Строка по номеру: смещение из индекса, затем длина и UTF-8 байты"""
+        if not 0 <= string_id < self._count:
+            raise BundleError(f"Номер строки {string_id} вне таблицы")
+        offset = _U32.unpack_from(self._mmap, self._index_offset + 4 * string_id)[0]
+        length = _U32.unpack_from(self._mmap, offset)[0]
+        return self._mmap[offset + 4:offset + 4 + length].decode('utf-8')
+
+    def decode(self, tp: Any, raw: Any) -> Any:
+        """Значение поля по его типу в модели"""
+        tp = _unwrap_optional(tp)
+        if raw is None:
+            return None
+        if tp is str:
+            return self.string(raw)
+        if typing.get_origin(tp) is list:
+            (item_type,) = typing.get_args(tp)
+            return [self.decode(item_type, item) for item in raw]
+        if dataclasses.is_dataclass(tp):
+            return tp(*[self.decode(field_type, item) for (_, field_type), item in zip(_field_types(tp), raw)])
+        return raw
+
+    def sections(self) -> List[str]:
+        """Разделы в бандле"""
+        return list(self._sections)
+
+    def section(self, section: str) -> Tuple:
+        """Карточки раздела - ленивые представления моделей src/models"""
+        views = self._views.get(section)
+        if views is None:
+            entry = self._sections[section]
+            view_class = _lazy_view(MODELS[entry['model']])
+            views = self._views[section] = tuple(view_class(self, raw) for raw in entry['cards'])
+        return views
+
+    def is_current(self, section: str, module_name: str) -> bool:
+        """Собран ли раздел из текущей версии исходного файла и при текущих полях моделей"""
+        return self.schema == _current_schema() and self.sources.get(section) == source_hash(module_name)
+
+
+_schema: Optional[Dict[str, List[str]]] = None
+
+
+def _current_schema() -> Dict[str, List[str]]:
+    """Схема моделей текущего процесса; модели не меняются без перезапуска"""
+    global _schema
+    if _schema is None:
+        _schema = model_schema()
+    return _schema
+
+
+_view_classes: Dict[Type, Type] = {}
+
+
+def _lazy_view(model: Type) -> Type:
+    """Подкласс модели, поля которого декодируются из бандла при первом обращении"""
+    view_class = _view_classes.get(model)
+    if view_class is not None:
+        return view_class
+
+    field_types = _field_types(model)
+
+    def __init__(self, bundle: CardBundle, raw: List[Any]):
+        self._bundle = bundle
+        self._raw = raw
+        self._values = {}
+
+    def make_property(position: int, name: str, tp: Any) -> property:
+        def get(self):
+            values = self._values
+            if name not in values:
+                values[name] = self._bundle.decode(tp, self._raw[position])
+            return values[name]
+        return property(get)
+
+    namespace = {
+        '__slots__': ('_bundle', '_raw', '_values'),
+        '__init__': __init__,
+        '__doc__': f"{model.__doc__} (из бандла)",
+    }
+    for position, (name, tp) in enumerate(field_types):
+        namespace[name] = make_property(position, name, tp)
+
+    view_class = _view_classes[model] = type(model.__name__, (model,), namespace)
+    return view_class
+
+
+_bundle: Optional[CardBundle] = None
+
+
+def open_bundle(path: str) -> CardBundle:
+    """Общий экземпляр бандла на процесс"""
+    global _bundle
+    if _bundle is None or _bundle.path != path:
+        _bundle = CardBundle(path)
+    return _bundle
+
+
+def verify(path: str = DEFAULT_BUNDLE_PATH) -> None:
+    """Проверяет, что карточки из бандла совпадают с карточками из исходных модулей"""
+    from .loader import SECTION_MODULES
+
+    bundle = CardBundle(path)
+    for section, (module_name, attribute) in SECTION_MODULES.items():
+        expected = getattr(importlib.import_module(module_name), attribute)
+        decoded = bundle.section(section)
+        assert len(decoded) == len(expected), section
+        for card, original in zip(decoded, expected):
+            assert dataclasses.astuple(card) == dataclasses.astuple(original), section
+    print(f"Бандл {path}: {len(bundle.sections())} разделов совпадают с исходными модулями")
+
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_BUNDLE_PATH
+    print(f"Бандл собран: {build_bundle(target)} ({os.path.getsize(target)} байт)")
+    verify(target)
@@ -0,0 +1,96 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.models.algorithm import Algorithm
+from .loader import load_section
+from .registry import card_id
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """Алгоритм в каталоге вместе с его идентификатором и позицией"""
+    id: str  # Стабильный идентификатор карточки (см. registry.card_id)
+    index: int  # Позиция в ALGORITHMS
+    algorithm: Algorithm
+
+
+class AlgorithmCatalog:
+    """Каталог алгоритмов с заранее построенными индексами.
+
+    Все выборки по категории и сложности строятся один раз при создании,
+    поэтому запросы не зависят от общего числа алгоритмов.
+    """
+
+    def __init__(self, algorithms: Sequence[Algorithm]):
+        self.entries: Tuple[CatalogEntry, ...] = tuple(
+            CatalogEntry(card_id('algorithms', algo), i, algo) for i, algo in enumerate(algorithms)
+        )
+        self._by_id: Dict[str, CatalogEntry] = {}
+        by_category: Dict[str, List[CatalogEntry]] = {}
+        by_difficulty: Dict[str, List[CatalogEntry]] = {}
+        by_both: Dict[Tuple[str, str], List[CatalogEntry]] = {}
+
+        for entry in self.entries:
+            if entry.id in self._by_id:
+                raise ValueError(f"Повторяющийся идентификатор алгоритма: {entry.algorithm.title}")
+            self._by_id[entry.id] = entry
+            algo = entry.algorithm
+            by_category.setdefault(algo.category, []).append(entry)
+            by_difficulty.setdefault(algo.difficulty, []).append(entry)
+            by_both.setdefault((algo.category, algo.difficulty), []).append(entry)
+
+        # Категории сохраняют порядок первого появления в списке алгоритмов
+        self._by_category = {key: tuple(value) for key, value in by_category.items()}
+        self._by_difficulty = {key: tuple(value) for key, value in by_difficulty.items()}
+        self._by_category_and_difficulty = {key: tuple(value) for key, value in by_both.items()}
+
+    def get(self, algo_id: str) -> CatalogEntry:
+        """Алгоритм по идентификатору"""
+        return self._by_id[algo_id]
+
+    def categories(self) -> List[str]:
+        """Список категорий в порядке первого появления"""
+        return list(self._by_category)
+
+    def by_category(self, category: str) -> Tuple[CatalogEntry, ...]:
+        """Алгоритмы категории"""
+        return self._by_category.get(category, ())
+
+    def by_difficulty(self, difficulty: str) -> Tuple[CatalogEntry, ...]:
+        """Алгоритмы заданной сложности"""
+        return self._by_difficulty.get(difficulty, ())
+
+    def by_category_and_difficulty(self, category: str, difficulty: str) -> Tuple[CatalogEntry, ...]:
+        """Алгоритмы категории заданной сложности"""
+        return self._by_category_and_difficulty.get((category, difficulty), ())
+
+    def __getitem__(self, index: int) -> CatalogEntry:
+        return self.entries[index]
+
+    def __iter__(self) -> Iterator[CatalogEntry]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+_catalog: Optional[AlgorithmCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_algorithm_catalog() -> AlgorithmCatalog:
+    """Каталог всех алгоритмов из src/cards/algorithms.py, строится при первом обращении"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = AlgorithmCatalog(load_section('algorithms'))
+    return _catalog
+
+
+def __getattr__(name: str):
+    # ALGORITHM_CATALOG остается доступен как атрибут модуля, но строится лениво
+    if name == 'ALGORITHM_CATALOG':
+        return get_algorithm_catalog()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
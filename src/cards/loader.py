@@ -0,0 +1,132 @@
+import importlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from .bundle import DEFAULT_BUNDLE_PATH, BundleError, CardBundle, open_bundle
+
+logger = logging.getLogger(__name__)
+
+# Разделы с карточками: модуль и имя списка карточек в нем
+SECTION_MODULES = {
+    'java_core': ('src.cards.java_core', 'JAVA_CORE_CARDS'),
+    'spring': ('src.cards.spring', 'SPRING_CARDS'),
+    'database': ('src.cards.database', 'DATABASE_CARDS'),
+    'docker_k8s': ('src.cards.docker_k8s', 'DOCKER_K8S_CARDS'),
+    'algorithms': ('src.cards.algorithms', 'ALGORITHMS'),
+    'system_design': ('src.cards.system_design', 'SYSTEM_DESIGN_CARDS'),
+}
+
+# Имя списка карточек -> раздел
+SECTION_ATTRIBUTES = {attribute: section for section, (_, attribute) in SECTION_MODULES.items()}
+
+_sections: Dict[str, Sequence] = {}
+_lock = threading.Lock()
+
+
+def _bundle_path() -> str:
+    """Путь к бандлу карточек; пустая строка в CARDS_BUNDLE отключает бандл"""
+    return os.getenv('CARDS_BUNDLE', DEFAULT_BUNDLE_PATH)
+
+
+def _bundled_section(section: str) -> Optional[Sequence]:
+    """Карточки раздела из бандла или None, если бандла нет или он устарел"""
+    path = _bundle_path()
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        bundle: CardBundle = open_bundle(path)
+        module_name, _ = SECTION_MODULES[section]
+        if not bundle.is_current(section, module_name):
+            logger.warning(f"Бандл {path} устарел для раздела {section}, карточки загружаются из модуля")
+            return None
+        return bundle.section(section)
+    except (BundleError, KeyError) as e:
+        logger.warning(f"Бандл {path} не используется: {e}")
+        return None
+
+
+def load_section(section: str) -> Sequence:
+    """Возвращает карточки раздела при первом обращении загружая их из бандла,
+    а если его нет - импортируя модуль раздела"""
+    cards = _sections.get(section)
+    if cards is not None:
+        return cards
+
+    module_name, attribute = SECTION_MODULES[section]
+    with _lock:
+        if section not in _sections:
+            cards = _bundled_section(section)
+            if cards is None:
+                cards = getattr(importlib.import_module(module_name), attribute)
+            _sections[section] = cards
+    return _sections[section]
+
+
+def loaded_sections() -> List[str]:
+    """Уже загруженные разделы"""
+    return list(_sections)
+
+
+def warm_up() -> None:
+    """Загружает все разделы заранее"""
+    for section in SECTION_MODULES:
+        load_section(section)
+
+
+# Замер старта в отдельном процессе: импорт обработчиков бота, затем загрузка всех разделов
+# (eager) или ничего (lazy). Источник карточек задается переменной CARDS_BUNDLE
+_STARTUP_PROBE = '''
+import json, resource, sys, time
+started = time.perf_counter()
+import src.bot.handlers as handlers
+cards_started = time.perf_counter()
+if sys.argv[1] == 'eager':
+    from src.cards.loader import warm_up
+    warm_up()
+finished = time.perf_counter()
+from src.cards.loader import loaded_sections
+print(json.dumps({
+    'seconds': finished - started,
+    'cards_seconds': finished - cards_started,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'sections': len(loaded_sections()),
+}))
+'''
+
+
+def startup_report(runs: int = 5) -> None:
+    """Сравнивает время старта и пиковую память: жадная и ленивая загрузка,
+    карточки из Python-модулей и из бандла"""
+    import tempfile
+    from .bundle import build_bundle
+
+    with tempfile.TemporaryDirectory() as directory:
+        bundle_path = build_bundle(os.path.join(directory, 'cards.bundle'))
+        for source, path in (('модули', ''), ('бандл', bundle_path)):
+            for mode in ('eager', 'lazy'):
+                results = []
+                for _ in range(runs):
+                    # -B: без байткода, как в контейнере с read-only файловой системой
+                    output = subprocess.run(
+                        [sys.executable, '-B', '-c', _STARTUP_PROBE, mode],
+                        capture_output=True, text=True, check=True,
+                        env={**os.environ, 'CARDS_BUNDLE': path}
+                    ).stdout
+                    results.append(json.loads(output.strip().splitlines()[-1]))
+                seconds = sorted(result['seconds'] for result in results)[runs // 2]
+                cards_seconds = sorted(result['cards_seconds'] for result in results)[runs // 2]
+                rss = sorted(result['max_rss_kb'] for result in results)[runs // 2]
+                print(f"{source:6s} {mode:5s}: старт {seconds * 1000:7.1f} мс "
+                      f"(карточки {cards_seconds * 1000:5.1f} мс), пиковая память {rss / 1024:6.1f} МБ, загружено разделов: {results[0]['sections']}")
+
+
+if __name__ == '__main__':
+    started = time.perf_counter()
+    startup_report()
+    print(f"Всего: {time.perf_counter() - started:.1f} с")
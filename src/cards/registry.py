@@ -0,0 +1,149 @@
+import base64
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+from src.models import Question
+from src.models.algorithm import Algorithm
+from .loader import SECTION_MODULES, load_section
+
+Card = Union[Question, Algorithm]
+
+# Однобуквенные коды разделов - первый символ идентификатора карточки.
+# По нему реестр определяет, какой раздел загрузить для поиска карточки
+SECTION_CODES = {
+    'java_core': 'j',
+    'spring': 's',
+    'database': 'd',
+    'docker_k8s': 'k',
+    'algorithms': 'a',
+    'system_design': 'y',
+}
+
+
+# Названия разделов для пользователя
+SECTION_TITLES = {
+    'java_core': 'Java Core',
+    'spring': 'Spring Framework',
+    'database': 'Базы данных',
+    'docker_k8s': 'Docker и Kubernetes',
+    'algorithms': 'Алгоритмы',
+    'system_design': 'System Design',
+}
+
+
+def card_title(card: Card) -> str:
+    """Заголовок карточки"""
+    return card.title if isinstance(card, Algorithm) else card.text
+
+
+def card_id(section: str, card: Card) -> str:
+    """Стабильный идентификатор карточки.
+
+    Строится из явного ключа карточки (если задан) или ее заголовка, поэтому не меняется
+    при перестановке и добавлении карточек. Формат: код раздела + 8 символов base32
+    (40 бит хеша) - 9 байт, что оставляет в callback_data место для префикса и страницы.
+    """
+    source = card.key or card_title(card)
+    digest = hashlib.sha1(f'{section}:{source}'.encode('utf-8')).digest()[:5]
+    return SECTION_CODES[section] + base64.b32encode(digest).decode('ascii').lower()
+
+
+@dataclass(frozen=True)
+class CardRef:
+    """Карточка в реестре"""
+    id: str  # Стабильный идентификатор
+    section: str  # Раздел (ключ SECTION_CODES)
+    index: int  # Позиция в списке раздела
+    card: Card
+
+    @property
+    def title(self) -> str:
+        return card_title(self.card)
+
+
+class CardRegistry:
+    """Глобальный реестр карточек всех разделов с поиском по идентификатору за O(1).
+
+    Разделы загружаются лениво: при первом обращении к карточке раздела
+    (по коду раздела в идентификаторе) или к списку его карточек.
+    """
+
+    def __init__(self, sections: Iterable[str], load: Callable[[str], Sequence[Card]]):
+        self._load = load
+        self._names: Tuple[str, ...] = tuple(sections)
+        self._by_code = {SECTION_CODES[section]: section for section in self._names}
+        self._by_id: Dict[str, CardRef] = {}
+        self._sections: Dict[str, Tuple[CardRef, ...]] = {}
+        self._lock = threading.Lock()
+
+    def _section_refs(self, section: str) -> Tuple[CardRef, ...]:
+        """Карточки раздела, при первом обращении загружает раздел"""
+        refs = self._sections.get(section)
+        if refs is not None:
+            return refs
+
+        with self._lock:
+            if section not in self._sections:
+                if section not in self._names:
+                    raise KeyError(section)
+                built = tuple(
+                    CardRef(card_id(section, card), section, index, card)
+                    for index, card in enumerate(self._load(section))
+                )
+                by_id = {}
+                for ref in built:
+                    if ref.id in by_id:
+                        raise ValueError(
+                            f"Повторяющийся идентификатор карточки {ref.id}: '{ref.title}'. "
+                            f"Задайте карточке явный key"
+                        )
+                    by_id[ref.id] = ref
+                self._by_id.update(by_id)
+                self._sections[section] = built
+        return self._sections[section]
+
+    def get(self, card_id: str) -> CardRef:
+        """Карточка по идентификатору"""
+        ref = self.find(card_id)
+        if ref is None:
+            raise KeyError(card_id)
+        return ref
+
+    def find(self, card_id: str) -> Optional[CardRef]:
+        """Карточка по идентификатору или None"""
+        ref = self._by_id.get(card_id)
+        if ref is None and card_id:
+            section = self._by_code.get(card_id[0])
+            if section is not None and section not in self._sections:
+                self._section_refs(section)
+                ref = self._by_id.get(card_id)
+        return ref
+
+    def section(self, section: str) -> Tuple[CardRef, ...]:
+        """Карточки раздела в исходном порядке"""
+        return self._section_refs(section)
+
+    def at(self, section: str, index: int) -> CardRef:
+        """Карточка по позиции в разделе (для кнопок старого формата)"""
+        return self._section_refs(section)[index]
+
+    def sections(self) -> Tuple[str, ...]:
+        """Ключи разделов"""
+        return self._names
+
+    def loaded(self) -> Tuple[str, ...]:
+        """Уже загруженные разделы"""
+        return tuple(self._sections)
+
+    def __iter__(self) -> Iterator[CardRef]:
+        for section in self._names:
+            yield from self._section_refs(section)
+
+    def __len__(self) -> int:
+        return sum(len(self._section_refs(section)) for section in self._names)
+
+
+# Реестр всех карточек бота; разделы загружаются при первом обращении
+CARD_REGISTRY = CardRegistry(SECTION_MODULES, load_section)
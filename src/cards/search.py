@@ -0,0 +1,327 @@
+import heapq
+import math
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from src.models.algorithm import Algorithm
+from .registry import CARD_REGISTRY, CardRef
+
+_WORD = re.compile(r'[a-zа-я0-9]+(?:[+#]+)?')
+
+STOP_WORDS = frozenset('''
+а без более бы был была были было быть в вам вас весь во вот все всего всех вы где да для до его
+ее если есть еще же за здесь и из или им их к как ко когда кто ли либо мы на над не нет ни но ну о
+об однако он она они оно от очень по под при с со так также такой там те тем то того тоже той только
+том ты у уже хотя чего чей чем что чтобы эта эти это этот я
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+'''.split())
+
+# Окончания для облегченного стемминга, от длинных к коротким
+_RUSSIAN_ENDINGS = sorted('''
+иями ями ами иях ях ах ов ев ей ой ий ый ая яя ое ее ые ие ого его ому ему ым им ом ем ую юю
+ешь ет ем ете ут ют ит ишь им ите ат ят ать ять ить ыть ла ло ли ся сь ость ости а я ы и у ю о е ь
+'''.split(), key=len, reverse=True)
+_ENGLISH_ENDINGS = ('ing', 'ed', 'es', 's')
+
+# Инлайн-поиск по заголовкам: триграммы для запросов с опечатками и частями слов
+TRIGRAM = 3
+# Доля триграмм слова запроса, которая должна встретиться в заголовке при нечетком совпадении
+TRIGRAM_MATCH = 0.4
+
+# Параметры BM25
+K1 = 1.5
+B = 0.75
+# Вес заголовка: его слова учитываются как встретившиеся TITLE_WEIGHT раз
+TITLE_WEIGHT = 3
+
+
+def stem(word: str) -> str:
+    """Облегченный стемминг: отбрасывает типичное окончание, оставляя основу не короче 3 символов"""
+    if word.isascii():
+        for ending in _ENGLISH_ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= 3:
+                return word[:-len(ending)]
+        return word
+    for ending in _RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def normalize(text: str) -> List[str]:
+    """Термы текста: нижний регистр, ё -> е, без стоп-слов, с облегченным стеммингом"""
+    words = _WORD.findall(text.lower().replace('ё', 'е'))
+    return [stem(word) for word in words if word not in STOP_WORDS]
+
+
+def card_fields(card) -> Tuple[str, List[str]]:
+    """Заголовок и индексируемые поля карточки"""
+    if isinstance(card, Algorithm):
+        return card.title, [card.description, card.theory]
+    return card.text, [card.theory, card.explanation]
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    """Карточка в результатах поиска"""
+    ref: CardRef
+    score: float
+
+
+class SearchIndex:
+    """Инвертированный индекс с ранжированием BM25.
+
+    Вклад каждого терма в оценку документа считается при построении, поэтому
+    запрос - это сложение готовых весов из списков вхождений терминов запроса.
+    """
+
+    def __init__(self, refs: Iterable[CardRef]):
+        self.refs: List[CardRef] = []
+        frequencies: List[Dict[str, int]] = []
+        lengths: List[int] = []
+        for ref in refs:
+            title, fields = card_fields(ref.card)
+            counts: Dict[str, int] = {}
+            for term in normalize(title):
+                counts[term] = counts.get(term, 0) + TITLE_WEIGHT
+            for field in fields:
+                for term in normalize(field):
+                    counts[term] = counts.get(term, 0) + 1
+            self.refs.append(ref)
+            frequencies.append(counts)
+            lengths.append(sum(counts.values()))
+
+        total = len(self.refs)
+        average_length = (sum(lengths) / total) if total else 0.0
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, counts in enumerate(frequencies):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        self._postings: Dict[str, Tuple[Tuple[int, float], ...]] = {}
+        for term, entries in postings.items():
+            idf = math.log(1 + (total - len(entries) + 0.5) / (len(entries) + 0.5))
+            self._postings[term] = tuple(
+                (doc, idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[doc] / average_length)))
+                for doc, tf in entries
+            )
+
+    def search(self, query: str, limit: int = 10) -> List[SearchResult]:
+        """Карточки по убыванию релевантности запросу"""
+        scores: Dict[int, float] = {}
+        for term in set(normalize(query)):
+            for doc, weight in self._postings.get(term, ()):
+                scores[doc] = scores.get(doc, 0.0) + weight
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [SearchResult(self.refs[doc], score) for doc, score in best]
+
+    def __len__(self) -> int:
+        return len(self.refs)
+
+    def terms(self) -> int:
+        """Число различных термов в индексе"""
+        return len(self._postings)
+
+
+def title_words(text: str) -> List[str]:
+    """Слова заголовка или инлайн-запроса без стемминга: нижний регистр, ё -> е"""
+    return _WORD.findall(text.lower().replace('ё', 'е'))
+
+
+def trigrams(word: str) -> FrozenSet[str]:
+    """Триграммы слова с границами, чтобы начало и конец слова весили больше середины"""
+    padded = f' {word} '
+    return frozenset(padded[i:i + TRIGRAM] for i in range(len(padded) - TRIGRAM + 1))
+
+
+class TitleIndex:
+    """Префиксный и триграммный индекс заголовков карточек для инлайн-режима.
+
+    Каждый префикс каждого слова заголовка отображается на номера карточек,
+    отсортированные по статическому рангу (короткие заголовки выше), поэтому
+    запрос по мере набора - это пересечение готовых списков до первых limit
+    совпадений. Если префиксы ничего не нашли (опечатка, середина слова),
+    используются триграммы.
+    """
+
+    def __init__(self, refs: Iterable[CardRef]):
+        self.refs: List[CardRef] = list(refs)
+        # Статический ранг: короткий заголовок точнее, при равенстве - исходный порядок
+        order = sorted(range(len(self.refs)), key=lambda doc: (len(self.refs[doc].title), doc))
+        self._rank = [0] * len(self.refs)
+        for rank, doc in enumerate(order):
+            self._rank[doc] = rank
+
+        prefixes: Dict[str, set] = {}
+        grams: Dict[str, set] = {}
+        for doc, ref in enumerate(self.refs):
+            for word in title_words(ref.title):
+                for end in range(1, len(word) + 1):
+                    prefixes.setdefault(word[:end], set()).add(doc)
+                for gram in trigrams(word):
+                    grams.setdefault(gram, set()).add(doc)
+
+        # Списки в порядке ранга для обхода и множества для проверки вхождения
+        self._prefixes: Dict[str, Tuple[Tuple[int, ...], FrozenSet[int]]] = {
+            prefix: (tuple(sorted(docs, key=self._rank.__getitem__)), frozenset(docs))
+            for prefix, docs in prefixes.items()
+        }
+        self._trigrams: Dict[str, Tuple[int, ...]] = {gram: tuple(docs) for gram, docs in grams.items()}
+        self._all: Tuple[int, ...] = tuple(order)
+
+    def search(self, query: str, limit: int = 50) -> List[CardRef]:
+        """Карточки, в заголовке которых каждое слово запроса начинает какое-то слово"""
+        words = title_words(query)
+        if not words:
+            return [self.refs[doc] for doc in self._all[:limit]]
+
+        postings = []
+        missing = []
+        for word in set(words):
+            entry = self._prefixes.get(word)
+            if entry is None:
+                missing.append(word)
+            else:
+                postings.append(entry)
+        if missing:
+            return self._fuzzy(missing, [members for _, members in postings], limit)
+        postings.sort(key=lambda entry: len(entry[0]))
+
+        shortest, others = postings[0][0], [members for _, members in postings[1:]]
+        found = []
+        for doc in shortest:
+            if all(doc in members for members in others):
+                found.append(self.refs[doc])
+                if len(found) == limit:
+                    break
+        return found
+
+    def _fuzzy(self, words: List[str], matched: List[FrozenSet[int]], limit: int) -> List[CardRef]:
+        """Карточки, похожие по триграммам на каждое из слов words и содержащие префиксы matched"""
+        scores: Optional[Dict[int, int]] = None
+        for word in words:
+            grams = trigrams(word)
+            counts: Dict[int, int] = {}
+            for gram in grams:
+                for doc in self._trigrams.get(gram, ()):
+                    counts[doc] = counts.get(doc, 0) + 1
+            threshold = TRIGRAM_MATCH * len(grams)
+            if scores is None:
+                scores = {doc: count for doc, count in counts.items() if count >= threshold}
+            else:
+                scores = {doc: scores[doc] + count for doc, count in counts.items()
+                          if count >= threshold and doc in scores}
+
+        best = heapq.nsmallest(
+            limit,
+            (doc for doc in scores if all(doc in members for members in matched)),
+            key=lambda doc: (-scores[doc], self._rank[doc]),
+        )
+        return [self.refs[doc] for doc in best]
+
+    def __len__(self) -> int:
+        return len(self.refs)
+
+
+_index: Optional[SearchIndex] = None
+_title_index: Optional[TitleIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Индекс по всем карточкам реестра, строится при первом обращении"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex(CARD_REGISTRY)
+    return _index
+
+
+def get_title_index() -> TitleIndex:
+    """Индекс заголовков всех карточек для инлайн-режима, строится при первом обращении"""
+    global _title_index
+    if _title_index is None:
+        with _index_lock:
+            if _title_index is None:
+                _title_index = TitleIndex(CARD_REGISTRY)
+    return _title_index
+
+
+def build_indexes() -> None:
+    """Строит полнотекстовый и инлайн-индексы (прогрев при CARDS_WARMUP=1)"""
+    get_search_index()
+    get_title_index()
+
+
+def _percentiles(timings: List[float]) -> None:
+    timings.sort()
+    for name, quantile in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+        print(f"{name}: {timings[int(quantile * (len(timings) - 1))] * 1e6:8.1f} мкс")
+    print(f"max: {timings[-1] * 1e6:8.1f} мкс")
+
+
+def benchmark(scale: int = 100, queries: int = 2000, seed: int = 0) -> None:
+    """Время запроса на корпусе, в scale раз большем текущего"""
+    refs: Sequence[CardRef] = list(CARD_REGISTRY)
+    started = time.perf_counter()
+    index = SearchIndex(refs * scale)
+    build_seconds = time.perf_counter() - started
+
+    # Запросы из одного-трех слов заголовков и текстов карточек
+    rng = random.Random(seed)
+    vocabulary = [word for ref in refs for word in _WORD.findall(ref.title.lower())]
+    samples = [' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3))) for _ in range(queries)]
+
+    timings = []
+    for query in samples:
+        started = time.perf_counter()
+        index.search(query)
+        timings.append(time.perf_counter() - started)
+
+    print(f"Корпус: {len(index)} документов ({scale}x), термов: {index.terms()}, "
+          f"построение {build_seconds:.2f} с")
+    _percentiles(timings)
+
+
+def inline_benchmark(scale: int = 100, keystrokes: int = 20000, seed: int = 0) -> None:
+    """Время инлайн-запроса при наборе заголовков по буквам на корпусе, в scale раз большем текущего"""
+    refs: Sequence[CardRef] = list(CARD_REGISTRY)
+    started = time.perf_counter()
+    index = TitleIndex(refs * scale)
+    build_seconds = time.perf_counter() - started
+
+    # Каждое нажатие - префикс заголовка, как его присылает Telegram при наборе;
+    # часть запросов с опечаткой проверяет нечеткий поиск
+    rng = random.Random(seed)
+    samples = []
+    while len(samples) < keystrokes:
+        title = rng.choice(refs).title
+        if rng.random() < 0.1:
+            position = rng.randrange(len(title))
+            title = title[:position] + 'ъ' + title[position + 1:]
+        samples.extend(title[:end] for end in range(1, len(title) + 1))
+
+    timings = []
+    started = time.perf_counter()
+    for query in samples[:keystrokes]:
+        begin = time.perf_counter()
+        index.search(query)
+        timings.append(time.perf_counter() - begin)
+    total = time.perf_counter() - started
+
+    print(f"Инлайн: {len(index)} заголовков ({scale}x), построение {build_seconds:.2f} с, "
+          f"{keystrokes} нажатий подряд за {total:.2f} с ({keystrokes / total:.0f} запросов/с)")
+    _percentiles(timings)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['inline']:
+        inline_benchmark()
+    else:
+        benchmark()
@@ -0,0 +1,95 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexer import Lexer
+from pygments.lexers import get_lexer_by_name
+from pygments.util import ClassNotFound
+
+
+class CodeHiliteFormatter(HtmlFormatter):
+    """Форматер, повторяющий разметку markdown2 для fenced-блоков: div.codehilite > pre > code"""
+
+    def _wrap_code(self, inner):
+        yield 0, '<code>'
+        yield from inner
+        yield 0, '</code>'
+
+    def _add_newline(self, inner):
+        yield 0, '\n'
+        yield from inner
+        yield 0, '\n'
+
+    def wrap(self, source):
+        return self._add_newline(self._wrap_pre(self._wrap_code(source)))
+
+
+class Highlighter:
+    """Подсветка синтаксиса с переиспользованием лексеров и форматера.
+
+    Лексер создается один раз на язык, форматер - один на экземпляр; результат
+    запоминается по (язык, хеш кода), так что повторяющиеся блоки подсвечиваются один раз.
+    """
+
+    def __init__(self, formatter: HtmlFormatter, maxsize: int = 4096):
+        self.formatter = formatter
+        self.maxsize = maxsize
+        self._lexers: Dict[str, Optional[Lexer]] = {}
+        self._memo: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lexer(self, language: str) -> Optional[Lexer]:
+        """Лексер языка или None, если язык неизвестен Pygments"""
+        try:
+            return self._lexers[language]
+        except KeyError:
+            pass
+        try:
+            lexer = get_lexer_by_name(language)
+        except ClassNotFound:
+            lexer = None
+        self._lexers[language] = lexer
+        return lexer
+
+    def highlight(self, code: str, language: str) -> Optional[str]:
+        """HTML с подсветкой кода или None, если язык неизвестен"""
+        lexer = self.lexer(language)
+        if lexer is None:
+            return None
+        return self.highlight_with(code, lexer)
+
+    def highlight_with(self, code: str, lexer: Lexer) -> str:
+        """HTML с подсветкой кода заданным лексером"""
+        key = (lexer.name, hashlib.sha1(code.encode('utf-8')).hexdigest())
+        with self._lock:
+            result = self._memo.get(key)
+            if result is not None:
+                self._memo.move_to_end(key)
+                self.hits += 1
+                return result
+
+        result = highlight(code, lexer, self.formatter)
+        with self._lock:
+            self.misses += 1
+            self._memo[key] = result
+            if len(self._memo) > self.maxsize:
+                self._memo.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        """Очищает кеш подсветки (лексеры сохраняются)"""
+        with self._lock:
+            self._memo.clear()
+
+    def stats(self) -> dict:
+        return {'size': len(self._memo), 'hits': self.hits, 'misses': self.misses, 'lexers': len(self._lexers)}
+
+
+# Подсветка fenced-блоков в Markdown (разметка markdown2) и отдельных фрагментов кода
+codehilite = Highlighter(CodeHiliteFormatter(cssclass='codehilite'))
+monokai = Highlighter(HtmlFormatter(style='monokai'))
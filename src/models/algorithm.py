@@ -22,6 +22,7 @@ class Algorithm:
     examples: List[AlgorithmExample] = None  # Примеры работы алгоритма
     category: str = "general"  # Категория алгоритма (сортировка, поиск и т.д.)
     difficulty: str = "medium"  # Сложность: easy, medium, hard
+    key: Optional[str] = None  # Явный ключ для стабильного идентификатора карточки (опционально)
     
     def __post_init__(self):
         if self.leetcode_problems is None:
@@ -10,4 +10,5 @@ class Question:
     explanation: str  # Объяснение с примерами
     points: int = 0  # Количество набранных очков
     correct_answer: Optional[str] = None  # Правильный ответ (если есть)
-    options: Optional[List[str]] = None  # Варианты ответов (если есть) 
\ No newline at end of file
+    options: Optional[List[str]] = None  # Варианты ответов (если есть)
+    key: Optional[str] = None  # Явный ключ для стабильного идентификатора карточки (опционально) 
\ No newline at end of file
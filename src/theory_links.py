@@ -0,0 +1,12 @@
+import os
+from typing import Optional
+
+# Публичный адрес сервера теории, на который ссылается бот. Без THEORY_BASE_URL бот
+# не дает ссылок на сайт: адрес по умолчанию (localhost) открывался бы на устройстве пользователя.
+# Модуль отдельный от src.theory_server, чтобы бот не загружал сервер ради адреса
+BASE_URL = os.getenv('THEORY_BASE_URL', '').rstrip('/')
+
+
+def card_url(card_id: str) -> Optional[str]:
+    """Публичный адрес страницы карточки; None, если THEORY_BASE_URL не задан"""
+    return f'{BASE_URL}/c/{card_id}' if BASE_URL else None
@@ -1,306 +1,518 @@
+import asyncio
+import gzip
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import logging
 import markdown2
-import webbrowser
+import multiprocessing
 import os
-from src.bot.handlers import create_full_theory_markdown
-from pygments import highlight
-from pygments.lexers import get_lexer_by_name
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, List, Optional
+import tornado.web
+from src.bot.render import content_hash
+from src.cards.registry import CARD_REGISTRY, SECTION_TITLES
+from src.highlighter import codehilite, monokai
+from src.theory_links import BASE_URL
+from src.models.algorithm import Algorithm
 from pygments.formatters import HtmlFormatter
 import re
 import html
 
-def highlight_code(code, language):
-    """Подсвечивает синтаксис кода с использованием Pygments"""
-    try:
-        lexer = get_lexer_by_name(language)
-        formatter = HtmlFormatter(style='monokai')
-        return highlight(code, lexer, formatter)
-    except:
-        return code
-
-def convert_md_to_html(md_file_path):
-    """Конвертирует Markdown файл в HTML с красивым оформлением и подсветкой синтаксиса"""
-    with open(md_file_path, 'r', encoding='utf-8') as f:
-        md_content = f.read()
+logger = logging.getLogger(__name__)
+
+# Адрес, на котором слушает сервер (публичный адрес - BASE_URL в src.theory_links)
+HOST = os.getenv('THEORY_HOST', '0.0.0.0')
+PORT = int(os.getenv('THEORY_PORT', '5000'))
+
+# Страницы меняются только вместе с карточками, а изменения видны по ETag
+CACHE_MAX_AGE = 24 * 60 * 60
+# Статические файлы с отпечатком содержимого в имени не меняются никогда
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+# Каталог кеша HTML-фрагментов карточек
+CACHE_DIR = os.getenv('THEORY_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', '.theory_cache'))
+
+# Версия рендерера фрагментов: увеличивается при изменении card_markdown или render_markdown,
+# чтобы фрагменты, собранные старым кодом, не использовались
+FRAGMENT_VERSION = 1
+
+# Имя файла фрагмента: sha1 версии рендерера и содержимого карточки.
+# Остальные файлы каталога (например, временные файлы другой сборки) prune не трогает
+FRAGMENT_NAME = re.compile(r'[0-9a-f]{40}\.html')
+
+# Число процессов для холодной сборки фрагментов; 1 - сборка в текущем процессе.
+# Отдельный сервер (python -m src.theory_server) по умолчанию занимает все ядра, а
+# встроенный в бота (main.py) собирает в своем процессе, чтобы не отнимать CPU у бота
+BUILD_WORKERS = int(os.getenv('THEORY_BUILD_WORKERS', str(os.cpu_count() or 1)))
+EMBEDDED_BUILD_WORKERS = int(os.getenv('THEORY_BUILD_WORKERS', '1'))
+
+# Оформление страниц; правила подсветки генерируются Pygments (см. build_stylesheet)
+LAYOUT_CSS = """\
+body {
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+    line-height: 1.6;
+    max-width: 900px;
+    margin: 0 auto;
+    padding: 2rem;
+    background-color: #f5f5f5;
+}
+h1, h2, h3, h4 {
+    color: #2c3e50;
+    margin-top: 2rem;
+}
+h1 {
+    border-bottom: 2px solid #3498db;
+    padding-bottom: 0.5rem;
+}
+pre {
+    background-color: #272822;
+    padding: 1rem;
+    border-radius: 4px;
+    overflow-x: auto;
+    margin: 1rem 0;
+}
+code {
+    font-family: 'Fira Code', 'Consolas', monospace;
+    color: #f8f8f2;
+}
+.highlight, .codehilite {
+    margin: 1rem 0;
+}
+.highlight pre, .codehilite pre {
+    margin: 0;
+    background-color: #272822;
+}
+blockquote {
+    border-left: 4px solid #3498db;
+    margin: 1.5rem 0;
+    padding: 0.5rem 1rem;
+    background-color: #ebf5fb;
+}
+hr {
+    border: none;
+    border-top: 1px solid #e0e0e0;
+    margin: 2rem 0;
+}
+a {
+    color: #3498db;
+    text-decoration: none;
+}
+a:hover {
+    text-decoration: underline;
+}
+"""
+
+def build_stylesheet():
+    """Общая таблица стилей: оформление страниц и правила подсветки из стиля monokai"""
+    return LAYOUT_CSS + HtmlFormatter(style='monokai').get_style_defs(['.highlight', '.codehilite']) + '\n'
+
+STYLESHEET = build_stylesheet()
+
+class TheoryMarkdown(markdown2.Markdown):
+    """markdown2 с общими лексерами, форматером и кешем подсветки вместо новых на каждый блок"""
+
+    def _get_pygments_lexer(self, lexer_name):
+        return codehilite.lexer(lexer_name)
+
+    def _color_with_pygments(self, codeblock, lexer, **formatter_opts):
+        return codehilite.highlight_with(codeblock, lexer)
+
+def render_markdown(md_content):
+    """Рендерит Markdown в HTML-фрагмент с подсветкой синтаксиса в блоках кода"""
+    fragment = TheoryMarkdown(extras=['fenced-code-blocks', 'tables']).convert(md_content)
+    
+    # Обрабатываем блоки кода для подсветки синтаксиса
+    code_block_pattern = r'<pre><code class="language-(\w+)">(.*?)</code></pre>'
+    def replace_code_block(match):
+        language = match.group(1)
+        code = match.group(2)
+        highlighted_code = monokai.highlight(code.strip(), language)
+        if highlighted_code is None:
+            return f'<pre><code>{html.escape(code.strip())}</code></pre>'
+        return f'<div class="highlight">{highlighted_code}</div>'
     
-    # Добавляем CSS стили для красивого оформления и подсветки синтаксиса
+    return re.sub(code_block_pattern, replace_code_block, fragment, flags=re.DOTALL)
+
+def wrap_page(body, title='Теория для подготовки к собеседованиям', stylesheet_href=None):
+    """Оборачивает HTML-фрагмент в страницу с оформлением.
+
+    Со stylesheet_href страница ссылается на общую таблицу стилей, без него - встраивает ее
+    (для самостоятельного HTML-файла).
+    """
+    if stylesheet_href:
+        style = f'<link rel="stylesheet" href="{stylesheet_href}">'
+    else:
+        style = f'<style>\n{STYLESHEET}</style>'
     html_content = f"""
     <!DOCTYPE html>
     <html>
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Теория для подготовки к собеседованиям</title>
-        <style>
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-                line-height: 1.6;
-                max-width: 900px;
-                margin: 0 auto;
-                padding: 2rem;
-                background-color: #f5f5f5;
-            }}
-            h1, h2, h3, h4 {{
-                color: #2c3e50;
-                margin-top: 2rem;
-            }}
-            h1 {{
-                border-bottom: 2px solid #3498db;
-                padding-bottom: 0.5rem;
-            }}
-            pre {{
-                background-color: #272822;
-                padding: 1rem;
-                border-radius: 4px;
-                overflow-x: auto;
-                margin: 1rem 0;
-            }}
-            code {{
-                font-family: 'Fira Code', 'Consolas', monospace;
-                color: #f8f8f2;
-            }}
-            .highlight {{
-                margin: 1rem 0;
-            }}
-            .highlight pre {{
-                margin: 0;
-                background-color: #272822;
-            }}
-            .highlight .c {{
-                color: #75715e;
-            }}
-            .highlight .err {{
-                color: #960050;
-                background-color: #1e0010;
-            }}
-            .highlight .k {{
-                color: #66d9ef;
-            }}
-            .highlight .l {{
-                color: #ae81ff;
-            }}
-            .highlight .n {{
-                color: #f8f8f2;
-            }}
-            .highlight .o {{
-                color: #f92672;
-            }}
-            .highlight .p {{
-                color: #f8f8f2;
-            }}
-            .highlight .cm {{
-                color: #75715e;
-            }}
-            .highlight .cp {{
-                color: #75715e;
-            }}
-            .highlight .c1 {{
-                color: #75715e;
-            }}
-            .highlight .cs {{
-                color: #75715e;
-            }}
-            .highlight .ge {{
-                font-style: italic;
-            }}
-            .highlight .gs {{
-                font-weight: bold;
-            }}
-            .highlight .kc {{
-                color: #66d9ef;
-            }}
-            .highlight .kd {{
-                color: #66d9ef;
-            }}
-            .highlight .kn {{
-                color: #f92672;
-            }}
-            .highlight .kp {{
-                color: #66d9ef;
-            }}
-            .highlight .kr {{
-                color: #66d9ef;
-            }}
-            .highlight .kt {{
-                color: #66d9ef;
-            }}
-            .highlight .ld {{
-                color: #e6db74;
-            }}
-            .highlight .m {{
-                color: #ae81ff;
-            }}
-            .highlight .s {{
-                color: #e6db74;
-            }}
-            .highlight .na {{
-                color: #a6e22e;
-            }}
-            .highlight .nb {{
-                color: #f8f8f2;
-            }}
-            .highlight .nc {{
-                color: #a6e22e;
-            }}
-            .highlight .no {{
-                color: #66d9ef;
-            }}
-            .highlight .nd {{
-                color: #a6e22e;
-            }}
-            .highlight .ni {{
-                color: #f8f8f2;
-            }}
-            .highlight .ne {{
-                color: #a6e22e;
-            }}
-            .highlight .nf {{
-                color: #a6e22e;
-            }}
-            .highlight .nl {{
-                color: #f8f8f2;
-            }}
-            .highlight .nn {{
-                color: #f8f8f2;
-            }}
-            .highlight .nx {{
-                color: #a6e22e;
-            }}
-            .highlight .py {{
-                color: #f8f8f2;
-            }}
-            .highlight .nt {{
-                color: #f92672;
-            }}
-            .highlight .nv {{
-                color: #f8f8f2;
-            }}
-            .highlight .ow {{
-                color: #f92672;
-            }}
-            .highlight .w {{
-                color: #f8f8f2;
-            }}
-            .highlight .mf {{
-                color: #ae81ff;
-            }}
-            .highlight .mh {{
-                color: #ae81ff;
-            }}
-            .highlight .mi {{
-                color: #ae81ff;
-            }}
-            .highlight .mo {{
-                color: #ae81ff;
-            }}
-            .highlight .sb {{
-                color: #e6db74;
-            }}
-            .highlight .sc {{
-                color: #e6db74;
-            }}
-            .highlight .sd {{
-                color: #e6db74;
-            }}
-            .highlight .s2 {{
-                color: #e6db74;
-            }}
-            .highlight .se {{
-                color: #ae81ff;
-            }}
-            .highlight .sh {{
-                color: #e6db74;
-            }}
-            .highlight .si {{
-                color: #e6db74;
-            }}
-            .highlight .sx {{
-                color: #e6db74;
-            }}
-            .highlight .sr {{
-                color: #e6db74;
-            }}
-            .highlight .s1 {{
-                color: #e6db74;
-            }}
-            .highlight .ss {{
-                color: #e6db74;
-            }}
-            .highlight .bp {{
-                color: #f8f8f2;
-            }}
-            .highlight .vc {{
-                color: #f8f8f2;
-            }}
-            .highlight .vg {{
-                color: #f8f8f2;
-            }}
-            .highlight .vi {{
-                color: #f8f8f2;
-            }}
-            .highlight .il {{
-                color: #ae81ff;
-            }}
-            blockquote {{
-                border-left: 4px solid #3498db;
-                margin: 1.5rem 0;
-                padding: 0.5rem 1rem;
-                background-color: #ebf5fb;
-            }}
-            hr {{
-                border: none;
-                border-top: 1px solid #e0e0e0;
-                margin: 2rem 0;
-            }}
-            a {{
-                color: #3498db;
-                text-decoration: none;
-            }}
-            a:hover {{
-                text-decoration: underline;
-            }}
-        </style>
+        <title>{html.escape(title)}</title>
+        {style}
     </head>
     <body>
-        {markdown2.markdown(md_content, extras=['fenced-code-blocks', 'tables'])}
+        {body}
     </body>
     </html>
     """
     
-    # Обрабатываем блоки кода для подсветки синтаксиса
-    code_block_pattern = r'<pre><code class="language-(\w+)">(.*?)</code></pre>'
-    def replace_code_block(match):
-        language = match.group(1)
-        code = match.group(2)
+    return html_content
+
+def card_markdown(card) -> str:
+    """Markdown одной карточки в формате полной теории"""
+    if not isinstance(card, Algorithm):
+        return (
+            f'## {card.text}\n\n'
+            f'### Теория\n{card.theory}\n\n'
+            f'### Практические примеры\n{card.explanation}\n\n'
+        )
+
+    parts = [
+        f'## {card.title}\n\n',
+        f'### Описание\n{card.description}\n\n',
+        f'### Сложность\n{card.complexity}\n\n',
+        f'### Теория\n{card.theory}\n\n',
+    ]
+    if card.examples:
+        parts.append('### Примеры\n')
+        for i, example in enumerate(card.examples, 1):
+            parts.append(f'#### Пример {i}\n')
+            parts.append(f'- Вход: `{example.input_data}`\n')
+            parts.append(f'- Выход: `{example.output_data}`\n')
+            parts.append(f'- Объяснение: {example.explanation}\n\n')
+    parts.append(f'### Реализация на Java\n```java\n{card.java_code}\n```\n\n')
+    if card.python_code:
+        parts.append(f'### Реализация на Python\n```python\n{card.python_code}\n```\n\n')
+    if card.leetcode_problems:
+        parts.append('### Задачи на LeetCode\n')
+        parts.extend(f'- {problem}\n' for problem in card.leetcode_problems)
+        parts.append('\n')
+    return ''.join(parts)
+
+
+@dataclass(frozen=True)
+class Page:
+    """Заранее отрендеренная страница: тело, его gzip-версия и заголовки кеширования"""
+    body: bytes
+    gzipped: bytes
+    etag: str
+    last_modified: float  # Время сборки, секунды Unix
+    content_type: str = 'text/html; charset=UTF-8'
+    cache_control: str = f'public, max-age={CACHE_MAX_AGE}'
+
+    @classmethod
+    def from_text(cls, text: str, last_modified: float, **headers) -> 'Page':
+        body = text.encode('utf-8')
+        # mtime=0: одинаковое содержимое всегда сжимается в одинаковые байты
+        gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        return cls(body, gzipped, hashlib.sha1(body).hexdigest(), last_modified, **headers)
+
+
+class FragmentCache:
+    """HTML-фрагменты карточек на диске, по одному файлу на хеш содержимого карточки.
+
+    Фрагмент рендерится, только если файла для текущего содержимого еще нет,
+    поэтому после правки одной карточки пересобирается только ее фрагмент.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR):
+        self.directory = os.path.normpath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.builds = 0
+        self.removed = 0
+
+    def key(self, card) -> str:
+        """Имя фрагмента: версия рендерера и хеш содержимого карточки"""
+        return hashlib.sha1(f'{FRAGMENT_VERSION}:{content_hash(card)}'.encode('ascii')).hexdigest()
+
+    def _path(self, card) -> str:
+        return os.path.join(self.directory, f'{self.key(card)}.html')
+
+    def _read(self, card) -> Optional[str]:
         try:
-            lexer = get_lexer_by_name(language)
-            formatter = HtmlFormatter(style='monokai')
-            highlighted_code = highlight(code.strip(), lexer, formatter)
-            return f'<div class="highlight">{highlighted_code}</div>'
-        except:
-            return f'<pre><code>{html.escape(code.strip())}</code></pre>'
-    
-    html_content = re.sub(code_block_pattern, replace_code_block, html_content, flags=re.DOTALL)
-    
-    # Сохраняем HTML файл
-    html_file_path = md_file_path.replace('.md', '.html')
-    with open(html_file_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    
-    return html_file_path
+            with open(self._path(card), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
 
-def open_theory_in_browser():
-    """Создает HTML файл с теорией и открывает его в браузере"""
-    # Создаем Markdown файл
-    md_file_path = create_full_theory_markdown()
-    
-    # Конвертируем в HTML
-    html_file_path = convert_md_to_html(md_file_path)
-    
-    # Получаем абсолютный путь к файлу
-    abs_path = os.path.abspath(html_file_path)
-    
-    # Открываем в браузере
-    webbrowser.open('file://' + abs_path)
-    
-    # Удаляем Markdown файл, так как он больше не нужен
-    os.unlink(md_file_path) 
\ No newline at end of file
+    def _write(self, card, fragment: str) -> None:
+        path = self._path(card)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(fragment)
+        os.replace(tmp_path, path)
+
+    def get(self, card) -> str:
+        """HTML-фрагмент карточки из кеша или только что отрендеренный"""
+        return self.get_many([card])[0]
+
+    def get_many(self, cards: List, workers: int = 1,
+                  mp_context: Optional[multiprocessing.context.BaseContext] = None) -> List[str]:
+        """HTML-фрагменты карточек; отсутствующие в кеше рендерятся, при workers > 1 -
+        параллельно в пуле процессов с контекстом mp_context (результат тот же, что и
+        при рендеринге по одному)"""
+        fragments = [self._read(card) for card in cards]
+        missing = [i for i, fragment in enumerate(fragments) if fragment is None]
+        self.hits += len(cards) - len(missing)
+        if not missing:
+            return fragments
+
+        sources = [card_markdown(cards[i]) for i in missing]
+        if workers > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(missing)), mp_context=mp_context) as pool:
+                rendered = list(pool.map(render_markdown, sources))
+        else:
+            rendered = [render_markdown(source) for source in sources]
+
+        for i, fragment in zip(missing, rendered):
+            self._write(cards[i], fragment)
+            fragments[i] = fragment
+        self.builds += len(missing)
+        return fragments
+
+    def prune(self, cards: List) -> int:
+        """Удаляет фрагменты, которые не принадлежат ни одной из cards (старые версии
+        измененных и удаленных карточек), и возвращает число удаленных файлов"""
+        keep = {f'{self.key(card)}.html' for card in cards}
+        removed = 0
+        for name in os.listdir(self.directory):
+            if name in keep or not FRAGMENT_NAME.fullmatch(name):
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        self.removed += removed
+        return removed
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'builds': self.builds, 'removed': self.removed}
+
+
+class TheorySite:
+    """Все страницы теории: оглавление, разделы и карточки.
+
+    Страницы собираются из HTML-фрагментов карточек (FragmentCache); страница,
+    содержимое которой не изменилось с прошлой сборки, сохраняет ETag и Last-Modified.
+    Ссылки между страницами относительные, поэтому сайт работает и за прокси с префиксом.
+    """
+
+    def __init__(self, fragments: Optional[FragmentCache] = None, workers: int = BUILD_WORKERS,
+                 mp_context: Optional[multiprocessing.context.BaseContext] = None):
+        self.fragments = fragments or FragmentCache()
+        self.workers = workers
+        self.mp_context = mp_context
+        self.pages: Dict[str, Page] = {}
+        self.built_at: Optional[float] = None
+        self.timings: Dict[str, float] = {}
+        self._building: Optional[asyncio.Future] = None
+
+    def build(self) -> Dict[str, float]:
+        """Собирает все страницы и возвращает время каждого этапа в секундах"""
+        timings = {}
+        built_at = time.time()
+
+        started = time.perf_counter()
+        sections = {section: CARD_REGISTRY.section(section) for section in SECTION_TITLES}
+        timings['cards'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        refs = [ref for section_refs in sections.values() for ref in section_refs]
+        cards = [ref.card for ref in refs]
+        rendered = self.fragments.get_many(cards, self.workers, self.mp_context)
+        self.fragments.prune(cards)
+        fragments = {ref.id: fragment for ref, fragment in zip(refs, rendered)}
+        timings['fragments'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        # Таблица стилей с отпечатком содержимого в имени: ее можно кешировать навсегда
+        stylesheet = Page.from_text(
+            STYLESHEET, built_at,
+            content_type='text/css; charset=UTF-8',
+            cache_control=f'public, max-age={ASSET_MAX_AGE}, immutable'
+        )
+        stylesheet_path = f'static/theory.{stylesheet.etag[:12]}.css'
+        documents = {}
+        index = ['# Теория для подготовки к собеседованиям\n\n']
+        for section, refs in sections.items():
+            section_title = SECTION_TITLES[section]
+            index.append(f'- [{section_title}](s/{section}) ({len(refs)})\n')
+
+            toc = [f'# {section_title}\n\n[← Все разделы](../)\n\n']
+            toc.extend(f'- [{ref.title}](../c/{ref.id})\n' for ref in refs)
+            body = [render_markdown(''.join(toc)), '<hr />\n']
+            navigation = render_markdown(f'[← {section_title}](../s/{section}) · [Все разделы](../)\n')
+            for ref in refs:
+                body.append(fragments[ref.id])
+                body.append('<hr />\n')
+                documents[f'c/{ref.id}'] = wrap_page(
+                    navigation + fragments[ref.id], title=ref.title, stylesheet_href=f'../{stylesheet_path}'
+                )
+            documents[f's/{section}'] = wrap_page(
+                ''.join(body), title=section_title, stylesheet_href=f'../{stylesheet_path}'
+            )
+        documents[''] = wrap_page(render_markdown(''.join(index)), stylesheet_href=stylesheet_path)
+        timings['assemble'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        pages = {stylesheet_path: self.pages.get(stylesheet_path, stylesheet)}
+        for path, html_content in documents.items():
+            previous = self.pages.get(path)
+            if previous is not None and previous.body == html_content.encode('utf-8'):
+                pages[path] = previous
+            else:
+                pages[path] = Page.from_text(html_content, built_at)
+        timings['compress'] = time.perf_counter() - started
+
+        self.pages = pages
+        self.built_at = built_at
+        self.timings = timings
+        logger.info(
+            f"Страницы теории собраны: {len(pages)}, фрагменты {self.fragments.stats()}, "
+            + ', '.join(f"{stage} {seconds * 1000:.1f} мс" for stage, seconds in timings.items())
+        )
+        return timings
+
+    async def ready(self) -> None:
+        """Собирает страницы при первом запросе, вне цикла событий; одновременные запросы ждут одну сборку"""
+        if self.built_at is not None:
+            return
+        if self._building is None or (self._building.done() and self._building.exception() is not None):
+            # Рендеринг - работа CPU; после неудачной сборки следующий запрос пробует снова
+            self._building = asyncio.get_running_loop().run_in_executor(None, self.build)
+        await asyncio.shield(self._building)
+
+    def get(self, path: str) -> Optional[Page]:
+        return self.pages.get(path.strip('/'))
+
+
+class PageHandler(tornado.web.RequestHandler):
+    """Отдает заранее отрендеренные страницы и статические файлы с поддержкой ETag,
+    Last-Modified и gzip"""
+
+    def initialize(self, site: TheorySite):
+        self.site = site
+
+    def compute_etag(self):
+        # ETag выставляется в get() с учетом выбранного сжатия
+        return None
+
+    async def get(self, path: str):
+        await self.site.ready()
+        page = self.site.get(path)
+        if page is None:
+            raise tornado.web.HTTPError(404)
+
+        use_gzip = 'gzip' in self.request.headers.get('Accept-Encoding', '')
+        self.set_header('Content-Type', page.content_type)
+        self.set_header('Cache-Control', page.cache_control)
+        self.set_header('Vary', 'Accept-Encoding')
+        self.set_header('Last-Modified', formatdate(page.last_modified, usegmt=True))
+        # Сжатое и несжатое представления различаются, поэтому и ETag у них разный
+        self.set_header('ETag', f'"{page.etag}-gz"' if use_gzip else f'"{page.etag}"')
+
+        if self.check_etag_header() or self._not_modified_since(page):
+            self.set_status(304)
+            return
+
+        if use_gzip:
+            self.set_header('Content-Encoding', 'gzip')
+            self.write(page.gzipped)
+        else:
+            self.write(page.body)
+
+    def _not_modified_since(self, page: Page) -> bool:
+        """Проверка If-Modified-Since (учитывается, только если нет If-None-Match)"""
+        since = self.request.headers.get('If-Modified-Since')
+        if not since or 'If-None-Match' in self.request.headers:
+            return False
+        try:
+            return int(page.last_modified) <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+
+def make_app(site: TheorySite) -> tornado.web.Application:
+    """Приложение tornado для сайта теории"""
+    return tornado.web.Application([
+        (r'/(|s/\w+|c/\w+|static/[\w.]+)/?', PageHandler, {'site': site}),
+    ])
+
+
+async def serve(host: str = HOST, port: int = PORT, workers: int = BUILD_WORKERS,
+                mp_context: Optional[multiprocessing.context.BaseContext] = None, prebuild: bool = True) -> None:
+    """Обслуживает страницы до остановки цикла событий; с prebuild страницы собираются
+    до начала приема запросов, иначе - при первом запросе"""
+    site = TheorySite(workers=workers, mp_context=mp_context)
+    if prebuild:
+        await site.ready()
+    make_app(site).listen(port, address=host, xheaders=True)
+    logger.info(f"Сервер теории слушает {host}:{port}, публичный адрес {BASE_URL or 'не задан (THEORY_BASE_URL)'}")
+    await asyncio.Event().wait()
+
+
+def start_in_background(host: str = HOST, port: int = PORT,
+                        workers: int = EMBEDDED_BUILD_WORKERS) -> threading.Thread:
+    """Запускает сервер теории в отдельном потоке со своим циклом событий.
+
+    Страницы собираются при первом запросе к сайту: старт бота не загружает все
+    разделы, и пока сайт не открывали, карточки в памяти не держатся.
+    Процесс бота многопоточный, поэтому пул сборки (если THEORY_BUILD_WORKERS > 1)
+    запускает процессы через spawn, а не fork: копия процесса с чужими потоками
+    может унаследовать захваченные ими блокировки.
+    """
+    coroutine = serve(host, port, workers, multiprocessing.get_context('spawn'), prebuild=False)
+    thread = threading.Thread(target=asyncio.run, args=(coroutine,), name='theory-server', daemon=True)
+    thread.start()
+    return thread
+
+
+def build_report() -> None:
+    """Собирает сайт и печатает время этапов и статистику кеша фрагментов"""
+    site = TheorySite()
+    timings = site.build()
+    for stage, seconds in timings.items():
+        print(f"{stage:10s} {seconds * 1000:8.1f} мс")
+    print(f"Страниц: {len(site.pages)}, фрагменты: {site.fragments.stats()}")
+
+
+def parallel_check() -> None:
+    """Холодная сборка фрагментов последовательно и в пуле процессов: время и совпадение результата"""
+    import tempfile
+
+    cards = [ref.card for ref in CARD_REGISTRY]
+    results = {}
+    # Прогон без замера: импорт модулей лексеров не должен попасть в первое измерение
+    with tempfile.TemporaryDirectory() as directory:
+        FragmentCache(directory).get_many(cards)
+    for workers in (1, BUILD_WORKERS):
+        codehilite.clear()
+        with tempfile.TemporaryDirectory() as directory:
+            started = time.perf_counter()
+            results[workers] = FragmentCache(directory).get_many(cards, workers)
+            print(f"Процессов: {workers:2d}, холодная сборка {len(cards)} фрагментов: "
+                  f"{(time.perf_counter() - started) * 1000:.1f} мс")
+    assert results[1] == results[BUILD_WORKERS]
+    print("Результаты последовательной и параллельной сборки совпадают")
+
+
+if __name__ == '__main__':
+    import sys
+
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    if sys.argv[1:] == ['build']:
+        build_report()
+    elif sys.argv[1:] == ['check']:
+        parallel_check()
+    else:
+        asyncio.run(serve())
@@ -0,0 +1,43 @@
+"""Бандл карточек: поля хранятся по позиции, поэтому бандл другой схемы моделей не используется"""
+import dataclasses
+import importlib
+
+import pytest
+
+from src.cards import bundle
+from src.cards.loader import SECTION_MODULES
+
+
+@pytest.fixture(scope='module')
+def bundle_path(tmp_path_factory):
+    return bundle.build_bundle(str(tmp_path_factory.mktemp('bundle') / 'cards.bundle'))
+
+
+def test_current_bundle_is_used(bundle_path):
+    opened = bundle.CardBundle(bundle_path)
+    for section, (module_name, _) in SECTION_MODULES.items():
+        assert opened.is_current(section, module_name)
+
+
+def test_bundle_with_other_model_fields_is_stale(bundle_path, monkeypatch):
+    # Новое поле в модели сдвинуло бы позиции полей, записанных в бандл
+    schema = bundle.model_schema()
+    schema['Question'] = schema['Question'] + ['difficulty:str']
+    monkeypatch.setattr(bundle, '_schema', schema)
+    opened = bundle.CardBundle(bundle_path)
+    for section, (module_name, _) in SECTION_MODULES.items():
+        assert not opened.is_current(section, module_name)
+
+
+def test_bundle_without_schema_is_stale(bundle_path, monkeypatch):
+    opened = bundle.CardBundle(bundle_path)
+    monkeypatch.setattr(opened, 'schema', None)
+    assert not opened.is_current('java_core', SECTION_MODULES['java_core'][0])
+
+
+def test_decoded_cards_match_modules(bundle_path):
+    opened = bundle.CardBundle(bundle_path)
+    for section, (module_name, attribute) in SECTION_MODULES.items():
+        expected = getattr(importlib.import_module(module_name), attribute)
+        decoded = opened.section(section)
+        assert [dataclasses.astuple(card) for card in decoded] == [dataclasses.astuple(card) for card in expected]
@@ -0,0 +1,24 @@
+"""Кеш HTML-фрагментов теории: после сборки на диске остаются только фрагменты текущих карточек"""
+from src.cards.registry import CARD_REGISTRY
+from src.theory_server import FragmentCache
+
+
+def test_prune_removes_stale_fragments(tmp_path):
+    cards = [ref.card for ref in list(CARD_REGISTRY)[:3]]
+    cache = FragmentCache(str(tmp_path))
+    cache.get_many(cards)
+    stale = tmp_path / f"{'0' * 40}.html"
+    stale.write_text('<p>старая версия</p>', encoding='utf-8')
+    foreign = tmp_path / f"{'1' * 40}.html.123.tmp"
+    foreign.write_text('', encoding='utf-8')
+
+    assert cache.prune(cards[:2]) == 2
+    assert not stale.exists()
+    assert foreign.exists()
+    kept = sorted(path.name for path in tmp_path.glob('*.html'))
+    assert kept == sorted(f'{cache.key(card)}.html' for card in cards[:2])
+    assert cache.stats()['removed'] == 2
+
+    # Оставшиеся фрагменты читаются из кеша без повторного рендеринга
+    cache.get_many(cards[:2])
+    assert cache.stats()['builds'] == 3
@@ -0,0 +1,73 @@
+"""Очереди чатов PerChatUpdateProcessor: порядок внутри чата и слоты обработки"""
+import asyncio
+import datetime
+
+from telegram import Chat, Message, Update
+
+from src.bot.processing import PerChatUpdateProcessor
+
+MAX_CONCURRENT_UPDATES = 4
+
+
+def message_update(update_id: int, chat_id: int) -> Update:
+    chat = Chat(chat_id, Chat.PRIVATE)
+    return Update(update_id, message=Message(update_id, datetime.datetime.now(), chat, text='tap'))
+
+
+async def handle(finished: list, update_id: int, seconds: float) -> None:
+    await asyncio.sleep(seconds)
+    finished.append(update_id)
+
+
+def test_busy_chat_does_not_hold_slots():
+    async def run() -> list:
+        processor = PerChatUpdateProcessor(MAX_CONCURRENT_UPDATES)
+        finished = []
+        # Нажатия первого чата заняли бы все слоты, если бы ждали очереди чата внутри слота
+        tasks = [
+            asyncio.create_task(processor.process_update(message_update(i, 1), handle(finished, i, 0.1)))
+            for i in range(1, MAX_CONCURRENT_UPDATES + 1)
+        ]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(processor.process_update(message_update(99, 2), handle(finished, 99, 0))))
+        await asyncio.gather(*tasks)
+        assert processor.stats()['chats'] == 0
+        return finished
+
+    finished = asyncio.run(run())
+    assert finished[0] == 99
+    # Обновления одного чата - строго по порядку получения
+    assert finished[1:] == list(range(1, MAX_CONCURRENT_UPDATES + 1))
+
+
+def test_pre_dispatch_does_not_wait_for_slot():
+    async def run() -> bool:
+        processor = PerChatUpdateProcessor(MAX_CONCURRENT_UPDATES)
+        finished = []
+        dispatched = []
+        processor.pre_dispatch = lambda update: dispatched.append(update.update_id) or True
+        # Все слоты заняты разными чатами
+        tasks = [
+            asyncio.create_task(processor.process_update(message_update(i, i), handle(finished, i, 0.1)))
+            for i in range(1, MAX_CONCURRENT_UPDATES + 1)
+        ]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(processor.process_update(message_update(99, 99), handle(finished, 99, 0))))
+        await asyncio.sleep(0)
+        early = 99 in dispatched and not finished
+        await asyncio.gather(*tasks)
+        return early
+
+    assert asyncio.run(run())
+
+
+def test_pre_dispatch_false_drops_update():
+    async def run() -> list:
+        processor = PerChatUpdateProcessor(MAX_CONCURRENT_UPDATES)
+        finished = []
+        processor.pre_dispatch = lambda update: update.update_id != 2
+        for i in (1, 2, 3):
+            await processor.process_update(message_update(i, 1), handle(finished, i, 0))
+        return finished
+
+    assert asyncio.run(run()) == [1, 3]
@@ -0,0 +1,77 @@
+"""Маршрутизация callback_data: точные маршруты, самый длинный префикс и декодеры аргументов"""
+import asyncio
+
+import pytest
+
+from src.bot.router import Router, index, paged
+
+
+async def handler(*args):
+    return args
+
+
+@pytest.fixture
+def router() -> Router:
+    router = Router()
+    router.add('back', handler)
+    router.add('md_database', handler)
+    router.add('md_', handler, str)
+    router.add('c_', handler, paged(str))
+    router.add('a_', handler, paged(index))
+    router.add('java_topic_', handler, paged(index))
+    router.add('java_', handler, str)
+    return router
+
+
+def resolved(router: Router, data: str):
+    result = router.resolve(data)
+    return None if result is None else (result[0].pattern, result[1])
+
+
+def test_exact_route_wins_over_prefix(router):
+    assert resolved(router, 'md_database') == ('md_database', None)
+    assert resolved(router, 'md_graphs') == ('md_', 'graphs')
+
+
+def test_longest_prefix(router):
+    assert resolved(router, 'java_topic_3') == ('java_topic_', (3, 0))
+    assert resolved(router, 'java_core') == ('java_', 'core')
+
+
+def test_pages(router):
+    assert resolved(router, 'a_3') == ('a_', (3, 0))
+    assert resolved(router, 'a_3:2') == ('a_', (3, 2))
+    assert resolved(router, 'c_jc3qmwqoz:1') == ('c_', ('jc3qmwqoz', 1))
+
+
+@pytest.mark.parametrize('data', [
+    'a_-1', 'a_+1', 'a_ 1', 'a_1 ', 'a_', 'a_1.5', 'a_3:-1', 'a_3:', 'java_topic_-2',
+    'c_jc3qmwqoz:-1', 'a_١', 'a_²', 'a_3:٣',
+])
+def test_forged_indices_are_rejected(router, data):
+    assert router.resolve(data) is None
+
+
+@pytest.mark.parametrize('data', ['', 'unknown', 'b', 'backk', 'x_1'])
+def test_unknown_routes(router, data):
+    assert router.resolve(data) is None
+    assert asyncio.run(router.dispatch(None, None, data)) is False
+
+
+def test_dispatch_passes_decoded_argument(router):
+    assert asyncio.run(router.dispatch('update', 'context', 'a_7:1')) is True
+
+
+def test_duplicate_routes_are_rejected(router):
+    with pytest.raises(ValueError):
+        router.add('back', handler)
+    with pytest.raises(ValueError):
+        router.add('a_', handler, str)
+
+
+def test_bot_routes_reject_negative_indices():
+    from src.bot.handlers import router
+
+    assert router.resolve('a_0') is not None
+    for data in ('a_-1', 'java_topic_-1', 'system_design_topic_-1', 'c_x:-1', 'a_0:-1'):
+        assert router.resolve(data) is None, data
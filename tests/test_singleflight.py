@@ -0,0 +1,59 @@
+"""SingleFlight: одновременные запросы с одним ключом выполняют вычисление один раз"""
+import threading
+import time
+
+import pytest
+
+from src.bot.singleflight import SingleFlight
+
+THREADS = 50
+
+
+def run_concurrently(flight: SingleFlight, key, build) -> list:
+    barrier = threading.Barrier(THREADS)
+    results = []
+
+    def request():
+        barrier.wait()
+        try:
+            results.append(flight.do(key, build))
+        except Exception as e:
+            results.append(e)
+
+    workers = [threading.Thread(target=request) for _ in range(THREADS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def test_concurrent_requests_share_one_build():
+    flight = SingleFlight()
+    calls = []
+
+    def build():
+        calls.append(1)
+        time.sleep(0.1)
+        return object()
+
+    results = run_concurrently(flight, ('export', 'database'), build)
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats()['coalesced_by_kind'] == {'export': THREADS - 1}
+    assert flight.in_flight() == 0
+
+
+def test_error_is_shared_and_not_cached():
+    flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.1)
+        raise ValueError('сборка не удалась')
+
+    results = run_concurrently(flight, 'key', fail)
+    assert all(isinstance(result, ValueError) for result in results)
+    # Результат не сохраняется: следующий запрос вычисляет заново
+    assert flight.do('key', lambda: 42) == 42
+    with pytest.raises(ValueError):
+        flight.do('key', fail)
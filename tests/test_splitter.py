@@ -0,0 +1,201 @@
+"""Разбиение карточек на сообщения: каждая часть укладывается в лимит и принимается Telegram.
+
+Разметка частей проверяется по правилам Bot API независимо от токенизатора
+src.bot.splitter: MarkdownV2 - собственным разбором по спецификации, HTML -
+стандартным html.parser.
+"""
+import random
+import re
+from html.parser import HTMLParser
+from typing import List, Tuple
+
+import pytest
+from telegram.constants import ParseMode
+
+from src.bot import render
+from src.bot.splitter import MESSAGE_LIMIT, split_message
+
+# Символы, которые в MarkdownV2 вне сущностей pre и code должны быть экранированы
+MARKDOWN_V2_RESERVED = set('_*[]()~`>#+-=|{}.!')
+
+# Теги HTML, поддерживаемые Bot API
+HTML_TAGS = {'b', 'strong', 'i', 'em', 'u', 'ins', 's', 'strike', 'del', 'span', 'tg-spoiler',
+             'a', 'code', 'pre', 'tg-emoji', 'blockquote'}
+HTML_ENTITIES = {'lt', 'gt', 'amp', 'quot'}
+
+SAMPLES_PER_SEED = 20
+
+
+def utf16_units(text: str) -> int:
+    return len(text.encode('utf-16-le')) // 2
+
+
+def markdown_v2_text(text: str) -> str:
+    """Видимый текст сообщения MarkdownV2; ValueError, если Telegram не разберет разметку"""
+    visible = []
+    stack: List[str] = []
+    i = 0
+
+    def toggle(name: str) -> None:
+        if name in stack:
+            if stack[-1] != name:
+                raise ValueError(f"{name} закрыт внутри {stack[-1]}: {text[max(0, i - 20):i + 20]!r}")
+            stack.pop()
+        else:
+            stack.append(name)
+
+    while i < len(text):
+        char = text[i]
+        code = stack[-1] if stack and stack[-1] in ('pre', 'code') else None
+        if char == '\\':
+            if i + 1 == len(text) or not 1 <= ord(text[i + 1]) <= 126:
+                raise ValueError(f"Некорректное экранирование на позиции {i}")
+            visible.append(text[i + 1])
+            i += 2
+        elif code == 'pre':
+            if text.startswith('```', i):
+                stack.pop()
+                i += 3
+            elif char == '`':
+                raise ValueError(f"Неэкранированный ` в блоке кода на позиции {i}")
+            else:
+                visible.append(char)
+                i += 1
+        elif code == 'code':
+            if char == '`':
+                stack.pop()
+            else:
+                visible.append(char)
+            i += 1
+        elif text.startswith('```', i):
+            # Язык блока кода - до конца строки, в текст не попадает
+            end = text.find('\n', i + 3)
+            stack.append('pre')
+            i = end + 1 if end != -1 and re.fullmatch(r'\w*', text[i + 3:end]) else i + 3
+        elif char == '`':
+            stack.append('code')
+            i += 1
+        elif text.startswith('__', i):
+            toggle('underline')
+            i += 2
+        elif text.startswith('||', i):
+            toggle('spoiler')
+            i += 2
+        elif char in '*_~':
+            toggle({'*': 'bold', '_': 'italic', '~': 'strikethrough'}[char])
+            i += 1
+        elif char in MARKDOWN_V2_RESERVED:
+            raise ValueError(f"Неэкранированный {char!r} на позиции {i}: {text[max(0, i - 20):i + 20]!r}")
+        else:
+            visible.append(char)
+            i += 1
+    if stack:
+        raise ValueError(f"Не закрыты сущности: {stack}")
+    return ''.join(visible)
+
+
+class _TelegramHtml(HTMLParser):
+    """Разбор HTML по правилам Bot API: только поддерживаемые теги, вложенные корректно"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.stack: List[str] = []
+        self.visible: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in HTML_TAGS:
+            raise ValueError(f"Неподдерживаемый тег <{tag}>")
+        if self.stack and self.stack[-1] in ('pre', 'code') and not (self.stack[-1] == 'pre' and tag == 'code'):
+            raise ValueError(f"<{tag}> внутри <{self.stack[-1]}>")
+        self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if not self.stack or self.stack[-1] != tag:
+            raise ValueError(f"</{tag}> не закрывает открытый тег: {self.stack}")
+        self.stack.pop()
+
+    def handle_startendtag(self, tag, attrs):
+        raise ValueError(f"Пустой тег <{tag}/>")
+
+    def handle_data(self, data):
+        for char in '<>&':
+            if char in data:
+                raise ValueError(f"Неэкранированный {char!r}: {data[:40]!r}")
+        self.visible.append(data)
+
+    def handle_entityref(self, name):
+        if name not in HTML_ENTITIES:
+            raise ValueError(f"Неподдерживаемая сущность &{name};")
+        self.visible.append({'lt': '<', 'gt': '>', 'amp': '&', 'quot': '"'}[name])
+
+    def handle_charref(self, name):
+        self.visible.append(chr(int(name[1:], 16) if name[:1] in 'xX' else int(name)))
+
+    def unknown_decl(self, data):
+        raise ValueError(f"Некорректная разметка: {data[:40]!r}")
+
+
+def html_text(text: str) -> str:
+    """Видимый текст сообщения HTML; ValueError, если Telegram не разберет разметку"""
+    parser = _TelegramHtml()
+    parser.feed(text)
+    parser.close()
+    if parser.rawdata:
+        raise ValueError(f"Не разобран хвост: {parser.rawdata[:40]!r}")
+    if parser.stack:
+        raise ValueError(f"Не закрыты теги: {parser.stack}")
+    return ''.join(parser.visible)
+
+
+def visible_text(text: str, parse_mode: str) -> str:
+    if parse_mode == ParseMode.HTML:
+        return html_text(text)
+    return markdown_v2_text(text)
+
+
+@pytest.fixture(scope='module')
+def card_messages() -> List[Tuple[str, str]]:
+    """Сообщения всех карточек до разбиения на страницы"""
+    from src.bot.handlers import CARD_REGISTRY, render_card
+
+    messages = []
+
+    def capture(text, parse_mode=None, limit=MESSAGE_LIMIT):
+        messages.append((text, parse_mode))
+        return [text]
+
+    render.render_cache.clear()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(render, 'split_message', capture)
+        for ref in CARD_REGISTRY:
+            render_card(ref)
+    render.render_cache.clear()
+    assert messages
+    return messages
+
+
+def test_card_messages_are_valid(card_messages):
+    for message, parse_mode in card_messages:
+        visible_text(message, parse_mode)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_split_at_random_limits(card_messages, seed):
+    rng = random.Random(seed)
+    for _ in range(SAMPLES_PER_SEED):
+        message, parse_mode = rng.choice(card_messages)
+        limit = rng.randint(200, MESSAGE_LIMIT)
+        chunks = split_message(message, parse_mode, limit)
+        assert chunks
+        for chunk in chunks:
+            assert utf16_units(chunk) <= limit
+            assert chunk.strip()
+            visible_text(chunk, parse_mode)
+        # Текст без разметки не теряется (пробелы на границах частей могут отбрасываться)
+        original = ''.join(visible_text(message, parse_mode).split())
+        restored = ''.join(''.join(visible_text(chunk, parse_mode) for chunk in chunks).split())
+        assert restored == original
+
+
+def test_short_message_is_not_split():
+    assert split_message('*Короткое* сообщение', ParseMode.MARKDOWN_V2) == ['*Короткое* сообщение']